@@ -0,0 +1 @@
+"""Offline benchmarks for the Lead Extractor (no Google credentials needed)."""
@@ -0,0 +1,68 @@
+"""
+End-to-end wall time of the sequential and asyncio pipelines with injected
+API latency.
+
+Usage:
+    python -m bench.bench_async_pipeline [N] [LATENCY_MS]
+
+Each mode runs against fresh fake Gmail/Sheets services seeded with the
+same N synthetic lead emails; every round trip sleeps LATENCY_MS (plus
+1 ms per message inside a Gmail batch) in the calling thread, like the
+blocking googleapiclient does.
+"""
+
+import asyncio
+import logging
+import sys
+import time
+
+from bench.fakes import FakeGmailService, FakeSheetsService
+from bench.lead_corpus import generate_emails
+from main import process_emails
+from modules.api_executor import ApiExecutor
+from modules.async_pipeline import AsyncPipeline
+from modules.data_extractor import DataExtractor
+from modules.email_validation import EmailValidationPolicy
+from modules.gmail_reader import GmailReader
+from modules.sheets_writer import DEFAULT_HEADERS, SheetsWriter
+
+def make_components(emails, latency):
+    gmail_service = FakeGmailService.from_emails(emails, latency=latency, per_item_latency=0.001)
+    sheets_service = FakeSheetsService(DEFAULT_HEADERS, latency=latency)
+    gmail = GmailReader(service=gmail_service)
+    sheets = SheetsWriter(service=sheets_service)
+    
+    # The fakes have no quota: measure the pipeline, not the throttle
+    gmail.executor = sheets.executor = ApiExecutor('fake')
+    extractor = DataExtractor(EmailValidationPolicy('syntax'))
+    return gmail, extractor, sheets, gmail_service, sheets_service
+
+def main(count=1000, latency_ms=80):
+    logging.disable(logging.WARNING)
+    emails = generate_emails(count, html_ratio=0.3)
+    latency = latency_ms / 1000
+    
+    print(f"emails: {count}, latency: {latency_ms} ms per round trip")
+    print(f"{'mode':12} {'wall s':>8} {'emails/s':>9} {'gmail rt':>9} {'sheets rt':>10} {'written':>8}")
+    
+    for mode in ('sequential', 'async'):
+        gmail, extractor, sheets, gmail_service, sheets_service = make_components(emails, latency)
+        start = time.perf_counter()
+        if mode == 'async':
+            stats = asyncio.run(AsyncPipeline(gmail, extractor, sheets).run('subject:Nueva consulta'))
+        else:
+            stats = process_emails(gmail, extractor, sheets)
+        wall = time.perf_counter() - start
+        
+        assert stats['processed'] == count, stats
+        assert gmail_service.unread_count() == count - stats['successful'], stats
+        print(
+            f"{mode:12} {wall:8.2f} {count / wall:9.0f} {gmail_service.round_trips:9} "
+            f"{sheets_service.round_trips:10} {stats['successful']:8}"
+        )
+
+if __name__ == '__main__':
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 1000,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 80
+    )
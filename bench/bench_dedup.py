@@ -0,0 +1,86 @@
+"""
+Lookup cost of the duplicate index as the output grows.
+
+Usage:
+    python -m bench.bench_dedup [N ...]
+
+For each size N (default 10000 50000 200000) a DedupIndex is filled with N
+synthetic leads, then 2000 lookups are timed: exact email/phone aliases
+(Gmail dots, phones in another format), near-duplicate name + company
+typos, and new leads. A brute-force scan over every name key is timed on
+a small sample for comparison; the blocked n-gram lookup should stay
+roughly flat while the scan grows with N.
+"""
+
+import random
+import sys
+import time
+
+from bench.lead_corpus import COMPANIES, FIRST_NAMES, LAST_NAMES
+from modules.dedup import DedupIndex, name_key, similarity, trigrams
+from modules.records import Lead
+
+THRESHOLD = 0.6
+
+def make_lead(rng, i):
+    return Lead(
+        name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}",
+        email=f"lead.{i}@gmail.com",
+        phone=f"+54 11 {4000 + i // 10000}-{i % 10000:04d}",
+        company=f"{rng.choice(COMPANIES)} {i % 5000}"
+    )
+
+def variants(rng, lead, i):
+    """
+    One alias or near-duplicate of a stored lead, and one new lead.
+    """
+    kind = i % 3
+    if kind == 0:
+        local = lead.email.split('@')[0].replace('.', '')
+        duplicate = Lead(email=f"{local.upper()}+web@googlemail.com")
+    elif kind == 1:
+        digits = ''.join(c for c in lead.phone if c.isdigit())[2:]
+        duplicate = Lead(email='x@y.com', phone=f"(0{digits[:2]}) 15 {digits[2:6]} {digits[6:]}")
+    else:
+        name = lead.name
+        position = rng.randrange(1, len(name) - 1)
+        typo = name[:position] + name[position + 1] + name[position] + name[position + 2:]
+        duplicate = Lead(email='x@y.com', name=typo, company=lead.company.upper())
+    new = Lead(email=f"new{i}@x.com", name=f"Nadie {i}", company=f"Nueva {i}")
+    return duplicate, new
+
+def brute_force(keys, key):
+    grams = trigrams(key)
+    return any(similarity(grams, trigrams(other)) >= THRESHOLD for other in keys)
+
+def main(sizes=(10000, 50000, 200000)):
+    print(f"threshold: {THRESHOLD}")
+    print(f"{'leads':>8} {'build s':>8} {'us/lookup':>10} {'found':>7} {'false':>6} {'scan us/lookup':>15}")
+    
+    for size in sizes:
+        rng = random.Random(size)
+        leads = [make_lead(rng, i) for i in range(size)]
+        
+        started = time.perf_counter()
+        index = DedupIndex(match_phone=True, fuzzy_threshold=THRESHOLD)
+        for lead in leads:
+            index.add_lead(lead)
+        build = time.perf_counter() - started
+        
+        probes = [variants(rng, rng.choice(leads), i) for i in range(1000)]
+        started = time.perf_counter()
+        found = sum(index.find_lead(duplicate) is not None for duplicate, _ in probes)
+        false = sum(index.find_lead(new) is not None for _, new in probes)
+        lookup = (time.perf_counter() - started) / (2 * len(probes))
+        
+        keys = index.names.keys()
+        sample = [name_key(new.name, new.company) for _, new in probes[:20]]
+        started = time.perf_counter()
+        for key in sample:
+            brute_force(keys, key)
+        scan = (time.perf_counter() - started) / len(sample)
+        
+        print(f"{size:8} {build:8.2f} {lookup * 1e6:10.1f} {found:7} {false:6} {scan * 1e6:15.0f}")
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or (10000, 50000, 200000))
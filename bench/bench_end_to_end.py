@@ -0,0 +1,169 @@
+"""
+Offline replay of a full run through main.main().
+
+Usage:
+    python -m bench.bench_end_to_end [N] [LATENCY_MS]
+
+Replays N synthetic lead messages (default 1000) through main.main() with
+GmailReader, DataExtractor and SheetsWriter talking to the in-memory fake
+services instead of Google. Messages cycle through every layout in
+lead_corpus.MIME_FORMATS: plain and HTML-only bodies, multipart/alternative,
+multipart/mixed with an attachment, and UTF-8, ISO-8859-1 and Windows-1252
+charsets. Every round trip sleeps LATENCY_MS (default 20).
+
+Each pipeline mode (sequential, --async, --workers 2) runs under three
+fault scenarios:
+    clean   no errors
+    5xx     2% of Gmail round trips and batch items fail with 503
+    quota   5% of Gmail batch items fail with 403 userRateLimitExceeded
+            and 5% of Sheets calls with 429
+
+Every run happens in a fresh spawned process, so peak RSS (ru_maxrss, for
+the run and for its extraction workers) belongs to that run alone. The
+report shows emails/s, API round trips and calls per written lead, retries
+and injected errors. Runs are offline: email validation is syntax-only,
+the ledger lives in a temporary directory, no run report is written and
+only errors are logged.
+"""
+
+import os
+
+# Set before config is imported, here and in the spawned runs (and their
+# extraction workers)
+os.environ['EMAIL_VALIDATION'] = 'syntax'
+os.environ['LOG_LEVEL'] = 'ERROR'
+os.environ['METRICS_REPORT_FILE'] = ''
+os.environ['METRICS_PROMETHEUS_FILE'] = ''
+
+import multiprocessing
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
+
+import main as lead_extractor
+from bench.fakes import FakeGmailService, FakeSheetsService
+from bench.lead_corpus import generate_messages
+from config import SEARCH_QUERY
+from modules.api_executor import ApiExecutor
+from modules.data_extractor import DataExtractor
+from modules.gmail_reader import GmailReader
+from modules.ledger import MessageLedger
+from modules.metrics import get_metrics
+from modules.sheets_writer import DEFAULT_HEADERS, SheetsWriter
+
+MODES = {
+    'sequential': {},
+    'async': {'use_async': True},
+    'workers=2': {'workers': 2}
+}
+
+SCENARIOS = {
+    'clean': ({}, {}),
+    '5xx': ({'error_rate': 0.02, 'item_error_rate': 0.02, 'error_status': 503}, {}),
+    'quota': (
+        {'item_error_rate': 0.05, 'error_status': 403, 'error_reason': 'userRateLimitExceeded'},
+        {'error_rate': 0.05, 'error_status': 429}
+    )
+}
+
+def make_executor(name):
+    # No quota throttling, short backoff: measure the pipeline and the
+    # retry paths, not the sleeps
+    return ApiExecutor(name, backoff_base=0.01, backoff_max=0.1)
+
+def run(count, latency, mode, scenario):
+    """
+    Replay the corpus through main.main() (runs in a spawned process).
+    
+    Returns:
+        Dictionary of results
+    """
+    gmail_faults, sheets_faults = SCENARIOS[scenario]
+    gmail_service = FakeGmailService(
+        generate_messages(count), latency=latency, per_item_latency=0.001, **gmail_faults
+    )
+    sheets_service = FakeSheetsService(DEFAULT_HEADERS, latency=latency, **sheets_faults)
+    stats = {}
+    summary = lead_extractor.log_summary
+    
+    def log_summary(run_stats, extractor, sink):
+        stats.update(run_stats)
+        summary(run_stats, extractor, sink)
+    
+    with tempfile.TemporaryDirectory() as directory:
+        gmail = GmailReader(service=gmail_service)
+        sheets = SheetsWriter(service=sheets_service)
+        gmail.executor = make_executor('gmail')
+        sheets.executor = make_executor('sheets')
+        ledger = MessageLedger(os.path.join(directory, 'ledger.sqlite3'))
+        components = (gmail, DataExtractor(), sheets, ledger)
+        
+        with mock.patch.object(lead_extractor, 'build_components', return_value=components), \
+                mock.patch.object(lead_extractor, 'log_summary', log_summary):
+            started = time.perf_counter()
+            try:
+                lead_extractor.main(**MODES[mode])
+            except SystemExit:
+                raise RuntimeError(f"{mode}/{scenario}: run failed")
+            wall = time.perf_counter() - started
+        
+        # A second listing must only return what the run left unacknowledged
+        relisted = sum(1 for _ in gmail.iter_unread_message_ids(SEARCH_QUERY, max_messages=0))
+    
+    counters = get_metrics().report()['counters']
+    written = len(sheets_service.rows) - 1
+    assert written == stats['successful'], (written, stats)
+    return {
+        'wall': wall,
+        'processed': stats['processed'],
+        'written': written,
+        'gmail_rt': gmail_service.round_trips,
+        'gmail_calls': sum(gmail_service.calls.values()),
+        'sheets_rt': sheets_service.round_trips,
+        'retries': counters.get('api.gmail.retries', 0) + counters.get('api.sheets.retries', 0),
+        'injected': gmail_service.errors + sheets_service.errors,
+        'unread': gmail_service.unread_count(),
+        'relisted': relisted,
+        'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'workers_mb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    }
+
+def main(count=1000, latency_ms=20):
+    print(f"emails: {count}, latency: {latency_ms} ms per round trip")
+    print(
+        f"{'mode':11} {'scenario':8} {'emails/s':>9} {'written':>8} {'gmail rt':>9} {'calls/lead':>11} "
+        f"{'sheets rt':>10} {'retries':>8} {'errors':>7} {'rss MB':>7} {'workers MB':>11}"
+    )
+    
+    context = multiprocessing.get_context('spawn')
+    expected = None
+    for mode in MODES:
+        for scenario in SCENARIOS:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                result = executor.submit(run, count, latency_ms / 1000, mode, scenario).result()
+            
+            assert result['processed'] == count, (mode, scenario, result)
+            # Faults are retried: every scenario must write the same leads
+            # and leave only the leadless emails unread
+            if expected is None:
+                expected = result['written']
+            assert result['written'] == expected, (mode, scenario, result['written'], expected)
+            assert result['unread'] == count - expected, (mode, scenario, result)
+            assert result['relisted'] == result['unread'], (mode, scenario, result)
+            
+            calls_per_lead = (result['gmail_calls'] + result['sheets_rt']) / max(result['written'], 1)
+            print(
+                f"{mode:11} {scenario:8} {count / result['wall']:9.0f} {result['written']:8} "
+                f"{result['gmail_rt']:9} {calls_per_lead:11.2f} {result['sheets_rt']:10} "
+                f"{result['retries']:8} {result['injected']:7} {result['rss_mb']:7.1f} "
+                f"{result['workers_mb']:11.1f}"
+            )
+
+if __name__ == '__main__':
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 1000,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 20
+    )
@@ -0,0 +1,62 @@
+"""
+Compare per-message fetching with HTTP batch fetching over a fake transport.
+
+Usage:
+    python -m bench.bench_gmail_batch [N]
+
+Times fetching N messages one by one and in HTTP batches. The round-trip
+counts are checked in tests/test_gmail_batch.py.
+"""
+
+import sys
+import time
+
+from googleapiclient.discovery import build
+
+from bench.fake_transport import FakeGmailHttp, make_message
+from config import GMAIL_BATCH_SIZE
+from modules.api_executor import ApiExecutor
+from modules.gmail_reader import GmailReader
+
+def make_reader(messages):
+    """
+    Build a GmailReader whose service talks to a FakeGmailHttp.
+    """
+    http = FakeGmailHttp(messages)
+    reader = GmailReader(service=build('gmail', 'v1', http=http, static_discovery=True, cache_discovery=False))
+    reader.executor = ApiExecutor('gmail')
+    return reader, http
+
+def main(n=230):
+    messages = {
+        f'msg{i:05d}': make_message(
+            f'msg{i:05d}',
+            f'Cliente {i} <cliente{i}@example.com>',
+            'Nueva consulta',
+            f'Nombre: Cliente {i}\nTelefono: +54 11 5555-{i:04d}\n'
+        )
+        for i in range(n)
+    }
+    message_ids = list(messages) + ['missing']
+    
+    reader, http = make_reader(messages)
+    start = time.perf_counter()
+    for message_id in message_ids:
+        reader.get_email_details(message_id)
+    serial_time = time.perf_counter() - start
+    serial_requests = http.request_count
+    
+    reader, http = make_reader(messages)
+    start = time.perf_counter()
+    _, failures = reader.get_emails_batch(message_ids)
+    batch_time = time.perf_counter() - start
+    batch_requests = http.request_count
+    
+    print(f"messages:            {len(message_ids)} (1 missing)")
+    print(f"batch size:          {GMAIL_BATCH_SIZE}")
+    print(f"serial round trips:  {serial_requests} ({serial_time * 1000:.1f} ms)")
+    print(f"batched round trips: {batch_requests} ({batch_time * 1000:.1f} ms)")
+    print(f"per-item failures:   {dict((k, type(v).__name__) for k, v in failures.items())}")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 230)
@@ -0,0 +1,79 @@
+"""
+Benchmark DataExtractor._clean_html against the previous BeautifulSoup path.
+
+Usage:
+    python -m bench.bench_html [N]
+
+Runs N plain-text and N HTML synthetic emails through both converters,
+reports per-body time, and checks that full extraction yields the same
+leads either way. Requires beautifulsoup4 for the baseline
+(pip install beautifulsoup4); it is no longer a runtime dependency.
+"""
+
+import logging
+import sys
+import time
+
+from bench.lead_corpus import generate_emails
+from modules.data_extractor import DataExtractor
+from modules.email_validation import EmailValidationPolicy
+
+try:
+    from bs4 import BeautifulSoup
+except ImportError:
+    BeautifulSoup = None
+
+class SoupExtractor(DataExtractor):
+    """
+    Previous _clean_html: full BeautifulSoup tree for every body.
+    """
+    
+    def _clean_html(self, html_text):
+        return BeautifulSoup(html_text, 'html.parser').get_text(separator='\n')
+
+def best_time(func, items, repeat=5):
+    """
+    Best-of-repeat time per item.
+    
+    Returns:
+        Tuple (seconds_per_item, results)
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [func(item) for item in items]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(items), results
+
+def main(count=1000):
+    if BeautifulSoup is None:
+        sys.exit('beautifulsoup4 is required for the baseline: pip install beautifulsoup4')
+    
+    # Keep per-lead INFO logs out of the measurement
+    logging.disable(logging.INFO)
+    
+    policy = EmailValidationPolicy('syntax')
+    soup = SoupExtractor(policy)
+    fast = DataExtractor(policy)
+    
+    print(f"{'corpus':8} {'soup us':>9} {'fast us':>9} {'speedup':>8} {'parity':>11}")
+    for name, ratio in (('plain', 0.0), ('html', 1.0)):
+        emails = generate_emails(count, seed=7, html_ratio=ratio)
+        bodies = [email.body for email in emails]
+        
+        before, _ = best_time(soup._clean_html, bodies)
+        after, _ = best_time(fast._clean_html, bodies)
+        
+        soup_leads = [soup.extract_from_email(email) for email in emails]
+        fast_leads = [fast.extract_from_email(email) for email in emails]
+        same = sum(a == b for a, b in zip(soup_leads, fast_leads))
+        
+        print(f"{name:8} {before * 1e6:9.1f} {after * 1e6:9.1f} {before / after:7.1f}x {same:5}/{count}")
+        for a, b in zip(soup_leads, fast_leads):
+            if a != b:
+                print(f"  first mismatch: soup={a} fast={b}")
+                break
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
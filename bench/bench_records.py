@@ -0,0 +1,96 @@
+"""
+Memory and serialization cost of Lead/EmailMessage records versus dictionaries.
+
+Usage:
+    python -m bench.bench_records [N]
+
+Builds N leads and N emails (default 100000) both as the dictionaries the
+pipeline used to pass around and as modules.records objects, and reports
+the memory they hold (tracemalloc, values shared so only the containers
+differ), the size and time of the pickle sent to extraction workers, and
+the time to turn leads into sheet rows.
+"""
+
+import pickle
+import sys
+import time
+import tracemalloc
+
+from modules.records import EmailMessage, Lead
+
+HEADERS = ['Timestamp', 'Source', 'Name', 'Email', 'Phone', 'Company', 'Subject', 'Status']
+DICT_FIELDS = [header.lower() for header in HEADERS]
+
+def lead_values(i):
+    return {
+        'timestamp': 'Mon, 2 Oct 2023 10:00:00 -0300',
+        'source': 'Gmail',
+        'name': 'Juan Pérez',
+        'email': f"lead{i}@empresa.com.ar",
+        'phone': '+54 11 4567-8901',
+        'company': 'ACME S.A.',
+        'subject': 'Nueva consulta',
+        'status': 'Nuevo'
+    }
+
+def email_values(i):
+    return {
+        'id': f"msg{i:06d}",
+        'from': 'Juan Pérez <juan@empresa.com.ar>',
+        'subject': 'Nueva consulta',
+        'date': 'Mon, 2 Oct 2023 10:00:00 -0300',
+        'body': 'Nombre: Juan Pérez\nEmail: juan@empresa.com.ar'
+    }
+
+def measure(build, values):
+    """
+    Memory allocated by build() for every item in values.
+    
+    Returns:
+        Tuple (bytes, built items)
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    items = [build(value) for value in values]
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return size, items
+
+def best_time(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def main(count=100000):
+    # Build the field values up front so both layouts share the same strings
+    leads = [lead_values(i) for i in range(count)]
+    emails = [email_values(i) for i in range(count)]
+    
+    rows = [
+        ('lead dict', measure(dict, leads)),
+        ('Lead', measure(lambda v: Lead(**v), leads)),
+        ('email dict', measure(dict, emails)),
+        ('EmailMessage', measure(lambda v: EmailMessage(
+            v['id'], sender=v['from'], subject=v['subject'], date=v['date'], body=v['body']), emails))
+    ]
+    
+    print(f"records: {count}")
+    print(f"{'layout':14} {'MB':>8} {'bytes/rec':>10} {'pickle MB':>10} {'pickle ms':>10}")
+    for name, (size, items) in rows:
+        pickled = len(pickle.dumps(items, pickle.HIGHEST_PROTOCOL))
+        seconds = best_time(lambda: pickle.dumps(items, pickle.HIGHEST_PROTOCOL))
+        print(f"{name:14} {size / 2**20:8.1f} {size / count:10.0f} {pickled / 2**20:10.1f} {seconds * 1000:10.1f}")
+    
+    lead_dicts, lead_records = rows[0][1][1], rows[1][1][1]
+    to_row = Lead.row_builder(Lead.FIELDS)
+    
+    dict_rows = best_time(lambda: [[lead.get(field, '') for field in DICT_FIELDS] for lead in lead_dicts])
+    record_rows = best_time(lambda: [to_row(lead) for lead in lead_records])
+    print(f"rows from dicts:   {dict_rows * 1e9 / count:7.0f} ns/lead")
+    print(f"rows from Lead:    {record_rows * 1e9 / count:7.0f} ns/lead ({dict_rows / record_rows:.1f}x)")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
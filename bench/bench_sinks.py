@@ -0,0 +1,101 @@
+"""
+Throughput of the lead sinks.
+
+Usage:
+    python -m bench.bench_sinks [N]
+
+Writes N synthetic leads (default 20000) in LEAD_BATCH_SIZE batches,
+checking each one for duplicates first like the pipeline does, to every
+local backend with and without per-batch fsync, and to SheetsWriter over
+the in-memory fake service with 80 ms per round trip (no quota
+throttling, so the real Sheets backend is slower still). Each local
+file is then reopened to check that the row count and duplicate index
+survive.
+"""
+
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from bench.fakes import FakeSheetsService
+from modules.api_executor import ApiExecutor
+from modules.records import Lead
+from modules.sheets_writer import DEFAULT_HEADERS, SheetsWriter
+from modules.sinks import CsvSink, JsonlSink, SqliteSink
+from config import LEAD_BATCH_SIZE
+
+def make_leads(count):
+    return [
+        Lead(
+            timestamp='Mon, 2 Oct 2023 10:00:00 -0300',
+            name=f"Lead {i}",
+            email=f"lead{i}@empresa.com.ar",
+            phone=f"+54 11 {4000 + i // 10000}-{i % 10000:04d}",
+            company='ACME S.A.',
+            subject='Nueva consulta',
+            extra={'budget': '1000'} if i % 10 == 0 else None
+        )
+        for i in range(count)
+    ]
+
+def write_all(sink, leads):
+    """
+    Write leads the way the pipeline does: duplicate check, then batches.
+    
+    Returns:
+        Seconds taken
+    """
+    started = time.perf_counter()
+    batch = []
+    for lead in leads:
+        if sink.find_duplicate(lead):
+            continue
+        batch.append(lead)
+        if len(batch) >= LEAD_BATCH_SIZE:
+            sink.append_multiple_leads(batch)
+            batch = []
+    if batch:
+        sink.append_multiple_leads(batch)
+    return time.perf_counter() - started
+
+def main(count=20000):
+    logging.disable(logging.INFO)
+    leads = make_leads(count)
+    
+    print(f"leads: {count}, batch size: {LEAD_BATCH_SIZE}")
+    print(f"{'backend':18} {'seconds':>8} {'leads/s':>10} {'rows':>7} {'reopened':>9}")
+    
+    with tempfile.TemporaryDirectory() as directory:
+        for name, factory in (
+            ('csv', lambda path: CsvSink(path, fsync=True)),
+            ('csv no fsync', lambda path: CsvSink(path, fsync=False)),
+            ('jsonl', lambda path: JsonlSink(path, fsync=True)),
+            ('jsonl no fsync', lambda path: JsonlSink(path, fsync=False)),
+            ('sqlite', lambda path: SqliteSink(path, fsync=True)),
+            ('sqlite no fsync', lambda path: SqliteSink(path, fsync=False))
+        ):
+            path = os.path.join(directory, name.replace(' ', '_'))
+            sink = factory(path)
+            seconds = write_all(sink, leads)
+            rows = sink.get_row_count()
+            sink.close()
+            
+            # A second run over the same leads must find them all
+            reopened = factory(path)
+            found = sum(reopened.check_duplicate(lead.email) for lead in leads)
+            assert reopened.get_row_count() == rows, (name, reopened.get_row_count(), rows)
+            reopened.close()
+            
+            print(f"{name:18} {seconds:8.2f} {count / seconds:10.0f} {rows:7} {found:9}")
+    
+    # Sheets is far slower: time a slice and report the rate
+    sample = leads[:min(count, LEAD_BATCH_SIZE * 5)]
+    sheets = SheetsWriter(service=FakeSheetsService(DEFAULT_HEADERS, latency=0.08))
+    sheets.executor = ApiExecutor('fake')
+    seconds = write_all(sheets, sample)
+    print(f"{'sheets (fake)':18} {seconds:8.2f} {len(sample) / seconds:10.0f} {sheets.get_row_count() - 1:7} {'-':>9}")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
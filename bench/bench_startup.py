@@ -0,0 +1,87 @@
+"""
+Cold-start cost: import time of main.py and Google API service construction.
+
+Usage:
+    python -m bench.bench_startup [RUNS]
+
+Imports are measured in fresh interpreters with `python -X importtime`
+(median of RUNS); the slowest modules by self time are listed so new heavy
+imports are easy to spot. Service construction compares googleapiclient's
+build() (reads and parses the bundled discovery document every time) with
+modules.discovery.build_service (parses it once per process).
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from google.auth.credentials import AnonymousCredentials
+from googleapiclient.discovery import build
+
+from modules.discovery import build_service
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def import_profile(module):
+    """
+    Import module in a fresh interpreter with -X importtime.
+    
+    Returns:
+        Tuple (total_us, {module: self_us})
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    
+    self_times = {}
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        self_times[name.strip()] = int(self_us)
+        if name.strip() == module:
+            total = int(cumulative_us)
+    
+    return total, self_times
+
+def build_times(build_fn, repeat=20):
+    """
+    Best time to build the Gmail and Sheets services.
+    """
+    credentials = AnonymousCredentials()
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        build_fn('gmail', 'v1', credentials)
+        build_fn('sheets', 'v4', credentials)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main(runs=5):
+    totals = []
+    self_times = {}
+    for _ in range(runs):
+        total, self_times = import_profile('main')
+        totals.append(total)
+    
+    print(f"import main: median {statistics.median(totals) / 1000:.1f} ms over {runs} runs")
+    print("slowest modules (self time, last run):")
+    for name, self_us in sorted(self_times.items(), key=lambda item: -item[1])[:10]:
+        print(f"  {self_us / 1000:7.1f} ms  {name}")
+    
+    for module in ('google_auth_oauthlib', 'asyncio', 'multiprocessing', 'bs4'):
+        loaded = any(name.strip() == module for name in self_times)
+        print(f"  {module}: {'imported' if loaded else 'not imported'}")
+    
+    plain = build_times(lambda api, version, creds: build(
+        api, version, credentials=creds, static_discovery=True, cache_discovery=False
+    ))
+    cached = build_times(build_service)
+    print(f"gmail + sheets services: build() {plain * 1000:.1f} ms, build_service() {cached * 1000:.1f} ms")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
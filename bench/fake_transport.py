@@ -0,0 +1,263 @@
+"""
+Fake httplib2 transport for the Gmail API.
+
+Answers single messages().get/list calls and multipart batch requests from an
+in-memory mailbox, counting every HTTP round trip. Pass an instance as
+``http=`` to ``googleapiclient.discovery.build`` together with
+``static_discovery=True`` so no network access is needed.
+"""
+
+import base64
+import json
+import re
+import uuid
+from email.parser import Parser
+from urllib.parse import parse_qs, urlsplit
+
+import httplib2
+
+MESSAGE_PATH = re.compile(r'/gmail/v1/users/me/messages/([^/?\s]+)')
+LIST_PATH = re.compile(r'/gmail/v1/users/me/messages(?:\?|$)')
+BATCH_MODIFY_PATH = re.compile(r'/gmail/v1/users/me/messages/batchModify')
+
+# Search operators the fakes understand; other terms match every message
+EXCLUDED_LABEL = re.compile(r'-label:(\S+)')
+AFTER = re.compile(r'\bafter:(\d+)')
+
+def search_name(label_name):
+    """
+    Spell a label name the way Gmail search expects it ('Leads/Web' -> 'leads-web').
+    """
+    return re.sub(r'[\s/]+', '-', label_name.strip().lower())
+
+def matches_query(message, query, label_names=None):
+    """
+    Check a message against the label and date operators of a search query.
+    
+    Like Gmail, only 'is:unread' restricts the result to unread mail,
+    '-label:name' drops messages carrying that label and 'after:<epoch
+    seconds>' drops messages received earlier (by internalDate; messages
+    without one always match).
+    
+    Args:
+        message: Message resource
+        query: Search query (q), or None
+        label_names: Dictionary of label ID -> label name (IDs double as names
+            when missing)
+    
+    Returns:
+        Boolean
+    """
+    query = query or ''
+    label_ids = message['labelIds']
+    after = AFTER.search(query)
+    if after and 'internalDate' in message and int(message['internalDate']) // 1000 < int(after.group(1)):
+        return False
+    if 'is:unread' in query and 'UNREAD' not in label_ids:
+        return False
+    excluded = set(EXCLUDED_LABEL.findall(query))
+    if excluded:
+        label_names = label_names or {}
+        names = {search_name(label_names.get(label_id, label_id)) for label_id in label_ids}
+        if names & excluded:
+            return False
+    return True
+
+def make_message(message_id, sender, subject, body, date='Mon, 2 Oct 2023 10:00:00 -0300'):
+    """
+    Build a Gmail message resource with a text/plain body.
+    
+    Args:
+        message_id: Gmail message ID
+        sender: From header value
+        subject: Subject header value
+        body: Plain text body
+        date: Date header value
+    
+    Returns:
+        Dictionary shaped like a messages().get(format='full') response
+    """
+    data = base64.urlsafe_b64encode(body.encode('utf-8')).decode('ascii')
+    return {
+        'id': message_id,
+        'threadId': message_id,
+        'labelIds': ['INBOX', 'UNREAD'],
+        'payload': {
+            'mimeType': 'text/plain',
+            'headers': [
+                {'name': 'From', 'value': sender},
+                {'name': 'Subject', 'value': subject},
+                {'name': 'Date', 'value': date}
+            ],
+            'body': {'size': len(body), 'data': data}
+        }
+    }
+
+def make_part(text, mime_type='text/plain', charset='utf-8', filename=''):
+    """
+    Build a single MIME part of a Gmail message payload.
+    
+    Args:
+        text: Part content
+        mime_type: Content type
+        charset: Charset the content is encoded in
+        filename: Attachment filename (attachments carry no inline data,
+            like the real API)
+    
+    Returns:
+        Dictionary shaped like a payload part
+    """
+    raw = text.encode(charset)
+    part = {
+        'mimeType': mime_type,
+        'filename': filename,
+        'headers': [{'name': 'Content-Type', 'value': f'{mime_type}; charset="{charset}"'}],
+        'body': {'size': len(raw)}
+    }
+    if filename:
+        part['body']['attachmentId'] = f"att-{uuid.uuid4().hex[:12]}"
+    else:
+        part['body']['data'] = base64.urlsafe_b64encode(raw).decode('ascii')
+    return part
+
+def make_multipart(parts, mime_type='multipart/alternative'):
+    """
+    Build a multipart payload node around already built parts.
+    
+    Args:
+        parts: List of parts from make_part() or make_multipart()
+        mime_type: multipart/alternative, multipart/mixed, ...
+    
+    Returns:
+        Dictionary shaped like a payload part
+    """
+    boundary = uuid.uuid4().hex
+    return {
+        'mimeType': mime_type,
+        'filename': '',
+        'headers': [{'name': 'Content-Type', 'value': f'{mime_type}; boundary="{boundary}"'}],
+        'body': {'size': 0},
+        'parts': parts
+    }
+
+def make_mime_message(message_id, sender, subject, payload, date='Mon, 2 Oct 2023 10:00:00 -0300'):
+    """
+    Build a Gmail message resource around a MIME payload.
+    
+    Args:
+        message_id: Gmail message ID
+        sender: From header value
+        subject: Subject header value
+        payload: Top-level part from make_part() or make_multipart()
+        date: Date header value
+    
+    Returns:
+        Dictionary shaped like a messages().get(format='full') response
+    """
+    payload = dict(payload)
+    # The top-level part carries the message headers too
+    payload['headers'] = [
+        {'name': 'From', 'value': sender},
+        {'name': 'Subject', 'value': subject},
+        {'name': 'Date', 'value': date}
+    ] + payload.get('headers', [])
+    return {
+        'id': message_id,
+        'threadId': message_id,
+        'labelIds': ['INBOX', 'UNREAD'],
+        'payload': payload
+    }
+
+class FakeGmailHttp:
+    """
+    Stand-in for httplib2.Http serving an in-memory Gmail mailbox.
+    """
+    
+    def __init__(self, messages):
+        """
+        Args:
+            messages: Dictionary of message ID -> message resource
+        """
+        self.messages = messages
+        self.request_count = 0
+        self.batch_count = 0
+    
+    def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        """
+        Handle one HTTP round trip.
+        
+        Returns:
+            Tuple (httplib2.Response, bytes content)
+        """
+        self.request_count += 1
+        path = uri.split('://', 1)[-1]
+        path = path[path.index('/'):]
+        
+        if path == '/batch' or path.startswith('/batch/'):
+            self.batch_count += 1
+            return self._batch(body, headers)
+        
+        status, payload = self._dispatch(method, path, body)
+        return self._response(status), json.dumps(payload).encode('utf-8')
+    
+    def _dispatch(self, method, path, body=None):
+        """
+        Resolve a single API call to (status, JSON payload).
+        """
+        if method == 'POST' and BATCH_MODIFY_PATH.search(path):
+            request = json.loads(body)
+            for message_id in request['ids']:
+                labels = self.messages[message_id]['labelIds']
+                labels[:] = [l for l in labels if l not in request.get('removeLabelIds', [])]
+                labels.extend(request.get('addLabelIds', []))
+            return 200, {}
+        
+        match = MESSAGE_PATH.search(path)
+        if method == 'GET' and match:
+            message = self.messages.get(match.group(1))
+            if message is None:
+                return 404, {'error': {'code': 404, 'message': 'Requested entity was not found.'}}
+            return 200, message
+        
+        if method == 'GET' and LIST_PATH.search(path):
+            query = parse_qs(urlsplit(path).query).get('q', [None])[0]
+            found = [m for m, message in self.messages.items() if matches_query(message, query)]
+            return 200, {
+                'messages': [{'id': m, 'threadId': m} for m in found],
+                'resultSizeEstimate': len(found)
+            }
+        
+        return 404, {'error': {'code': 404, 'message': f'Unhandled path {path}'}}
+    
+    def _batch(self, body, headers):
+        """
+        Answer a multipart/mixed batch request part by part.
+        """
+        content_type = headers['content-type']
+        request = Parser().parsestr(f"Content-Type: {content_type}\r\n\r\n{body}")
+        boundary = uuid.uuid4().hex
+        chunks = []
+        
+        for part in request.get_payload():
+            content_id = part['Content-ID'].strip('<>')
+            request_line = part.get_payload().lstrip().splitlines()[0]
+            method, path, _ = request_line.split(' ', 2)
+            status, payload = self._dispatch(method, path)
+            content = json.dumps(payload)
+            chunks.append(
+                f"--{boundary}\r\n"
+                f"Content-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                f"Content-Type: application/json; charset=UTF-8\r\n"
+                f"Content-Length: {len(content)}\r\n\r\n"
+                f"{content}\r\n"
+            )
+        
+        chunks.append(f"--{boundary}--\r\n")
+        response = self._response(200, f'multipart/mixed; boundary={boundary}')
+        return response, ''.join(chunks).encode('utf-8')
+    
+    @staticmethod
+    def _response(status, content_type='application/json; charset=UTF-8'):
+        return httplib2.Response({'status': status, 'content-type': content_type})
@@ -0,0 +1,384 @@
+"""
+In-process fakes of the Gmail and Sheets API service objects.
+
+They mimic the googleapiclient call chains used by GmailReader and
+SheetsWriter (``service.users().messages().list(...).execute()``), sleep for
+a configurable latency on every round trip, like the blocking client does,
+and count calls per method. Both are thread-safe.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from bench.fake_transport import make_message, matches_query
+
+A1_RANGE = re.compile(r'^([A-Z]+)(\d*)(?::([A-Z]+)(\d*))?$')
+
+def http_error(status, message='Fake error', reason=None):
+    """
+    Build a googleapiclient HttpError with the given status.
+    
+    A reason (e.g. 'userRateLimitExceeded') is added to the error body the
+    way Google APIs report 403 quota errors.
+    """
+    resp = httplib2.Response({'status': status, 'reason': message})
+    error = {'code': status, 'message': message}
+    if reason:
+        error['errors'] = [{'reason': reason, 'message': message}]
+    content = json.dumps({'error': error}).encode('utf-8')
+    return HttpError(resp, content)
+
+def message_from_email(email):
+    """
+    Turn a bench.lead_corpus EmailMessage into a Gmail message resource.
+    """
+    return make_message(email.id, email.sender, email.subject, email.body, email.date)
+
+class FakeRequest:
+    """
+    Deferred API call, executed like googleapiclient.http.HttpRequest.
+    """
+    
+    def __init__(self, service, method, handler):
+        self.service = service
+        self.method = method
+        self.methodId = method
+        self.handler = handler
+    
+    def execute(self, http=None, num_retries=0):
+        self.service.round_trip(self.method)
+        return self.handler()
+
+class FakeBatch:
+    """
+    Stand-in for BatchHttpRequest: one round trip, per-item callbacks.
+    """
+    
+    def __init__(self, service, callback=None):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+    
+    def add(self, request, callback=None, request_id=None):
+        self.requests.append((request_id or str(len(self.requests)), request, callback or self.callback))
+    
+    def execute(self, http=None):
+        self.service.round_trip('batch', items=len(self.requests))
+        for request_id, request, callback in self.requests:
+            self.service.count(request.method)
+            if self.service.item_fails():
+                callback(request_id, None, self.service.injected_error())
+                continue
+            try:
+                response, error = request.handler(), None
+            except HttpError as e:
+                response, error = None, e
+            callback(request_id, response, error)
+
+class FakeService:
+    """
+    Shared latency, error injection and call counting.
+    """
+    
+    def __init__(self, latency=0.0, per_item_latency=0.0, error_rate=0.0, error_status=503,
+                 item_error_rate=0.0, error_reason=None, seed=0):
+        """
+        Args:
+            latency: Seconds slept per round trip
+            per_item_latency: Extra seconds per call inside a batch
+            error_rate: Probability a round trip fails with error_status
+            error_status: HTTP status of injected errors (429 = quota)
+            item_error_rate: Probability a call inside a batch fails with
+                error_status while the batch itself succeeds
+            error_reason: Reason in the error body (403 +
+                'userRateLimitExceeded' = per-user quota)
+            seed: Random seed for error injection
+        """
+        self.latency = latency
+        self.per_item_latency = per_item_latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.item_error_rate = item_error_rate
+        self.error_reason = error_reason
+        self.errors = 0
+        self.calls = Counter()
+        self.round_trips = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+    
+    def count(self, method):
+        with self._lock:
+            self.calls[method] += 1
+    
+    def item_fails(self):
+        with self._lock:
+            return bool(self.item_error_rate) and self._rng.random() < self.item_error_rate
+    
+    def injected_error(self):
+        with self._lock:
+            self.errors += 1
+        return http_error(self.error_status, reason=self.error_reason)
+    
+    def round_trip(self, method, items=0):
+        """
+        Account for one HTTP round trip: count it, sleep, maybe fail.
+        """
+        with self._lock:
+            self.round_trips += 1
+            self.calls[method] += 1
+            fail = self.error_rate and self._rng.random() < self.error_rate
+        
+        delay = self.latency + items * self.per_item_latency
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise self.injected_error()
+
+class FakeGmailService(FakeService):
+    """
+    Fake Gmail API v1 service backed by a dictionary of messages.
+    """
+    
+    def __init__(self, messages, labels=None, **kwargs):
+        """
+        Args:
+            messages: Dictionary of message ID -> message resource
+            labels: Dictionary of label name -> label ID
+            **kwargs: See FakeService
+        """
+        super().__init__(**kwargs)
+        self.messages_by_id = {}
+        self.labels_by_name = labels or {'UNREAD': 'UNREAD', 'INBOX': 'INBOX'}
+        self.history_id = 1000
+        self.oldest_history_id = self.history_id
+        self.history_records = []
+        for message in messages.values():
+            self.add_message(message)
+    
+    def add_message(self, message):
+        """
+        Deliver a message, recording a messageAdded history entry.
+        """
+        with self._lock:
+            self.history_id += 1
+            self.messages_by_id[message['id']] = message
+            self.history_records.append((self.history_id, message['id']))
+    
+    def expire_history(self):
+        """
+        Make every history ID issued so far invalid (404 on history.list).
+        """
+        with self._lock:
+            self.oldest_history_id = self.history_id
+    
+    @classmethod
+    def from_emails(cls, emails, **kwargs):
+        """
+        Build a fake mailbox from bench.lead_corpus emails.
+        """
+        return cls({email.id: message_from_email(email) for email in emails}, **kwargs)
+    
+    def unread_count(self):
+        return sum('UNREAD' in m['labelIds'] for m in self.messages_by_id.values())
+    
+    # googleapiclient resource chain
+    def users(self):
+        return self
+    
+    def messages(self):
+        return _FakeMessages(self)
+    
+    def labels(self):
+        return _FakeLabels(self)
+    
+    def history(self):
+        return _FakeHistory(self)
+    
+    def getProfile(self, userId):
+        def handler():
+            return {'emailAddress': 'me@example.com', 'historyId': str(self.history_id)}
+        return FakeRequest(self, 'getProfile', handler)
+    
+    def new_batch_http_request(self, callback=None):
+        return FakeBatch(self, callback)
+
+class _FakeMessages:
+    def __init__(self, service):
+        self.service = service
+    
+    def list(self, userId, q=None, maxResults=100, pageToken=None, **kwargs):
+        def handler():
+            label_names = {i: n for n, i in self.service.labels_by_name.items()}
+            with self.service._lock:
+                found = [
+                    m for m, message in self.service.messages_by_id.items()
+                    if matches_query(message, q, label_names)
+                ]
+            start = int(pageToken or 0)
+            page = found[start:start + maxResults]
+            result = {'messages': [{'id': m, 'threadId': m} for m in page], 'resultSizeEstimate': len(found)}
+            if start + maxResults < len(found):
+                result['nextPageToken'] = str(start + maxResults)
+            if not page:
+                del result['messages']
+            return result
+        return FakeRequest(self.service, 'messages.list', handler)
+    
+    def get(self, userId, id, format='full', **kwargs):
+        def handler():
+            message = self.service.messages_by_id.get(id)
+            if message is None:
+                raise http_error(404, 'Requested entity was not found.')
+            if format == 'metadata':
+                wanted = kwargs.get('metadataHeaders')
+                headers = [h for h in message['payload']['headers'] if not wanted or h['name'] in wanted]
+                return {'id': id, 'payload': {'headers': headers}}
+            return message
+        return FakeRequest(self.service, 'messages.get', handler)
+    
+    def modify(self, userId, id, body):
+        def handler():
+            self._relabel([id], body)
+            return {'id': id}
+        return FakeRequest(self.service, 'messages.modify', handler)
+    
+    def batchModify(self, userId, body):
+        def handler():
+            self._relabel(body['ids'], body)
+            return {}
+        return FakeRequest(self.service, 'messages.batchModify', handler)
+    
+    def _relabel(self, message_ids, body):
+        with self.service._lock:
+            for message_id in message_ids:
+                labels = self.service.messages_by_id[message_id]['labelIds']
+                labels[:] = [l for l in labels if l not in body.get('removeLabelIds', [])]
+                labels.extend(l for l in body.get('addLabelIds', []) if l not in labels)
+
+class _FakeHistory:
+    def __init__(self, service):
+        self.service = service
+    
+    def list(self, userId, startHistoryId, historyTypes=None, maxResults=100, pageToken=None, **kwargs):
+        def handler():
+            start = int(startHistoryId)
+            if start < self.service.oldest_history_id:
+                raise http_error(404, 'Requested entity was not found.')
+            with self.service._lock:
+                records = [r for r in self.service.history_records if r[0] > start]
+                current = self.service.history_id
+            offset = int(pageToken or 0)
+            page = records[offset:offset + maxResults]
+            result = {'historyId': str(current)}
+            if page:
+                result['history'] = [
+                    {'id': str(h), 'messagesAdded': [{'message': {'id': m, 'threadId': m, 'labelIds': ['UNREAD']}}]}
+                    for h, m in page
+                ]
+            if offset + maxResults < len(records):
+                result['nextPageToken'] = str(offset + maxResults)
+            return result
+        return FakeRequest(self.service, 'history.list', handler)
+
+class _FakeLabels:
+    def __init__(self, service):
+        self.service = service
+    
+    def list(self, userId):
+        def handler():
+            return {'labels': [{'id': i, 'name': n} for n, i in self.service.labels_by_name.items()]}
+        return FakeRequest(self.service, 'labels.list', handler)
+
+class FakeSheetsService(FakeService):
+    """
+    Fake Sheets API v4 service backed by a list of rows.
+    """
+    
+    def __init__(self, headers=None, rows=None, **kwargs):
+        """
+        Args:
+            headers: Header row
+            rows: Existing data rows
+            **kwargs: See FakeService
+        """
+        super().__init__(**kwargs)
+        self.rows = [list(headers)] if headers else []
+        self.rows.extend(list(row) for row in rows or [])
+    
+    def spreadsheets(self):
+        return self
+    
+    def values(self):
+        return _FakeValues(self)
+
+def _column_index(letters):
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - 64
+    return index - 1
+
+class _FakeValues:
+    def __init__(self, service):
+        self.service = service
+    
+    def _parse(self, a1):
+        match = A1_RANGE.match(a1.split('!', 1)[-1])
+        first_col, first_row, last_col, last_row = match.groups()
+        last_col = last_col or first_col
+        first = int(first_row) if first_row else 1
+        last = int(last_row) if last_row else (first if first_row and not match.group(3) else None)
+        return _column_index(first_col), _column_index(last_col), first, last
+    
+    def get(self, spreadsheetId, range, **kwargs):
+        def handler():
+            first_col, last_col, first, last = self._parse(range)
+            with self.service._lock:
+                rows = self.service.rows[first - 1:last]
+                values = [row[first_col:last_col + 1] for row in rows]
+            # Like the real API: trailing empty cells and rows are dropped
+            for row in values:
+                while row and row[-1] in ('', None):
+                    row.pop()
+            while values and not values[-1]:
+                values.pop()
+            result = {'range': range, 'majorDimension': 'ROWS'}
+            if values:
+                result['values'] = values
+            return result
+        return FakeRequest(self.service, 'values.get', handler)
+    
+    def append(self, spreadsheetId, range, valueInputOption, body, **kwargs):
+        def handler():
+            with self.service._lock:
+                start = len(self.service.rows) + 1
+                self.service.rows.extend(list(row) for row in body['values'])
+                end = len(self.service.rows)
+            sheet = range.split('!', 1)[0]
+            return {
+                'spreadsheetId': spreadsheetId,
+                'updates': {
+                    'updatedRange': f"{sheet}!A{start}:Z{end}",
+                    'updatedRows': len(body['values'])
+                }
+            }
+        return FakeRequest(self.service, 'values.append', handler)
+    
+    def update(self, spreadsheetId, range, valueInputOption, body, **kwargs):
+        def handler():
+            first_col, _, first, _ = self._parse(range)
+            with self.service._lock:
+                while len(self.service.rows) < first:
+                    self.service.rows.append([])
+                row = self.service.rows[first - 1]
+                while len(row) <= first_col:
+                    row.append('')
+                row[first_col] = body['values'][0][0]
+            return {'updatedCells': 1}
+        return FakeRequest(self.service, 'values.update', handler)
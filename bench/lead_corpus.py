@@ -0,0 +1,179 @@
+"""
+Synthetic lead emails for benchmarks.
+
+generate_emails() returns EmailMessage records shaped like
+GmailReader.get_email_details() output, deterministic for a given seed.
+generate_messages() wraps the same emails in Gmail message resources with
+the MIME layouts and charsets real mail clients and web forms send.
+"""
+
+import html
+import random
+from bench.fake_transport import make_mime_message, make_multipart, make_part
+from modules.records import EmailMessage
+
+FIRST_NAMES = ['Juan', 'María', 'Lucía', 'Martín', 'Sofía', 'Diego', 'Valentina', 'Joaquín', 'Camila', 'Tomás']
+LAST_NAMES = ['Pérez', 'Gómez', 'Rodríguez', 'Fernández', 'López', 'Martínez', 'García', 'Sánchez', 'Romero', 'Díaz']
+COMPANIES = ['ACME S.A.', 'Globex SRL', 'Initech', 'Umbrella Corp', 'Hooli', 'Soylent', 'Stark Industries', 'Wayne Enterprises']
+DOMAINS = ['gmail.com', 'hotmail.com', 'empresa.com.ar', 'outlook.com', 'yahoo.com']
+SUBJECTS = ['Nueva consulta', 'Nueva consulta desde la web', 'Solicitud de presupuesto']
+
+# Message layouts of generate_messages()
+MIME_FORMATS = (
+    'plain',          # text/plain, UTF-8
+    'plain-latin1',   # text/plain, ISO-8859-1
+    'html-cp1252',    # text/html only, Windows-1252 (Outlook web forms)
+    'alternative',    # multipart/alternative: text/plain + text/html
+    'mixed'           # multipart/mixed: alternative + PDF attachment
+)
+
+FILLER = (
+    'Hola, quisiera recibir más información sobre sus servicios. '
+    'Estamos evaluando proveedores para el próximo trimestre y nos interesa '
+    'conocer precios, plazos de entrega y condiciones de pago.'
+)
+
+def _ascii(text):
+    return text.translate(str.maketrans('áéíóúÁÉÍÓÚñÑ', 'aeiouAEIOUnN'))
+
+def to_html(rng, lines):
+    """
+    Render body lines as one of several typical web-form HTML layouts.
+    
+    Args:
+        rng: random.Random instance
+        lines: Plain text lines
+    
+    Returns:
+        HTML string
+    """
+    escaped = [html.escape(line) for line in lines]
+    layout = rng.randrange(3)
+    
+    if layout == 0:
+        content = ''.join(f"<p>{line}</p>" for line in escaped)
+    elif layout == 1:
+        rows = []
+        for line in escaped:
+            label, sep, value = line.partition(':')
+            if sep:
+                rows.append(f"<tr><td><b>{label}:</b></td><td>{value.strip()}</td></tr>")
+            else:
+                rows.append(f'<tr><td colspan="2">{line}</td></tr>')
+        content = f"<table border=\"0\">{''.join(rows)}</table>"
+    else:
+        content = '<br>\n'.join(f"<span style=\"color:#333\">{line}</span>" for line in escaped)
+    
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><title>Consulta</title>'
+        '<style>td { padding: 4px; }</style></head>'
+        f'<body><div class="form">{content}</div>'
+        '<script>var tracking = "x";</script></body></html>'
+    )
+
+def make_lead_email(rng, index, html_ratio=0.0):
+    """
+    Build one synthetic lead email.
+    
+    Args:
+        rng: random.Random instance
+        index: Sequence number (used for unique IDs and addresses)
+        html_ratio: Probability the body is HTML instead of plain text
+    
+    Returns:
+        EmailMessage
+    """
+    first = rng.choice(FIRST_NAMES)
+    last = rng.choice(LAST_NAMES)
+    name = f"{first} {last}"
+    email = f"{_ascii(first).lower()}.{_ascii(last).lower()}{index}@{rng.choice(DOMAINS)}"
+    phone = rng.choice([
+        f"+54 11 {rng.randint(4000, 6999)}-{rng.randint(1000, 9999)}",
+        f"(011) {rng.randint(4000, 6999)} {rng.randint(1000, 9999)}",
+        f"11{rng.randint(40000000, 69999999)}"
+    ])
+    company = rng.choice(COMPANIES)
+    
+    lines = [FILLER]
+    # Web forms send from a no-reply address with the data in the body;
+    # direct emails carry the name in From
+    if rng.random() < 0.5:
+        sender = 'no-reply@miempresa.com'
+        lines += [f"Nombre: {name}", f"Email: {email}", f"Teléfono: {phone}", f"Empresa: {company}"]
+    else:
+        sender = f"{name} <{email}>"
+        lines += [f"Mi número es {phone}.", f"Trabajo en la empresa: {company}"]
+    lines.append('Saludos.')
+    
+    return EmailMessage(
+        f"msg{index:06d}",
+        sender=sender,
+        subject=rng.choice(SUBJECTS),
+        date=f"Mon, {1 + index % 28} Oct 2023 10:{index % 60:02d}:00 -0300",
+        body=to_html(rng, lines) if rng.random() < html_ratio else '\n'.join(lines)
+    )
+
+def generate_emails(count, seed=42, html_ratio=0.0):
+    """
+    Generate synthetic lead emails.
+    
+    Args:
+        count: Number of emails
+        seed: Random seed
+        html_ratio: Fraction of emails with an HTML body
+    
+    Returns:
+        List of EmailMessage objects
+    """
+    rng = random.Random(seed)
+    return [make_lead_email(rng, i, html_ratio) for i in range(count)]
+
+def to_gmail_message(rng, email, layout):
+    """
+    Wrap a plain-text EmailMessage in a Gmail message resource.
+    
+    Args:
+        rng: random.Random instance
+        email: EmailMessage with a plain text body
+        layout: One of MIME_FORMATS
+    
+    Returns:
+        Dictionary shaped like a messages().get(format='full') response
+    """
+    lines = email.body.split('\n')
+    
+    if layout == 'plain':
+        payload = make_part(email.body)
+    elif layout == 'plain-latin1':
+        payload = make_part(email.body, charset='iso-8859-1')
+    elif layout == 'html-cp1252':
+        payload = make_part(to_html(rng, lines), 'text/html', charset='windows-1252')
+    else:
+        payload = make_multipart([make_part(email.body), make_part(to_html(rng, lines), 'text/html')])
+        if layout == 'mixed':
+            attachment = make_part('%PDF-1.4 presupuesto', 'application/pdf', filename='presupuesto.pdf')
+            payload = make_multipart([payload, attachment], 'multipart/mixed')
+    
+    return make_mime_message(email.id, email.sender, email.subject, payload, email.date)
+
+def generate_messages(count, seed=42, formats=MIME_FORMATS):
+    """
+    Generate Gmail message resources for synthetic lead emails.
+    
+    Layouts are assigned round-robin, so every format is equally
+    represented.
+    
+    Args:
+        count: Number of messages
+        seed: Random seed
+        formats: Layouts to use (see MIME_FORMATS)
+    
+    Returns:
+        Dictionary of message ID -> message resource
+    """
+    rng = random.Random(seed)
+    emails = generate_emails(count, seed)
+    return {
+        email.id: to_gmail_message(rng, email, formats[i % len(formats)])
+        for i, email in enumerate(emails)
+    }
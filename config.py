@@ -11,22 +11,109 @@ GMAIL_USER = os.getenv('GMAIL_USER', 'your-email@gmail.com')
 SHEETS_ID = os.getenv('SHEETS_ID', '')
 SHEET_NAME = os.getenv('SHEET_NAME', 'Leads')
 
+# Local snapshot of the duplicate index (empty disables it)
+DEDUP_SNAPSHOT_FILE = os.getenv('DEDUP_SNAPSHOT_FILE', '')
+
+# Seconds before the cached header row is re-read (0 = keep for the whole run)
+HEADER_CACHE_TTL_SECONDS = float(os.getenv('HEADER_CACHE_TTL_SECONDS', '0'))
+
+# Leads buffered before one batched append (flushes on whichever limit is hit first)
+LEAD_BATCH_SIZE = max(1, int(os.getenv('LEAD_BATCH_SIZE', '100')))
+LEAD_BATCH_MAX_BYTES = int(os.getenv('LEAD_BATCH_MAX_BYTES', '1000000'))
+
+# Lead output: 'sheets' (Google Sheets) or a local 'csv', 'jsonl' or 'sqlite'
+# file (OUTPUT_FILE, default data/leads.<backend>); local files are fsynced
+# once per batch unless OUTPUT_FSYNC is False
+OUTPUT_BACKEND = os.getenv('OUTPUT_BACKEND', 'sheets').lower()
+OUTPUT_FILE = os.getenv('OUTPUT_FILE', '')
+OUTPUT_FSYNC = os.getenv('OUTPUT_FSYNC', 'True').lower() == 'true'
+
+# Duplicate detection: emails are compared case-insensitively (Gmail dots and
+# +tags ignored) and phones in E.164 form, with PHONE_COUNTRY_CODE for numbers
+# written without one. DEDUP_FUZZY_THRESHOLD (0-1, 0 disables) also flags
+# leads whose name + company are that similar to a stored one
+PHONE_COUNTRY_CODE = os.getenv('PHONE_COUNTRY_CODE', '54').lstrip('+')
+DEDUP_MATCH_PHONE = os.getenv('DEDUP_MATCH_PHONE', 'True').lower() == 'true'
+DEDUP_FUZZY_THRESHOLD = float(os.getenv('DEDUP_FUZZY_THRESHOLD', '0'))
+
 # Email Search Configuration
 SEARCH_QUERY = os.getenv('SEARCH_QUERY', 'subject:Nueva consulta')
 MARK_AS_READ = os.getenv('MARK_AS_READ', 'True').lower() == 'true'
+PROCESSED_LABEL = os.getenv('PROCESSED_LABEL', '')  # Optional label added to processed emails
 SEND_CONFIRMATION = os.getenv('SEND_CONFIRMATION', 'False').lower() == 'true'
 CONFIRMATION_EMAIL = os.getenv('CONFIRMATION_EMAIL', 'noreply@mycompany.com')
 
+# Mailbox sync: 'query' re-runs SEARCH_QUERY every time, 'incremental' only
+# looks at messages added since the last run (Gmail history API)
+SYNC_MODE = os.getenv('SYNC_MODE', 'query').lower()
+HISTORY_CHECKPOINT_FILE = os.getenv('HISTORY_CHECKPOINT_FILE', 'data/gmail_history.json')
+
+# Processed-message ledger (SQLite); empty disables it
+LEDGER_FILE = os.getenv('LEDGER_FILE', 'data/ledger.sqlite3')
+LEDGER_RETENTION_DAYS = int(os.getenv('LEDGER_RETENTION_DAYS', '90'))
+
+# Mailbox drain (0 disables the cap / time budget)
+GMAIL_PAGE_SIZE = min(int(os.getenv('GMAIL_PAGE_SIZE', '100')), 500)
+MAX_EMAILS_PER_RUN = int(os.getenv('MAX_EMAILS_PER_RUN', '0'))
+DRAIN_TIME_BUDGET_SECONDS = float(os.getenv('DRAIN_TIME_BUDGET_SECONDS', '0'))
+
+# Messages fetched per HTTP batch request (Gmail allows up to 100, recommends 50)
+GMAIL_BATCH_SIZE = max(1, min(int(os.getenv('GMAIL_BATCH_SIZE', '50')), 100))
+
+# Bytes of each email body decoded (0 = no limit); lead data is near the top
+MAX_BODY_BYTES = int(os.getenv('MAX_BODY_BYTES', '102400'))
+
+# Processed emails buffered before a batchModify flush (Gmail allows up to 1000)
+ACK_BATCH_SIZE = max(1, min(int(os.getenv('ACK_BATCH_SIZE', '1000')), 1000))
+
+# Emails sent to each extraction worker at once (python main.py --workers N)
+EXTRACT_CHUNK_SIZE = max(1, int(os.getenv('EXTRACT_CHUNK_SIZE', '50')))
+
+# Asyncio pipeline (python main.py --async): concurrent Gmail fetch batches
+# and the maximum items waiting between stages
+ASYNC_FETCH_CONCURRENCY = max(1, int(os.getenv('ASYNC_FETCH_CONCURRENCY', '4')))
+ASYNC_QUEUE_SIZE = max(1, int(os.getenv('ASYNC_QUEUE_SIZE', '200')))
+
+# Client-side API throttling and retries. Gmail allows 250 quota units per
+# user per second; Sheets 60 read and 60 write requests per user per minute
+GMAIL_QUOTA_UNITS_PER_SECOND = float(os.getenv('GMAIL_QUOTA_UNITS_PER_SECOND', '250'))
+SHEETS_REQUESTS_PER_MINUTE = float(os.getenv('SHEETS_REQUESTS_PER_MINUTE', '60'))
+API_MAX_RETRIES = int(os.getenv('API_MAX_RETRIES', '5'))
+API_BACKOFF_BASE_SECONDS = float(os.getenv('API_BACKOFF_BASE_SECONDS', '1'))
+API_BACKOFF_MAX_SECONDS = float(os.getenv('API_BACKOFF_MAX_SECONDS', '32'))
+
+# Email validation: 'dns' (syntax + cached MX lookup per domain) or 'syntax' (offline)
+EMAIL_VALIDATION = os.getenv('EMAIL_VALIDATION', 'dns').lower()
+EMAIL_DNS_CACHE_SIZE = int(os.getenv('EMAIL_DNS_CACHE_SIZE', '1024'))
+EMAIL_DNS_CACHE_TTL_SECONDS = float(os.getenv('EMAIL_DNS_CACHE_TTL_SECONDS', '3600'))
+
 # Logging Configuration
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
 LOG_FILE = os.getenv('LOG_FILE', 'logs/lead_extractor.log')
+# 'text' or 'json' (one object per line)
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()
+# Per-lead messages logged per second from each call site; the rest are
+# counted and summarized (0 logs them all)
+LOG_SAMPLE_PER_SECOND = float(os.getenv('LOG_SAMPLE_PER_SECOND', '10'))
 
-# Scheduling
-RUN_EVERY_HOURS = int(os.getenv('RUN_EVERY_HOURS', '1'))
+# Run report: per-stage latency (p50/p95), API calls and bytes, written
+# after every run as JSON and, optionally, as a Prometheus textfile
+# (empty disables either)
+METRICS_REPORT_FILE = os.getenv('METRICS_REPORT_FILE', 'data/run_report.json')
+METRICS_PROMETHEUS_FILE = os.getenv('METRICS_PROMETHEUS_FILE', '')
+
+# Scheduling (python main.py --daemon): interval between runs and the
+# random +/- offset applied to it
+RUN_EVERY_HOURS = float(os.getenv('RUN_EVERY_HOURS', '1'))
+RUN_JITTER_SECONDS = float(os.getenv('RUN_JITTER_SECONDS', '60'))
 
 # Credentials file path
 CREDENTIALS_FILE = 'credentials.json'
 
+# Saved OAuth token (JSON), and how early it is refreshed before expiring
+TOKEN_FILE = os.getenv('TOKEN_FILE', 'data/token.json')
+TOKEN_REFRESH_MARGIN_SECONDS = int(os.getenv('TOKEN_REFRESH_MARGIN_SECONDS', '300'))
+
 # Create logs directory if it doesn't exist
 if not os.path.exists(os.path.dirname(LOG_FILE)):
     os.makedirs(os.path.dirname(LOG_FILE), exist_ok=True)
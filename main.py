@@ -7,102 +7,353 @@ and appends them to a Google Sheet automatically.
 
 Usage:
     python main.py              # Run once
-    python schedule_unix.py     # Run every hour (Linux/macOS)
-    python schedule_windows.py  # Run every hour (Windows)
+    python main.py --workers 4  # Run once, extracting in 4 processes
+    python main.py --async      # Run once with concurrent fetch/extract/write stages
+    python main.py --daemon     # Keep running, every RUN_EVERY_HOURS
 """
 
+import argparse
+import signal
 import sys
-from modules.logger import setup_logger
+import threading
+import time
+import schedule
+from modules.logger import setup_logger, PER_LEAD
+from modules.api_executor import get_executor
+from modules.credentials import get_credentials_provider
+from modules.metrics import get_metrics
 from modules.gmail_reader import GmailReader
 from modules.data_extractor import DataExtractor
-from modules.sheets_writer import SheetsWriter
-from config import SEARCH_QUERY, MARK_AS_READ
+from modules.sinks import DuplicateCheckError, create_sink
+from modules.lead_buffer import LeadBuffer, commit_leads, resume_acks, settle_duplicate
+from modules.ledger import MessageLedger
+from modules.extraction_stage import extract_serial, extract_parallel
+from config import SEARCH_QUERY, OUTPUT_BACKEND, LEDGER_FILE, RUN_EVERY_HOURS, RUN_JITTER_SECONDS
 
 # Initialize logger
 logger = setup_logger(__name__)
 
-def main():
+def process_emails(gmail, extractor, sink, workers=0, ordered=False, ledger=None):
+    """
+    Run one pass of the sequential pipeline.
+    
+    Emails are listed and fetched lazily, extracted (optionally in worker
+    processes), de-duplicated, written in batches and acknowledged once
+    their batch is committed.
+    
+    Args:
+        gmail: GmailReader instance
+        extractor: DataExtractor instance
+        sink: LeadSink (SheetsWriter or a local backend)
+        workers: Extraction processes (0 or 1 extracts on the main thread)
+        ordered: With workers, keep leads in email order
+        ledger: Optional MessageLedger; emails already written by an earlier
+            run are skipped and their pending acknowledgements retried
+    
+    Returns:
+        Dictionary with processed, successful, failed and duplicates counts
+    """
+    # Read emails (lazily, page by page)
+    logger.info(f"Fetching emails with query: {SEARCH_QUERY}")
+    message_ids = gmail.iter_message_ids(SEARCH_QUERY)
+    if ledger:
+        resume_acks(ledger, gmail)
+        message_ids = ledger.skip_done(message_ids)
+    emails = gmail.iter_emails(message_ids)
+    
+    # Extract leads and append them in batches
+    buffer = LeadBuffer(sink)
+    stats = {'processed': 0, 'successful': 0, 'failed': 0, 'duplicates': 0}
+    stopped = False
+    
+    if workers > 1:
+        logger.info(f"Extracting with {workers} worker processes")
+        extracted = extract_parallel(emails, workers, ordered)
+    else:
+        extracted = extract_serial(extractor, emails)
+    
+    for email, lead, valid in extracted:
+        stats['processed'] += 1
+        try:
+            if not lead:
+                logger.warning(f"Failed to extract data from email: {email.subject or 'N/A'}", extra=PER_LEAD)
+                stats['failed'] += 1
+                if ledger:
+                    ledger.mark([email.id], 'fetched')
+                continue
+            
+            # Validate lead
+            if not valid:
+                logger.warning(f"Lead validation failed: {lead.email}", extra=PER_LEAD)
+                stats['failed'] += 1
+                if ledger:
+                    ledger.mark([email.id], 'fetched')
+                continue
+            
+            if ledger:
+                ledger.mark([email.id], 'extracted', lead.email)
+            
+            # Check duplicates (already stored or waiting in the buffer)
+            try:
+                duplicate = settle_duplicate(lead, email.id, sink, buffer, gmail, ledger=ledger)
+            except DuplicateCheckError as e:
+                # Without the index every lead could be a duplicate: stop
+                # here, unprocessed emails stay unread for the next run
+                logger.error(f"{e} - stopping this run")
+                stats['failed'] += 1
+                stopped = True
+                break
+            
+            if duplicate:
+                logger.info(f"Duplicate lead found ({duplicate}): {lead.email}", extra=PER_LEAD)
+                get_metrics().count(f"duplicates.{duplicate}")
+                stats['duplicates'] += 1
+                continue
+            
+            # Buffer lead; write the batch once it is full
+            if buffer.add(lead, email.id):
+                written, not_written = commit_leads(buffer, gmail, ledger=ledger)
+                stats['successful'] += written
+                stats['failed'] += not_written
+        
+        except Exception as e:
+            logger.error(f"Error processing email: {e}")
+            stats['failed'] += 1
+            gmail.mark_unsettled([email.id])
+    
+    # Write remaining leads, then mark their emails as read
+    written, not_written = commit_leads(buffer, gmail, ledger=ledger)
+    stats['successful'] += written
+    stats['failed'] += not_written
+    gmail.flush_acks()
+    sink.save_dedup_snapshot()
+    if not stopped:
+        gmail.commit_history_checkpoint()
+    
+    return stats
+
+def run_cycle(gmail, extractor, sink, ledger=None, workers=0, ordered=False, use_async=False):
+    """
+    Process new emails once with already initialized components.
+    
+    Args:
+        gmail: GmailReader instance
+        extractor: DataExtractor instance
+        sink: LeadSink (SheetsWriter or a local backend)
+        ledger: Optional MessageLedger
+        workers: Extraction processes (0 or 1 extracts on the main thread)
+        ordered: With workers, keep leads in email order
+        use_async: Run fetch, extract and write as concurrent asyncio stages
+    
+    Returns:
+        Dictionary with processed, successful, failed and duplicates counts
+    """
+    # Counters are reported per cycle
+    get_metrics().reset()
+    extractor.validation.reset()
+    for api in ('gmail', 'sheets'):
+        get_executor(api).reset()
+    
+    # Refresh a nearly expired token once, before requests run concurrently
+    get_credentials_provider().refresh_if_needed()
+    
+    if ledger:
+        ledger.prune()
+    
+    if use_async:
+        # asyncio is only loaded for --async runs
+        import asyncio
+        from modules.async_pipeline import AsyncPipeline
+        
+        logger.info("Running asyncio pipeline")
+        pipeline = AsyncPipeline(gmail, extractor, sink, ledger=ledger)
+        return asyncio.run(pipeline.run(SEARCH_QUERY))
+    
+    return process_emails(gmail, extractor, sink, workers, ordered, ledger)
+
+def log_summary(stats, extractor, sink):
+    """
+    Log the result of a run and write the run report.
+    
+    Args:
+        stats: Dictionary returned by run_cycle
+        extractor: DataExtractor instance
+        sink: LeadSink (SheetsWriter or a local backend)
+    """
+    if not stats['processed']:
+        get_metrics().write_reports(stats)
+        logger.info("No new emails found.")
+        return
+    
+    # Known from the duplicate index and append responses, no extra read
+    row_count = sink.get_row_count()
+    report = get_metrics().write_reports(stats, row_count)
+    
+    logger.info("="*50)
+    logger.info(f"Processing Complete:")
+    logger.info(f"  Processed: {stats['processed']}")
+    logger.info(f"  Successful: {stats['successful']}")
+    logger.info(f"  Failed: {stats['failed']}")
+    logger.info(f"  Duplicates: {stats['duplicates']}")
+    validation = extractor.validation.stats()
+    if validation['mode'] == 'dns':
+        logger.info(
+            f"  Email DNS cache: {validation['cache_hits']} hits, "
+            f"{validation['cache_misses']} lookups ({validation['lookup_seconds']}s)"
+        )
+    for api in ('gmail', 'sheets'):
+        api_stats = get_executor(api).stats()
+        if api_stats['requests']:
+            logger.info(
+                f"  {api.capitalize()} API: {api_stats['requests']} requests, "
+                f"{api_stats['retries']} retries, throttled {api_stats['throttle_wait_seconds']}s, "
+                f"backoff {api_stats['backoff_seconds']}s"
+            )
+    for name, totals in report['bytes'].items():
+        logger.info(f"  {name.capitalize()} bytes: {totals['sent']} sent, {totals['received']} received")
+    logger.info(f"  Total Rows: {row_count}")
+    logger.info("  Stage timings (calls, p50/p95 ms):")
+    for name, stage in report['stages'].items():
+        logger.info(f"    {name}: {stage['count']}, {stage['p50_ms']}/{stage['p95_ms']}")
+    logger.info("="*50)
+
+def build_components():
+    """
+    Authenticate and create the pipeline components.
+    
+    Returns:
+        Tuple (gmail, extractor, sink, ledger); ledger is None when
+        LEDGER_FILE is empty
+    """
+    logger.info("Initializing Gmail Reader...")
+    gmail = GmailReader()
+    
+    logger.info("Initializing Data Extractor...")
+    extractor = DataExtractor()
+    
+    logger.info(f"Initializing {OUTPUT_BACKEND} output...")
+    sink = create_sink()
+    
+    ledger = MessageLedger(LEDGER_FILE) if LEDGER_FILE else None
+    return gmail, extractor, sink, ledger
+
+def main(workers=0, ordered=False, use_async=False):
     """
     Main orchestration function.
+    
+    Args:
+        workers: Extraction processes (0 or 1 extracts on the main thread)
+        ordered: With workers, keep leads in email order instead of
+            completion order
+        use_async: Run fetch, extract and write as concurrent asyncio stages
     """
     logger.info("="*50)
     logger.info("Starting Lead Extractor")
     logger.info("="*50)
     
     try:
-        # Initialize components
-        logger.info("Initializing Gmail Reader...")
-        gmail = GmailReader()
-        
-        logger.info("Initializing Data Extractor...")
-        extractor = DataExtractor()
-        
-        logger.info("Initializing Sheets Writer...")
-        sheets = SheetsWriter()
-        
-        # Read emails
-        logger.info(f"Fetching emails with query: {SEARCH_QUERY}")
-        emails = gmail.get_unread_emails(SEARCH_QUERY)
-        
-        if not emails:
-            logger.info("No new emails found.")
-            return
-        
-        logger.info(f"Found {len(emails)} emails. Processing...")
+        gmail, extractor, sink, ledger = build_components()
         
-        # Extract and append leads
-        successful = 0
-        failed = 0
-        duplicates = 0
-        
-        for email in emails:
-            try:
-                # Extract data
-                lead = extractor.extract_from_email(email)
-                
-                if not lead:
-                    logger.warning(f"Failed to extract data from email: {email.get('subject', 'N/A')}")
-                    failed += 1
-                    continue
-                
-                # Validate lead
-                if not extractor.validate_lead(lead):
-                    logger.warning(f"Lead validation failed: {lead.get('email', 'N/A')}")
-                    failed += 1
-                    continue
-                
-                # Check duplicates
-                if sheets.check_duplicate(lead['email']):
-                    logger.info(f"Duplicate lead found: {lead['email']}")
-                    duplicates += 1
-                    continue
-                
-                # Append to sheets
-                if sheets.append_lead(lead):
-                    successful += 1
-                    
-                    # Mark email as read
-                    if MARK_AS_READ:
-                        gmail.mark_as_read(email['id'])
-                else:
-                    failed += 1
-            
-            except Exception as e:
-                logger.error(f"Error processing email: {e}")
-                failed += 1
-        
-        # Summary
-        logger.info("="*50)
-        logger.info(f"Processing Complete:")
-        logger.info(f"  Successful: {successful}")
-        logger.info(f"  Failed: {failed}")
-        logger.info(f"  Duplicates: {duplicates}")
-        logger.info(f"  Total Rows: {sheets.get_row_count()}")
-        logger.info("="*50)
+        try:
+            stats = run_cycle(gmail, extractor, sink, ledger, workers, ordered, use_async)
+            log_summary(stats, extractor, sink)
+        finally:
+            if ledger:
+                ledger.close()
+            sink.close()
     
     except Exception as e:
         logger.error(f"Fatal error: {e}", exc_info=True)
         sys.exit(1)
 
+def run_daemon(workers=0, ordered=False, use_async=False):
+    """
+    Run forever, processing new emails every RUN_EVERY_HOURS.
+    
+    Services, credentials, the header cache, the duplicate index and the
+    ledger are created once and reused by every cycle. Each cycle starts
+    RUN_EVERY_HOURS after the previous one, give or take up to
+    RUN_JITTER_SECONDS. SIGTERM/SIGINT let the current cycle finish and
+    then exit.
+    
+    Args:
+        workers: Extraction processes (0 or 1 extracts on the main thread)
+        ordered: With workers, keep leads in email order
+        use_async: Run fetch, extract and write as concurrent asyncio stages
+    """
+    logger.info("="*50)
+    logger.info(f"Starting Lead Extractor daemon (every {RUN_EVERY_HOURS}h)")
+    logger.info("="*50)
+    
+    stop = threading.Event()
+    
+    def request_stop(signum, frame):
+        logger.info(f"Received signal {signum}, shutting down after the current cycle")
+        stop.set()
+    
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    
+    try:
+        gmail, extractor, sink, ledger = build_components()
+    except Exception as e:
+        logger.error(f"Fatal error: {e}", exc_info=True)
+        sys.exit(1)
+    
+    cycle_count = 0
+    
+    def cycle():
+        nonlocal cycle_count
+        cycle_count += 1
+        started = time.monotonic()
+        try:
+            stats = run_cycle(gmail, extractor, sink, ledger, workers, ordered, use_async)
+            log_summary(stats, extractor, sink)
+        except Exception as e:
+            # Keep the daemon alive; the next cycle retries
+            logger.error(f"Cycle {cycle_count} failed: {e}", exc_info=True)
+        logger.info(f"Cycle {cycle_count} finished in {time.monotonic() - started:.2f}s")
+    
+    interval = RUN_EVERY_HOURS * 3600
+    jitter = min(RUN_JITTER_SECONDS, interval)
+    scheduler = schedule.Scheduler()
+    
+    try:
+        cycle()
+        
+        # Scheduled after the first cycle, so the interval counts from its end
+        scheduler.every(max(int(interval - jitter), 1)).to(max(int(interval + jitter), 1)).seconds.do(cycle)
+        while not stop.is_set():
+            scheduler.run_pending()
+            idle = scheduler.idle_seconds
+            stop.wait(max(idle, 0) if idle is not None else interval)
+    finally:
+        if ledger:
+            ledger.close()
+        sink.close()
+        logger.info(f"Lead Extractor daemon stopped after {cycle_count} cycles")
+
+def parse_args():
+    """
+    Parse command line arguments.
+    
+    Returns:
+        argparse.Namespace
+    """
+    parser = argparse.ArgumentParser(description='Extract leads from Gmail into Google Sheets.')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='extract leads in N worker processes (default: main thread)')
+    parser.add_argument('--ordered', action='store_true',
+                        help='with --workers, write leads in email order instead of completion order')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='run fetch, extract and write as concurrent asyncio stages')
+    parser.add_argument('--daemon', action='store_true',
+                        help='keep running, processing new emails every RUN_EVERY_HOURS')
+    return parser.parse_args()
+
 if __name__ == '__main__':
-    main()
+    args = parse_args()
+    if args.daemon:
+        run_daemon(workers=args.workers, ordered=args.ordered, use_async=args.use_async)
+    else:
+        main(workers=args.workers, ordered=args.ordered, use_async=args.use_async)
@@ -1,13 +1,35 @@
-"""Lead Extractor modules package."""
-
-from modules.logger import setup_logger
-from modules.gmail_reader import GmailReader
-from modules.data_extractor import DataExtractor
-from modules.sheets_writer import SheetsWriter
-
-__all__ = [
-    'setup_logger',
-    'GmailReader',
-    'DataExtractor',
-    'SheetsWriter'
-]
+"""Lead Extractor modules package.
+
+Classes are imported on first access, so importing one submodule does not
+load the Google client stack for all of them.
+"""
+
+import importlib
+
+_EXPORTS = {
+    'setup_logger': 'modules.logger',
+    'GmailReader': 'modules.gmail_reader',
+    'DataExtractor': 'modules.data_extractor',
+    'SheetsWriter': 'modules.sheets_writer',
+    'LeadBuffer': 'modules.lead_buffer',
+    'AsyncPipeline': 'modules.async_pipeline',
+    'MessageLedger': 'modules.ledger',
+    'EmailMessage': 'modules.records',
+    'Lead': 'modules.records',
+    'LeadSink': 'modules.sinks',
+    'create_sink': 'modules.sinks',
+    'DedupIndex': 'modules.dedup'
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module 'modules' has no attribute '{name}'")
+    
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
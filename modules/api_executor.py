@@ -0,0 +1,329 @@
+import json
+import random
+import ssl
+import threading
+import time
+import httplib2
+from googleapiclient.errors import HttpError
+from modules.logger import setup_logger
+from modules.metrics import get_metrics
+from config import (
+    GMAIL_QUOTA_UNITS_PER_SECOND,
+    SHEETS_REQUESTS_PER_MINUTE,
+    API_MAX_RETRIES,
+    API_BACKOFF_BASE_SECONDS,
+    API_BACKOFF_MAX_SECONDS
+)
+
+logger = setup_logger(__name__)
+
+# Server-side errors worth retrying
+RETRYABLE_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+# 403 reasons that mean "slow down" rather than "forbidden"
+RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded')
+
+# Transport errors worth retrying
+RETRYABLE_ERRORS = (ConnectionError, TimeoutError, ssl.SSLError, httplib2.HttpLib2Error)
+
+def is_rate_limited(error):
+    """
+    Check if an error is a quota rejection (the request was not processed).
+    
+    Args:
+        error: Exception raised by a request
+    
+    Returns:
+        Boolean
+    """
+    if not isinstance(error, HttpError):
+        return False
+    
+    status = error.resp.status
+    if status == 429:
+        return True
+    if status != 403:
+        return False
+    
+    try:
+        content = error.content.decode('utf-8') if isinstance(error.content, bytes) else error.content
+        errors = json.loads(content).get('error', {}).get('errors', [])
+        return any(item.get('reason') in RATE_LIMIT_REASONS for item in errors)
+    except Exception:
+        return False
+
+def is_retryable(error):
+    """
+    Check if a failed request may succeed when sent again.
+    
+    Args:
+        error: Exception raised by a request
+    
+    Returns:
+        Boolean
+    """
+    if isinstance(error, HttpError):
+        return error.resp.status in RETRYABLE_STATUSES or is_rate_limited(error)
+    return isinstance(error, RETRYABLE_ERRORS)
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: rate tokens per second, up to capacity.
+    """
+    
+    def __init__(self, rate, capacity):
+        """
+        Args:
+            rate: Tokens added per second (0 = unlimited)
+            capacity: Maximum tokens stored (burst size)
+        """
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self, tokens=1):
+        """
+        Take tokens, sleeping until they are available.
+        
+        Requests larger than the capacity wait for a full bucket.
+        
+        Args:
+            tokens: Tokens to take
+        
+        Returns:
+            Seconds spent waiting
+        """
+        if not self.rate:
+            return 0.0
+        
+        tokens = min(tokens, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            
+            time.sleep(delay)
+            waited += delay
+
+class ApiExecutor:
+    """
+    Sends Google API requests with client-side throttling and retries.
+    
+    Every request first takes its quota cost from a token bucket sized to
+    the API's quota, so sustained throughput stays just under the limit
+    instead of bouncing off it. Retryable failures (429, 5xx, rate-limit
+    403s, connection errors) are retried with exponential backoff and full
+    jitter, honouring Retry-After. Throttle waits, retries and backoff time
+    are counted in stats().
+    """
+    
+    def __init__(self, name, rate=0, capacity=1, max_retries=API_MAX_RETRIES,
+                 backoff_base=API_BACKOFF_BASE_SECONDS, backoff_max=API_BACKOFF_MAX_SECONDS):
+        """
+        Initialize executor.
+        
+        Args:
+            name: API name used in logs (e.g., 'gmail')
+            rate: Quota units per second (0 = no throttling)
+            capacity: Quota units that may be spent in a burst
+            max_retries: Retries after the first attempt
+            backoff_base: First backoff delay in seconds
+            backoff_max: Maximum backoff delay in seconds
+        """
+        self.name = name
+        self.bucket = TokenBucket(rate, capacity)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self.reset()
+    
+    def execute(self, request, cost=1, http=None, idempotent=True):
+        """
+        Execute a googleapiclient request.
+        
+        Args:
+            request: HttpRequest (or BatchHttpRequest)
+            cost: Quota units the request consumes
+            http: Optional HTTP object to send it with
+            idempotent: False for requests that must not be repeated once
+                the server may have processed them (e.g., appends); these
+                are only retried on quota rejections
+        
+        Returns:
+            API response
+        """
+        method = self._method_name(request)
+        if http is None:
+            return self.call(request.execute, cost, idempotent, method)
+        return self.call(lambda: request.execute(http=http), cost, idempotent, method)
+    
+    def call(self, function, cost=1, idempotent=True, method='call'):
+        """
+        Run function under throttling and retries.
+        
+        Every attempt is timed as stage 'api.<name>.<method>' in the run
+        metrics.
+        
+        Args:
+            function: Callable sending one request
+            cost: Quota units the request consumes
+            idempotent: See execute
+            method: API method name for metrics (e.g., 'users.messages.get')
+        
+        Returns:
+            Whatever function returns
+        """
+        metrics = get_metrics()
+        stage = f"api.{self.name}.{method}"
+        attempt = 0
+        while True:
+            waited = self.bucket.acquire(cost)
+            self._count('requests', 1, waited)
+            if waited:
+                metrics.observe(f"api.{self.name}.throttle_wait", waited)
+            
+            try:
+                with metrics.timer(stage):
+                    return function()
+            
+            except Exception as e:
+                retryable = is_rate_limited(e) if not idempotent else is_retryable(e)
+                if not retryable or attempt >= self.max_retries:
+                    self._count('errors')
+                    metrics.count(f"api.{self.name}.errors")
+                    raise
+                
+                self.wait_before_retry(attempt, e)
+                attempt += 1
+    
+    def wait_before_retry(self, attempt, error, what='request'):
+        """
+        Log, count and sleep the backoff delay before a retry.
+        
+        Also used for retries made outside call(), such as re-sending the
+        failed calls of a batch.
+        
+        Args:
+            attempt: Retries already made
+            error: Exception that triggered the retry
+            what: Description for the log message
+        
+        Returns:
+            Seconds slept
+        """
+        delay = self.backoff_delay(attempt, error)
+        logger.warning(
+            f"{self.name} API {what} failed ({self._describe(error)}), "
+            f"retry {attempt + 1}/{self.max_retries} in {delay:.1f}s"
+        )
+        self._count('retries', 1, 0.0, delay)
+        get_metrics().count(f"api.{self.name}.retries")
+        time.sleep(delay)
+        return delay
+    
+    def backoff_delay(self, attempt, error=None):
+        """
+        Delay before retry number attempt + 1.
+        
+        Full jitter: uniform between 0 and base * 2^attempt (capped), or
+        the server's Retry-After if it asks for longer.
+        
+        Args:
+            attempt: Retries already made
+            error: Exception that triggered the retry
+        
+        Returns:
+            Seconds to sleep
+        """
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        
+        if isinstance(error, HttpError):
+            try:
+                delay = max(delay, float(error.resp.get('retry-after', 0)))
+            except (TypeError, ValueError):
+                pass
+        
+        return delay
+    
+    def stats(self):
+        """
+        Get request, retry and throttling counters.
+        
+        Returns:
+            Dictionary with requests, retries, errors, throttle_wait_seconds
+            and backoff_seconds (times are summed over all threads)
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats['throttle_wait_seconds'] = round(stats['throttle_wait_seconds'], 3)
+        stats['backoff_seconds'] = round(stats['backoff_seconds'], 3)
+        return stats
+    
+    def reset(self):
+        """
+        Zero the counters (the token bucket keeps its level).
+        """
+        with self._lock:
+            self._stats = {
+                'requests': 0,
+                'retries': 0,
+                'errors': 0,
+                'throttle_wait_seconds': 0.0,
+                'backoff_seconds': 0.0
+            }
+    
+    def _count(self, key, amount=1, waited=0.0, backoff=0.0):
+        with self._lock:
+            self._stats[key] += amount
+            self._stats['throttle_wait_seconds'] += waited
+            self._stats['backoff_seconds'] += backoff
+    
+    def _method_name(self, request):
+        """
+        Name of the API method a request calls, without the API prefix.
+        """
+        method_id = getattr(request, 'methodId', None)
+        if method_id:
+            return method_id[len(self.name) + 1:] if method_id.startswith(f"{self.name}.") else method_id
+        return 'batch' if hasattr(request, 'add') else 'request'
+    
+    @staticmethod
+    def _describe(error):
+        if isinstance(error, HttpError):
+            return f"HTTP {error.resp.status}"
+        return type(error).__name__
+
+# Quota per API: (units per second, burst units). Gmail counts quota
+# units per user per second; Sheets counts requests per user per minute.
+API_QUOTAS = {
+    'gmail': (GMAIL_QUOTA_UNITS_PER_SECOND, GMAIL_QUOTA_UNITS_PER_SECOND),
+    'sheets': (SHEETS_REQUESTS_PER_MINUTE / 60, SHEETS_REQUESTS_PER_MINUTE)
+}
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+def get_executor(api):
+    """
+    Get the executor shared by every client of an API in this process.
+    
+    Args:
+        api: 'gmail' or 'sheets'
+    
+    Returns:
+        ApiExecutor instance
+    """
+    with _executors_lock:
+        if api not in _executors:
+            rate, capacity = API_QUOTAS.get(api, (0, 1))
+            _executors[api] = ApiExecutor(api, rate, capacity)
+        return _executors[api]
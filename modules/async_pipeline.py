@@ -0,0 +1,244 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from modules.lead_buffer import LeadBuffer, commit_leads, resume_acks, settle_duplicate
+from modules.logger import setup_logger, PER_LEAD
+from modules.metrics import get_metrics
+from modules.sinks import DuplicateCheckError
+from config import ASYNC_FETCH_CONCURRENCY, ASYNC_QUEUE_SIZE, GMAIL_BATCH_SIZE
+
+logger = setup_logger(__name__)
+
+# Marks the end of a stage's output
+_DONE = object()
+
+class _StopRun(Exception):
+    """
+    Raised by the write stage to end the run early; the other stages are cancelled.
+    """
+
+class AsyncPipeline:
+    """
+    Runs list -> fetch -> extract -> write as concurrent asyncio stages.
+    
+    googleapiclient calls block, so they run in thread pools: one thread
+    lists message IDs, fetch_concurrency threads fetch message batches, one
+    thread extracts leads (email validation may block on DNS) and one
+    thread writes leads to the sink and acknowledges emails. Every thread gets
+    its own httplib2.Http (it is not thread-safe). Stages are linked by
+    bounded queues, so a slow stage applies backpressure to the ones
+    before it.
+    """
+    
+    def __init__(self, gmail, extractor, sink, fetch_concurrency=ASYNC_FETCH_CONCURRENCY,
+                 queue_size=ASYNC_QUEUE_SIZE, ledger=None):
+        """
+        Initialize pipeline.
+        
+        Args:
+            gmail: GmailReader instance
+            extractor: DataExtractor instance
+            sink: LeadSink (see modules.sinks)
+            fetch_concurrency: Gmail batches fetched at the same time
+            queue_size: Maximum emails/leads waiting between stages
+            ledger: Optional MessageLedger (see process_emails)
+        """
+        self.gmail = gmail
+        self.extractor = extractor
+        self.sink = sink
+        self.fetch_concurrency = fetch_concurrency
+        self.queue_size = queue_size
+        self.ledger = ledger
+        self.stats = {}
+    
+    async def run(self, query):
+        """
+        Process every email matching query.
+        
+        Args:
+            query: Gmail search query
+        
+        Returns:
+            Dictionary with processed, successful, failed and duplicates counts
+        """
+        self.stats = {'processed': 0, 'successful': 0, 'failed': 0, 'duplicates': 0}
+        
+        id_queue = asyncio.Queue(max(1, self.queue_size // GMAIL_BATCH_SIZE))
+        email_queue = asyncio.Queue(self.queue_size)
+        lead_queue = asyncio.Queue(self.queue_size)
+        
+        list_pool = ThreadPoolExecutor(1, thread_name_prefix='gmail-list')
+        fetch_pool = ThreadPoolExecutor(self.fetch_concurrency, thread_name_prefix='gmail-fetch')
+        extract_pool = ThreadPoolExecutor(1, thread_name_prefix='lead-extract')
+        write_pool = ThreadPoolExecutor(1, thread_name_prefix='lead-write')
+        
+        tasks = [
+            asyncio.ensure_future(self._list_stage(query, id_queue, list_pool)),
+            asyncio.ensure_future(self._fetch_stage(id_queue, email_queue, fetch_pool)),
+            asyncio.ensure_future(self._extract_stage(email_queue, lead_queue, extract_pool)),
+            asyncio.ensure_future(self._write_stage(lead_queue, write_pool))
+        ]
+        
+        try:
+            # A failing stage would leave the others waiting on their queues
+            done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            for task in done:
+                try:
+                    task.result()
+                except _StopRun:
+                    pass
+        finally:
+            for pool in (list_pool, fetch_pool, extract_pool, write_pool):
+                pool.shutdown(wait=True)
+        
+        return self.stats
+    
+    def _thread_http(self):
+        """
+        Get the HTTP object owned by the calling thread.
+        """
+        return self.gmail.get_http()
+    
+    async def _list_stage(self, query, id_queue, pool):
+        """
+        List matching message IDs and queue them in fetch-sized chunks.
+        """
+        loop = asyncio.get_running_loop()
+        message_ids = self.gmail.iter_message_ids(query)
+        if self.ledger:
+            message_ids = self.ledger.skip_done(message_ids)
+        
+        while True:
+            chunk = await loop.run_in_executor(pool, lambda: list(islice(message_ids, GMAIL_BATCH_SIZE)))
+            if not chunk:
+                break
+            await id_queue.put(chunk)
+        
+        # Only on success: a failing or cancelled stage ends the whole run,
+        # and nothing may be reading a full queue any more
+        for _ in range(self.fetch_concurrency):
+            await id_queue.put(_DONE)
+    
+    async def _fetch_stage(self, id_queue, email_queue, pool):
+        """
+        Fetch queued ID chunks with fetch_concurrency concurrent batches.
+        """
+        loop = asyncio.get_running_loop()
+        
+        def fetch(chunk):
+            return self.gmail.get_emails_batch(chunk, http=self._thread_http())
+        
+        async def worker():
+            while True:
+                chunk = await id_queue.get()
+                if chunk is _DONE:
+                    return
+                emails, failures = await loop.run_in_executor(pool, fetch, chunk)
+                for message_id, error in failures.items():
+                    logger.error(f"Error getting email details for {message_id}: {error}")
+                for email in emails:
+                    await email_queue.put(email)
+        
+        await asyncio.gather(*(worker() for _ in range(self.fetch_concurrency)))
+        await email_queue.put(_DONE)
+    
+    async def _extract_stage(self, email_queue, lead_queue, pool):
+        """
+        Extract and validate leads on the extraction thread.
+        """
+        loop = asyncio.get_running_loop()
+        
+        def extract(email):
+            lead = self.extractor.extract_from_email(email)
+            return lead, bool(lead) and self.extractor.validate_lead(lead)
+        
+        while True:
+            email = await email_queue.get()
+            if email is _DONE:
+                break
+            
+            self.stats['processed'] += 1
+            lead, valid = await loop.run_in_executor(pool, extract, email)
+            
+            if valid:
+                await lead_queue.put((email, lead))
+            else:
+                if not lead:
+                    logger.warning(f"Failed to extract data from email: {email.subject or 'N/A'}", extra=PER_LEAD)
+                else:
+                    logger.warning(f"Lead validation failed: {lead.email}", extra=PER_LEAD)
+                self.stats['failed'] += 1
+                if self.ledger:
+                    self.ledger.mark([email.id], 'fetched')
+        
+        await lead_queue.put(_DONE)
+    
+    async def _write_stage(self, lead_queue, pool):
+        """
+        De-duplicate, buffer and write leads, then acknowledge their emails.
+        
+        All sink calls and acknowledgements run on the single write thread.
+        """
+        loop = asyncio.get_running_loop()
+        buffer = LeadBuffer(self.sink)
+        
+        if self.ledger:
+            await loop.run_in_executor(pool, lambda: resume_acks(self.ledger, self.gmail, self._thread_http()))
+        
+        def write(email, lead):
+            if self.ledger:
+                self.ledger.mark([email.id], 'extracted', lead.email)
+            duplicate = settle_duplicate(lead, email.id, self.sink, buffer, self.gmail, self._thread_http(), self.ledger)
+            if duplicate:
+                logger.info(f"Duplicate lead found ({duplicate}): {lead.email}", extra=PER_LEAD)
+                get_metrics().count(f"duplicates.{duplicate}")
+                return True, 0, 0
+            if buffer.add(lead, email.id):
+                written, not_written = commit_leads(buffer, self.gmail, self._thread_http(), self.ledger)
+                return False, written, not_written
+            return False, 0, 0
+        
+        def finish(completed):
+            written, not_written = commit_leads(buffer, self.gmail, self._thread_http(), self.ledger)
+            self.gmail.flush_acks(self._thread_http())
+            self.sink.save_dedup_snapshot()
+            if completed:
+                self.gmail.commit_history_checkpoint()
+            return written, not_written
+        
+        stopped = False
+        while True:
+            item = await lead_queue.get()
+            if item is _DONE:
+                break
+            
+            try:
+                duplicate, written, not_written = await loop.run_in_executor(pool, write, *item)
+            except DuplicateCheckError as e:
+                # Without the index every lead could be a duplicate: write what
+                # was checked and stop, like process_emails
+                logger.error(f"{e} - stopping this run")
+                self.stats['failed'] += 1
+                stopped = True
+                break
+            except Exception as e:
+                logger.error(f"Error processing email: {e}")
+                self.stats['failed'] += 1
+                self.gmail.mark_unsettled([item[0].id])
+                continue
+            
+            if duplicate:
+                self.stats['duplicates'] += 1
+            self.stats['successful'] += written
+            self.stats['failed'] += not_written
+        
+        written, not_written = await loop.run_in_executor(pool, finish, not stopped)
+        self.stats['successful'] += written
+        self.stats['failed'] += not_written
+        
+        if stopped:
+            # Unprocessed emails stay unread for the next run
+            raise _StopRun()
@@ -0,0 +1,197 @@
+import datetime
+import os
+import threading
+import httplib2
+from google.oauth2 import service_account
+from google.oauth2.credentials import Credentials as UserCredentials
+from google_auth_httplib2 import AuthorizedHttp, Request
+from modules.logger import setup_logger
+from modules.metrics import get_metrics
+from config import CREDENTIALS_FILE, TOKEN_FILE, TOKEN_REFRESH_MARGIN_SECONDS
+
+logger = setup_logger(__name__)
+
+# One set of credentials covers both APIs
+SCOPES = [
+    'https://www.googleapis.com/auth/gmail.modify',
+    'https://www.googleapis.com/auth/spreadsheets'
+]
+
+class MeteredHttp(httplib2.Http):
+    """
+    httplib2.Http that adds request and response body sizes to the run
+    metrics, per API host.
+    """
+    
+    def request(self, uri, method='GET', body=None, headers=None, *args, **kwargs):
+        response, content = super().request(uri, method, body, headers, *args, **kwargs)
+        api = 'sheets' if 'sheets.googleapis.com' in uri else 'gmail' if 'gmail' in uri else 'other'
+        sent = len(body.encode('utf-8')) if isinstance(body, str) else len(body or b'')
+        get_metrics().add_bytes(api, sent=sent, received=len(content or b''))
+        return response, content
+
+class CredentialsProvider:
+    """
+    Loads Google credentials once and shares them between API clients.
+    
+    Service account keys are used when CREDENTIALS_FILE holds one;
+    otherwise the OAuth client flow runs once and its token is saved to
+    TOKEN_FILE (JSON) and reused, refreshed, on later runs. Each API
+    service and each worker thread gets its own keep-alive AuthorizedHttp
+    over the same credentials, so a token is minted once, not per client.
+    """
+    
+    def __init__(self, credentials_file=CREDENTIALS_FILE, token_file=TOKEN_FILE,
+                 refresh_margin=TOKEN_REFRESH_MARGIN_SECONDS):
+        """
+        Initialize provider (nothing is loaded until first use).
+        
+        Args:
+            credentials_file: Service account key or OAuth client secrets
+            token_file: Where the OAuth user token is persisted
+            refresh_margin: Refresh tokens expiring within this many seconds
+        """
+        self.credentials_file = credentials_file
+        self.token_file = token_file
+        self.refresh_margin = refresh_margin
+        self._credentials = None
+        self._lock = threading.RLock()
+        self._local = threading.local()
+    
+    def get_credentials(self):
+        """
+        Get the shared credentials, loading them on first call.
+        
+        Returns:
+            google.auth credentials
+        """
+        with self._lock:
+            if self._credentials is None:
+                self._credentials = self._load()
+                self.refresh_if_needed()
+            return self._credentials
+    
+    def new_http(self):
+        """
+        Create an authorized, keep-alive HTTP object over the shared
+        credentials.
+        
+        Returns:
+            AuthorizedHttp
+        """
+        return AuthorizedHttp(self.get_credentials(), http=MeteredHttp())
+    
+    def http(self):
+        """
+        Get the calling thread's authorized HTTP object.
+        
+        httplib2.Http is not thread-safe but keeps connections open, so each
+        thread reuses one for every request it sends.
+        
+        Returns:
+            AuthorizedHttp
+        """
+        if not hasattr(self._local, 'http'):
+            self._local.http = self.new_http()
+        return self._local.http
+    
+    def refresh_if_needed(self):
+        """
+        Refresh the access token if it expires within refresh_margin.
+        
+        Done up front (e.g., at the start of each run) so concurrent
+        requests never all hit an expired token at once.
+        
+        Returns:
+            Boolean indicating the token was refreshed
+        """
+        with self._lock:
+            creds = self._credentials
+            if creds is None:
+                return False
+            
+            if creds.token and creds.expiry:
+                now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+                remaining = creds.expiry - now
+                if remaining.total_seconds() > self.refresh_margin:
+                    return False
+            
+            try:
+                creds.refresh(Request(httplib2.Http()))
+            except Exception as e:
+                logger.error(f"Error refreshing access token: {e}")
+                return False
+            
+            logger.debug(f"Refreshed access token (expires {creds.expiry})")
+            if isinstance(creds, UserCredentials):
+                self._save_token(creds)
+            return True
+    
+    def _load(self):
+        """
+        Load service account credentials, a saved user token, or run the
+        OAuth flow.
+        
+        Returns:
+            google.auth credentials
+        """
+        try:
+            return service_account.Credentials.from_service_account_file(
+                self.credentials_file,
+                scopes=SCOPES
+            )
+        except Exception as e:
+            logger.warning(f"Could not load service account: {e}")
+        
+        if os.path.exists(self.token_file):
+            try:
+                creds = UserCredentials.from_authorized_user_file(self.token_file, SCOPES)
+                logger.info(f"Loaded saved token from {self.token_file}")
+                return creds
+            except Exception as e:
+                logger.warning(f"Could not load saved token: {e}")
+        
+        logger.info("Attempting OAuth2 flow...")
+        
+        # Imported here, it is slow to load and rarely needed
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        flow = InstalledAppFlow.from_client_secrets_file(self.credentials_file, SCOPES)
+        creds = flow.run_local_server(port=0)
+        self._save_token(creds)
+        return creds
+    
+    def _save_token(self, creds):
+        """
+        Persist a user token as JSON, readable only by the owner.
+        
+        Args:
+            creds: google.oauth2.credentials.Credentials
+        """
+        try:
+            directory = os.path.dirname(self.token_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            
+            tmp_path = f"{self.token_file}.tmp"
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(creds.to_json())
+            os.replace(tmp_path, self.token_file)
+            logger.debug(f"Saved token to {self.token_file}")
+        
+        except Exception as e:
+            logger.warning(f"Error saving token: {e}")
+
+_default_provider = None
+
+def get_credentials_provider():
+    """
+    Get the provider shared by every client in this process.
+    
+    Returns:
+        CredentialsProvider instance
+    """
+    global _default_provider
+    if _default_provider is None:
+        _default_provider = CredentialsProvider()
+    return _default_provider
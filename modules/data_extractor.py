@@ -1,16 +1,100 @@
 import re
-from email_validator import validate_email, EmailNotValidError
-from bs4 import BeautifulSoup
-from modules.logger import setup_logger
+from html.parser import HTMLParser
+from email_validator import EmailNotValidError
+from modules.dedup import clean_email, normalize_phone
+from modules.logger import setup_logger, PER_LEAD
+from modules.email_validation import get_validation_policy
+from modules.metrics import get_metrics
+from modules.records import Lead
 
 logger = setup_logger(__name__)
 
+# Cleanup patterns used on extracted values
+WHITESPACE = re.compile(r'\s+')
+COMPANY_JUNK = re.compile(r'[^a-zA-Z0-9\s.-]')
+
+# Start of a tag, comment or declaration; bodies without one (and without
+# entities) are plain text and skip HTML conversion entirely
+MARKUP = re.compile(r'<[a-zA-Z/!?]')
+
+# Tags that end a line of text
+BLOCK_TAGS = frozenset([
+    'address', 'article', 'aside', 'blockquote', 'br', 'dd', 'div', 'dl', 'dt',
+    'fieldset', 'figcaption', 'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4',
+    'h5', 'h6', 'header', 'hr', 'li', 'main', 'nav', 'ol', 'p', 'pre', 'section',
+    'table', 'tbody', 'td', 'tfoot', 'th', 'thead', 'tr', 'ul'
+])
+
+# Tags whose content is not text
+SKIPPED_TAGS = frozenset(['head', 'script', 'style', 'template', 'title'])
+
+class HTMLTextConverter(HTMLParser):
+    """
+    Streaming HTML-to-text converter.
+    
+    Collects text from parser events without building a tree, inserting a
+    line break at block-level tags so "label: value" lines stay on their
+    own line.
+    """
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._chunks = []
+        self._skip_depth = 0
+    
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self._skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self._chunks.append('\n')
+    
+    def handle_startendtag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self._chunks.append('\n')
+    
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS:
+            self._skip_depth = max(self._skip_depth - 1, 0)
+        elif tag in BLOCK_TAGS:
+            self._chunks.append('\n')
+    
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self._chunks.append(data)
+    
+    def convert(self, html_text):
+        """
+        Convert HTML to text.
+        
+        Args:
+            html_text: HTML string
+        
+        Returns:
+            Text content
+        """
+        self.feed(html_text)
+        self.close()
+        return ''.join(self._chunks)
+
+# Inline letters for flags that can be scoped to one alternative
+SCOPED_FLAGS = {re.IGNORECASE: 'i', re.MULTILINE: 'm', re.DOTALL: 's', re.VERBOSE: 'x'}
+
+# Fields filled by extract_from_email itself; any other pattern field is
+# copied to the lead as-is
+CORE_FIELDS = ('email', 'name', 'phone', 'company')
+
 class DataExtractor:
     """
     Extracts structured data from email content.
+    
+    PATTERNS are compiled once per class into a single scanner that walks the
+    text one time and collects matches for every field. Subclasses may
+    override PATTERNS/PATTERN_FLAGS, or call register_pattern() to add a
+    field; both recompile the scanner.
     """
     
-    # Common patterns for lead data
+    # Common patterns for lead data. Patterns with a capture group are
+    # "label: value" fields and yield group 1; others yield the whole match.
     PATTERNS = {
         'email': r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}',
         'phone': r'(?:\+\d{1,3})?\s?(?:\(?\d{1,4}\)?[-\s.]?)?\d{1,4}[-\s.]?\d{1,4}[-\s.]?\d{1,9}',
@@ -18,113 +102,242 @@ class DataExtractor:
         'name': r'(?:nombre|name)\s*:?\s*([^\n,]+)'
     }
     
+    # Regex flags per field
+    PATTERN_FLAGS = {
+        'company': re.IGNORECASE,
+        'name': re.IGNORECASE
+    }
+    
+    # Optional lookahead checked before trying a field's pattern at a
+    # position; lets the scanner skip most positions cheaply
+    PATTERN_GUARDS = {
+        'phone': r'\s?[+(\d]',
+        'company': r'[ecs]',
+        'name': r'n'
+    }
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._compile_patterns()
+    
+    @classmethod
+    def register_pattern(cls, field, pattern, flags=0, guard=None):
+        """
+        Add or replace the pattern for a field.
+        
+        Args:
+            field: Lead field name (e.g., 'budget')
+            pattern: Regular expression; use one capture group for
+                "label: value" fields
+            flags: re flags (IGNORECASE, MULTILINE, DOTALL, VERBOSE)
+            guard: Optional regex every match must start with (e.g., '[pb]')
+        """
+        cls.PATTERNS = dict(cls.PATTERNS, **{field: pattern})
+        cls.PATTERN_FLAGS = dict(cls.PATTERN_FLAGS, **{field: flags})
+        guards = {f: g for f, g in cls.PATTERN_GUARDS.items() if f != field}
+        if guard:
+            guards[field] = guard
+        cls.PATTERN_GUARDS = guards
+        cls._compile_patterns()
+    
+    @classmethod
+    def _compile_patterns(cls):
+        """
+        Compile PATTERNS into per-field regexes and the combined scanner.
+        
+        The scanner is one alternation tried at each position: emails first
+        (so their digits are never read as phones), then "label: value"
+        fields as zero-width lookaheads (so their value is still scanned for
+        emails and phones), then the remaining fields.
+        """
+        compiled = {}
+        for field, pattern in cls.PATTERNS.items():
+            compiled[field] = re.compile(pattern, cls.PATTERN_FLAGS.get(field, 0))
+        
+        labelled = [f for f in compiled if f != 'email' and compiled[f].groups]
+        plain = [f for f in compiled if f != 'email' and not compiled[f].groups]
+        order = (['email'] if 'email' in compiled else []) + labelled + plain
+        
+        alternatives = []
+        for field in order:
+            flags = cls.PATTERN_FLAGS.get(field, 0)
+            letters = ''.join(letter for flag, letter in SCOPED_FLAGS.items() if flags & flag)
+            group = f"(?P<f_{field}>(?{letters}:{cls.PATTERNS[field]}))"
+            alternative = f"(?={group})" if field in labelled else group
+            guard = cls.PATTERN_GUARDS.get(field)
+            if guard:
+                alternative = f"(?{letters}:(?={guard})){alternative}"
+            alternatives.append(alternative)
+        
+        scanner = re.compile('|'.join(alternatives))
+        
+        # For each field: (group holding the match, group holding the value)
+        groups = {}
+        for field in order:
+            index = scanner.groupindex[f'f_{field}']
+            groups[field] = (index, index + 1 if field in labelled else index)
+        
+        cls.COMPILED_PATTERNS = compiled
+        cls._scanner = scanner
+        cls._scan_groups = groups
+    
+    def scan(self, text):
+        """
+        Collect matches for every field in a single pass over text.
+        
+        Args:
+            text: Text to search
+        
+        Returns:
+            Dictionary of field -> list of matched values, in text order
+        """
+        found = {field: [] for field in self._scan_groups}
+        groups = self._scan_groups
+        
+        for match in self._scanner.finditer(text):
+            # The outer f_<field> group always closes last
+            field = match.lastgroup[2:]
+            found[field].append(match.group(groups[field][1]))
+        
+        return found
+    
+    def __init__(self, validation_policy=None):
+        """
+        Initialize extractor.
+        
+        Args:
+            validation_policy: EmailValidationPolicy (defaults to the shared
+                policy configured by EMAIL_VALIDATION)
+        """
+        self.validation = validation_policy or get_validation_policy()
+    
     def extract_from_email(self, email_data):
         """
         Extract structured data from email.
         
         Args:
-            email_data: Dictionary with 'from', 'subject', 'body' fields
+            email_data: EmailMessage
         
         Returns:
-            Dictionary with extracted fields
+            Lead, or None
         """
+        metrics = get_metrics()
         try:
             # Clean HTML if present
-            body = self._clean_html(email_data.get('body', ''))
-            full_text = f"{email_data.get('subject', '')} {body}"
+            with metrics.timer('extract.clean_html'):
+                body = self._clean_html(email_data.body or '')
             
-            lead = {
-                'timestamp': email_data.get('date', ''),
-                'source': 'Gmail',
-                'name': self._extract_name(email_data, full_text),
-                'email': self._extract_email(email_data, full_text),
-                'phone': self._extract_phone(full_text),
-                'company': self._extract_company(full_text),
-                'subject': email_data.get('subject', ''),
-                'status': 'Nuevo'
+            with metrics.timer('extract.scan'):
+                found = self.scan(f"{email_data.subject} {body}")
+            
+            # Includes email validation (DNS lookups on cache misses)
+            with metrics.timer('extract.fields'):
+                lead = Lead(
+                    timestamp=email_data.date,
+                    source='Gmail',
+                    name=self._extract_name(email_data, found),
+                    email=self._extract_email(email_data, found),
+                    phone=self._extract_phone(found),
+                    company=self._extract_company(found),
+                    subject=email_data.subject,
+                    status='Nuevo'
+                )
+            
+            # Custom fields added through PATTERNS / register_pattern
+            extra = {
+                field: values[0].strip() if values else ''
+                for field, values in found.items()
+                if field not in CORE_FIELDS and field not in Lead.FIELDS
             }
+            if extra:
+                lead.extra = extra
             
             # Validate extracted data
-            if not lead['email']:
-                logger.warning("Lead extracted without email - skipping")
+            if not lead.email:
+                logger.warning("Lead extracted without email - skipping", extra=PER_LEAD)
+                metrics.count('extract.no_email')
                 return None
             
-            logger.info(f"Successfully extracted lead: {lead['email']}")
+            logger.info(f"Successfully extracted lead: {lead.email}", extra=PER_LEAD)
             return lead
         
         except Exception as e:
             logger.error(f"Error extracting data: {e}")
+            metrics.count('extract.errors')
             return None
     
     def _clean_html(self, html_text):
         """
         Clean HTML tags from text.
         
+        Plain-text bodies are returned unchanged; HTML is converted with the
+        event-based HTMLTextConverter.
+        
         Args:
             html_text: Text potentially containing HTML
         
         Returns:
             Cleaned text
         """
+        if '&' not in html_text and not MARKUP.search(html_text):
+            return html_text
+        
         try:
-            soup = BeautifulSoup(html_text, 'html.parser')
-            return soup.get_text(separator='\n')
+            return HTMLTextConverter().convert(html_text)
         except:
             return html_text
     
-    def _extract_name(self, email_data, text):
+    def _extract_name(self, email_data, found):
         """
         Extract name from email.
         
         Args:
-            email_data: Email dictionary
-            text: Full text to search
+            email_data: EmailMessage
+            found: Scan results from scan()
         
         Returns:
             Name string or None
         """
         try:
             # Try from 'From' field
-            from_field = email_data.get('from', '')
+            from_field = email_data.sender
             if '<' in from_field:
                 name = from_field.split('<')[0].strip()
                 if name and name != from_field:
                     return name
             
             # Try pattern matching
-            match = re.search(self.PATTERNS['name'], text, re.IGNORECASE)
-            if match:
-                return match.group(1).strip()
+            if found.get('name'):
+                return found['name'][0].strip()
             
             return ''
         except:
             return ''
     
-    def _extract_email(self, email_data, text):
+    def _extract_email(self, email_data, found):
         """
         Extract email address.
         
         Args:
-            email_data: Email dictionary
-            text: Full text to search
+            email_data: EmailMessage
+            found: Scan results from scan()
         
         Returns:
-            Valid email string or None
+            Valid email string, lowercased, or None
         """
         try:
             # Priority 1: From field
-            from_field = email_data.get('from', '')
+            from_field = email_data.sender
             if '<' in from_field and '>' in from_field:
                 email = from_field.split('<')[1].split('>')[0]
-                validate_email(email)
-                return email
+                self.validation.validate(email)
+                return clean_email(email)
             
             # Priority 2: Body text
-            matches = re.findall(self.PATTERNS['email'], text)
-            for email in matches:
+            for email in found.get('email', []):
                 try:
-                    validate_email(email)
-                    return email
+                    self.validation.validate(email)
+                    return clean_email(email)
                 except EmailNotValidError:
                     continue
             
@@ -132,43 +345,50 @@ class DataExtractor:
         except:
             return None
     
-    def _extract_phone(self, text):
+    def _extract_phone(self, found):
         """
         Extract phone number.
         
+        The first match that looks like a phone number is normalized to
+        E.164 style ('+541145678901', see dedup.normalize_phone) so every
+        lead stores it the same way; dates and order numbers the pattern
+        also matches are passed over. When no match qualifies, the first
+        one is kept as written.
+        
         Args:
-            text: Full text to search
+            found: Scan results from scan()
         
         Returns:
             Phone string or None
         """
         try:
-            match = re.search(self.PATTERNS['phone'], text)
-            if match:
-                phone = match.group(0).strip()
+            if found.get('phone'):
                 # Remove extra spaces
-                phone = re.sub(r'\s+', ' ', phone)
-                return phone
+                candidates = [WHITESPACE.sub(' ', phone.strip()) for phone in found['phone']]
+                for phone in candidates:
+                    normalized = normalize_phone(phone)
+                    if normalized:
+                        return normalized
+                return candidates[0]
             return ''
         except:
             return ''
     
-    def _extract_company(self, text):
+    def _extract_company(self, found):
         """
         Extract company name.
         
         Args:
-            text: Full text to search
+            found: Scan results from scan()
         
         Returns:
             Company string or None
         """
         try:
-            match = re.search(self.PATTERNS['company'], text, re.IGNORECASE)
-            if match:
-                company = match.group(1).strip()
+            if found.get('company'):
+                company = found['company'][0].strip()
                 # Clean up
-                company = re.sub(r'[^a-zA-Z0-9\s.-]', '', company)
+                company = COMPANY_JUNK.sub('', company)
                 return company[:100]  # Limit to 100 chars
             return ''
         except:
@@ -179,7 +399,7 @@ class DataExtractor:
         Validate if lead has minimum required data.
         
         Args:
-            lead: Lead dictionary
+            lead: Lead
         
         Returns:
             Boolean indicating if lead is valid
@@ -188,12 +408,15 @@ class DataExtractor:
             return False
         
         # Minimum required: email and name
-        if lead.get('email') and lead.get('name'):
+        if lead.email and lead.name:
             return True
         
         # Accept if at least email and phone
-        if lead.get('email') and lead.get('phone'):
+        if lead.email and lead.phone:
             return True
         
-        logger.warning(f"Lead validation failed: {lead}")
+        logger.warning(f"Lead validation failed: {lead}", extra=PER_LEAD)
+        get_metrics().count('extract.invalid')
         return False
+
+DataExtractor._compile_patterns()
@@ -0,0 +1,389 @@
+import math
+import re
+import unicodedata
+from collections import Counter
+from config import PHONE_COUNTRY_CODE, DEDUP_MATCH_PHONE, DEDUP_FUZZY_THRESHOLD
+
+# Version of the normalization rules below. Persisted indexes (Sheets
+# snapshot, SQLite keys) record it and are rebuilt when it changes
+KEY_VERSION = 2
+
+# Domains where dots and +tags in the local part reach the same mailbox
+GMAIL_DOMAINS = frozenset(['gmail.com', 'googlemail.com'])
+
+# Phones with fewer digits are not phone numbers (years, amounts, ...)
+MIN_PHONE_DIGITS = 8
+
+# E.164 limit, country code included
+MAX_PHONE_DIGITS = 15
+
+# Argentine national numbers (area code + subscriber) have 10 digits
+ARGENTINE_NATIONAL_DIGITS = 10
+
+NON_DIGITS = re.compile(r'\D')
+
+# Dates the phone pattern also matches: 2023-10-02 and 02/10/2023, with the
+# hour that may follow them, and compact 20231002 (optionally with HHMM)
+YEAR = r'(?:19|20)\d\d'
+MONTH = r'(?:0?[1-9]|1[0-2])'
+DAY = r'(?:0?[1-9]|[12]\d|3[01])'
+DATE_LIKE = re.compile(
+    rf'^(?:(?:{YEAR}[-/.]{MONTH}[-/.]{DAY}|{DAY}[-/.]{MONTH}[-/.]{YEAR})(?:[\sT]+\d{{1,2}}(?:[:.]\d{{2}}){{0,2}})?'
+    rf'|{YEAR}(?:0[1-9]|1[0-2])(?:0[1-9]|[12]\d|3[01])(?:[01]\d|2[0-3])?(?:[0-5]\d){{0,2}})$'
+)
+
+# Company legal forms ignored when comparing names ('ACME S.A.' = 'Acme')
+LEGAL_SUFFIXES = frozenset([
+    'sa', 'srl', 'sas', 'sau', 'sac', 'sca', 'spa', 'ltda', 'ltd', 'llc', 'inc', 'corp', 'co', 'gmbh'
+])
+
+NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+# Entries an n-gram may point to before it counts as too common to block
+# on; bounds the candidates examined per lookup whatever the index size
+MAX_BLOCK_SIZE = 1000
+
+def clean_email(email):
+    """
+    Normalize an email address for storage: stripped and lowercased.
+    
+    Args:
+        email: Raw email string
+    
+    Returns:
+        Email string
+    """
+    return (email or '').strip().lower()
+
+def normalize_email(email):
+    """
+    Normalize an email for duplicate comparison.
+    
+    Besides case folding, Gmail addresses lose the dots and +tag of the
+    local part and googlemail.com becomes gmail.com, since all of those
+    variants reach the same mailbox.
+    
+    Args:
+        email: Raw email string
+    
+    Returns:
+        Comparison key ('' for no email)
+    """
+    email = (email or '').strip().casefold()
+    local, at, domain = email.rpartition('@')
+    if at and domain in GMAIL_DOMAINS:
+        local = local.split('+', 1)[0].replace('.', '')
+        return f"{local}@gmail.com"
+    return email
+
+def normalize_phone(phone, country_code=PHONE_COUNTRY_CODE):
+    """
+    Normalize a phone number to E.164 style ('+541145678901').
+    
+    Numbers without a '+' or '00' prefix get country_code after dropping
+    the trunk '0'. Argentine mobile markers (the '9' after +54 and the
+    '15' after the area code) are removed, so every way of writing the
+    same line gives the same result. Dates and Argentine numbers shorter
+    than 10 national digits are rejected, since the loose phone pattern
+    also matches order numbers and dates.
+    
+    Args:
+        phone: Raw phone string
+        country_code: Country code for national numbers
+    
+    Returns:
+        Normalized phone, or '' if it does not look like a phone number
+    """
+    # A leading apostrophe is how Sheets keeps '+54...' as text
+    phone = (phone or '').strip().lstrip("'")
+    digits = NON_DIGITS.sub('', phone)
+    if len(digits) < MIN_PHONE_DIGITS or DATE_LIKE.match(phone):
+        return ''
+    
+    if phone.startswith('+'):
+        pass
+    elif digits.startswith('00'):
+        digits = digits[2:]
+    else:
+        digits = country_code + digits.lstrip('0')
+    
+    if digits.startswith('54'):
+        national = _argentine_national(digits[2:])
+        if len(national) < ARGENTINE_NATIONAL_DIGITS:
+            return ''
+        digits = '54' + national
+    
+    if len(digits) > MAX_PHONE_DIGITS:
+        return ''
+    return f"+{digits}"
+
+def _argentine_national(national):
+    """
+    Strip mobile markers from an Argentine national number.
+    
+    National numbers are 10 digits (area code + subscriber); mobiles are
+    dialed as 9 + number from abroad and area code + 15 + subscriber at home.
+    """
+    if len(national) == 11 and national.startswith('9'):
+        return national[1:]
+    if len(national) == 12:
+        # Area codes are 2 to 4 digits long
+        for area_length in (2, 3, 4):
+            if national[area_length:area_length + 2] == '15':
+                return national[:area_length] + national[area_length + 2:]
+    return national
+
+def name_key(name, company):
+    """
+    Build the comparison key for near-duplicate detection.
+    
+    Accents, case, punctuation and company legal forms are ignored.
+    
+    Args:
+        name: Contact name
+        company: Company name
+    
+    Returns:
+        Key string, or '' when name or company is missing
+    """
+    name_tokens = _tokens(name)
+    company_tokens = [token for token in _tokens(company) if token not in LEGAL_SUFFIXES]
+    if not name_tokens or not company_tokens:
+        return ''
+    return f"{' '.join(name_tokens)} / {' '.join(company_tokens)}"
+
+def _tokens(text):
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    folded = ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+    # 'S.A.' -> 'sa'
+    return NON_ALNUM.sub(' ', folded.replace('.', '')).split()
+
+def trigrams(key):
+    """
+    Get the character trigrams of a key, padded so word starts count.
+    
+    Args:
+        key: String
+    
+    Returns:
+        Set of trigrams
+    """
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def similarity(grams, other):
+    """
+    Jaccard similarity of two trigram sets.
+    
+    Returns:
+        Float between 0 and 1
+    """
+    if not grams or not other:
+        return 0.0
+    shared = len(grams & other)
+    return shared / (len(grams) + len(other) - shared)
+
+class NameIndex:
+    """
+    Near-duplicate index on name + company keys.
+    
+    Keys are blocked by trigram: each trigram maps to the entries that
+    contain it, and a lookup only scores the entries sharing enough
+    trigrams with the query. Trigrams shared by more than max_block entries
+    (common first names, frequent companies) are not used for blocking, so
+    a lookup examines a bounded number of candidates no matter how many
+    rows the output has.
+    """
+    
+    def __init__(self, threshold=DEDUP_FUZZY_THRESHOLD, max_block=MAX_BLOCK_SIZE):
+        """
+        Initialize empty index.
+        
+        Args:
+            threshold: Similarity (0-1) from which keys are near-duplicates
+            max_block: Entries per trigram before it is too common to block on
+        """
+        self.threshold = threshold
+        self.max_block = max_block
+        self._keys = []
+        self._sizes = []
+        self._exact = set()
+        self._blocks = {}
+    
+    def __len__(self):
+        return len(self._keys)
+    
+    def add(self, key):
+        """
+        Add a key from name_key().
+        """
+        if not key or key in self._exact:
+            return
+        
+        entry = len(self._keys)
+        grams = trigrams(key)
+        self._keys.append(key)
+        self._sizes.append(len(grams))
+        self._exact.add(key)
+        for gram in grams:
+            block = self._blocks.get(gram)
+            if block is None:
+                self._blocks[gram] = [entry]
+            elif len(block) <= self.max_block:
+                # One past the limit marks the trigram as too common
+                block.append(entry)
+    
+    def find(self, key):
+        """
+        Check if a key is a near-duplicate of one in the index.
+        
+        Args:
+            key: Key from name_key()
+        
+        Returns:
+            Boolean
+        """
+        if not key:
+            return False
+        if key in self._exact:
+            return True
+        
+        grams = trigrams(key)
+        shared = Counter()
+        skipped = 0
+        for gram in grams:
+            block = self._blocks.get(gram)
+            if block is None:
+                continue
+            if len(block) > self.max_block:
+                skipped += 1
+                continue
+            shared.update(block)
+        
+        # A match shares at least threshold * len(grams) trigrams; the
+        # skipped common ones may account for some of them
+        size = len(grams)
+        needed = max(1, math.ceil(self.threshold * size) - skipped)
+        for entry, count in shared.items():
+            if count < needed:
+                continue
+            # Upper bound of the similarity, from the set sizes alone
+            most = count + skipped
+            if most < self.threshold * (size + self._sizes[entry] - most):
+                continue
+            if similarity(grams, trigrams(self._keys[entry])) >= self.threshold:
+                return True
+        return False
+    
+    def keys(self):
+        return list(self._keys)
+
+class DedupIndex:
+    """
+    In-memory duplicate index over everything already written.
+    
+    Hash sets of normalized emails and phones give O(1) exact checks; with
+    a fuzzy threshold, a NameIndex also catches the same contact and
+    company written slightly differently.
+    """
+    
+    def __init__(self, match_phone=DEDUP_MATCH_PHONE, fuzzy_threshold=DEDUP_FUZZY_THRESHOLD):
+        """
+        Initialize empty index.
+        
+        Args:
+            match_phone: Treat leads with the same phone as duplicates
+            fuzzy_threshold: Name + company similarity for near-duplicates
+                (0 disables the check)
+        """
+        self.match_phone = match_phone
+        self.emails = set()
+        self.phones = set()
+        self.names = NameIndex(fuzzy_threshold) if fuzzy_threshold else None
+    
+    def __len__(self):
+        return len(self.emails)
+    
+    def add(self, email='', phone='', name='', company=''):
+        """
+        Index one stored lead.
+        """
+        email_key = normalize_email(email)
+        if email_key:
+            self.emails.add(email_key)
+        if self.match_phone:
+            phone_key = normalize_phone(phone)
+            if phone_key:
+                self.phones.add(phone_key)
+        if self.names is not None:
+            self.names.add(name_key(name, company))
+    
+    def add_lead(self, lead):
+        self.add(lead.email, lead.phone, lead.name, lead.company)
+    
+    def has_email(self, email):
+        """
+        Check if an email (or an alias of it) is indexed.
+        
+        Returns:
+            Boolean
+        """
+        return normalize_email(email) in self.emails
+    
+    def find(self, email='', phone='', name='', company=''):
+        """
+        Look a lead up by email, then phone, then name + company.
+        
+        Returns:
+            'email', 'phone' or 'name' for the key that matched, or None
+        """
+        if self.has_email(email):
+            return 'email'
+        if self.match_phone and normalize_phone(phone) in self.phones:
+            return 'phone'
+        if self.names is not None and self.names.find(name_key(name, company)):
+            return 'name'
+        return None
+    
+    def find_lead(self, lead):
+        return self.find(lead.email, lead.phone, lead.name, lead.company)
+    
+    def to_snapshot(self):
+        """
+        Get the index as JSON-serializable data.
+        
+        Returns:
+            Dictionary for from_snapshot()
+        """
+        return {
+            'match_phone': self.match_phone,
+            'fuzzy': self.names is not None,
+            'emails': sorted(self.emails),
+            'phones': sorted(self.phones),
+            'names': self.names.keys() if self.names is not None else []
+        }
+    
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """
+        Rebuild an index saved with to_snapshot().
+        
+        Args:
+            snapshot: Dictionary from to_snapshot()
+        
+        Returns:
+            DedupIndex, or None if the snapshot lacks keys the current
+            settings compare (e.g. phones saved with DEDUP_MATCH_PHONE off)
+        """
+        index = cls()
+        if (index.match_phone and not snapshot.get('match_phone')) or \
+                (index.names is not None and not snapshot.get('fuzzy')):
+            return None
+        
+        index.emails = set(snapshot['emails'])
+        if index.match_phone:
+            index.phones = set(snapshot['phones'])
+        if index.names is not None:
+            for key in snapshot['names']:
+                index.names.add(key)
+        return index
@@ -0,0 +1,56 @@
+import json
+import threading
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build, build_from_document
+from modules.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Parsed discovery documents by (api, version), shared by every service
+_documents = {}
+_documents_lock = threading.Lock()
+
+def get_discovery_document(api, version):
+    """
+    Get a parsed discovery document from the copy bundled with
+    google-api-python-client.
+    
+    Each document is read and parsed once per process.
+    
+    Args:
+        api: API name (e.g., 'gmail')
+        version: API version (e.g., 'v1')
+    
+    Returns:
+        Discovery document dictionary, or None if it is not bundled
+    """
+    key = (api, version)
+    with _documents_lock:
+        if key not in _documents:
+            content = discovery_cache.get_static_doc(api, version)
+            _documents[key] = json.loads(content) if content else None
+        return _documents[key]
+
+def build_service(api, version, credentials=None, http=None):
+    """
+    Build a Google API service without any network round trip.
+    
+    Uses the bundled discovery document; falls back to fetching it only
+    when the installed client library does not ship one.
+    
+    Args:
+        api: API name (e.g., 'gmail')
+        version: API version (e.g., 'v1')
+        credentials: google.auth credentials
+        http: Authorized HTTP object to use instead of credentials
+    
+    Returns:
+        API service instance
+    """
+    document = get_discovery_document(api, version)
+    if document is None:
+        logger.warning(f"No bundled discovery document for {api} {version}, fetching it")
+        return build(api, version, credentials=credentials, http=http,
+                     static_discovery=False, cache_discovery=False)
+    
+    return build_from_document(document, credentials=credentials, http=http)
@@ -0,0 +1,141 @@
+import threading
+import time
+from collections import OrderedDict
+from email_validator import validate_email, EmailUndeliverableError
+from modules.logger import setup_logger
+from config import EMAIL_VALIDATION, EMAIL_DNS_CACHE_SIZE, EMAIL_DNS_CACHE_TTL_SECONDS
+
+logger = setup_logger(__name__)
+
+VALIDATION_MODES = ('syntax', 'dns')
+
+class EmailValidationPolicy:
+    """
+    Validates email addresses with a configurable cost.
+    
+    'syntax' never touches the network. 'dns' also checks that the domain
+    accepts mail, caching the MX lookup per domain (LRU with TTL) so each
+    domain is resolved at most once per TTL for the whole run.
+    """
+    
+    def __init__(self, mode=EMAIL_VALIDATION, cache_size=EMAIL_DNS_CACHE_SIZE,
+                 cache_ttl=EMAIL_DNS_CACHE_TTL_SECONDS):
+        """
+        Initialize policy.
+        
+        Args:
+            mode: 'syntax' or 'dns'
+            cache_size: Maximum domains kept in the DNS cache
+            cache_ttl: Seconds a DNS result stays valid
+        """
+        if mode not in VALIDATION_MODES:
+            raise ValueError(f"Unknown email validation mode: {mode}")
+        
+        self.mode = mode
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.lookup_seconds = 0.0
+    
+    def validate(self, email):
+        """
+        Validate an email address.
+        
+        Args:
+            email: Email string
+        
+        Returns:
+            email_validator ValidatedEmail
+        
+        Raises:
+            EmailNotValidError: If the syntax is invalid or the domain does
+                not accept mail
+        """
+        validated = validate_email(email, check_deliverability=False)
+        if self.mode == 'dns':
+            self._check_domain(validated.ascii_domain, validated.domain)
+        return validated
+    
+    def _check_domain(self, ascii_domain, domain):
+        """
+        Check domain deliverability through the cache.
+        
+        Raises:
+            EmailUndeliverableError: If the domain does not accept mail
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(ascii_domain)
+            if entry is not None and entry[0] > now:
+                self._cache.move_to_end(ascii_domain)
+                self.cache_hits += 1
+                error = entry[1]
+                if error is not None:
+                    raise error
+                return
+            self.cache_misses += 1
+        
+        # Lazy import: dns.resolver is slow to load and unused in syntax mode
+        from email_validator.deliverability import validate_email_deliverability
+        
+        error = None
+        started = time.perf_counter()
+        try:
+            info = validate_email_deliverability(ascii_domain, domain)
+        except EmailUndeliverableError as e:
+            info = {}
+            error = e
+        elapsed = time.perf_counter() - started
+        
+        with self._lock:
+            self.lookup_seconds += elapsed
+            # Timeouts are inconclusive: accept the address but do not cache
+            if 'unknown-deliverability' not in info:
+                self._cache[ascii_domain] = (now + self.cache_ttl, error)
+                self._cache.move_to_end(ascii_domain)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        
+        if error is not None:
+            raise error
+    
+    def stats(self):
+        """
+        Get cache counters.
+        
+        Returns:
+            Dictionary with mode, cache_hits, cache_misses and lookup_seconds
+        """
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'cache_hits': self.cache_hits,
+                'cache_misses': self.cache_misses,
+                'lookup_seconds': round(self.lookup_seconds, 3)
+            }
+    
+    def reset(self):
+        """
+        Zero the cache counters (cached domains are kept).
+        """
+        with self._lock:
+            self.cache_hits = 0
+            self.cache_misses = 0
+            self.lookup_seconds = 0.0
+
+_default_policy = None
+
+def get_validation_policy():
+    """
+    Get the policy shared by every extractor in this process.
+    
+    Returns:
+        EmailValidationPolicy instance
+    """
+    global _default_policy
+    if _default_policy is None:
+        _default_policy = EmailValidationPolicy()
+    return _default_policy
@@ -0,0 +1,110 @@
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+from itertools import islice
+from modules.data_extractor import DataExtractor
+from modules.logger import setup_logger
+from modules.metrics import get_metrics
+from config import EXTRACT_CHUNK_SIZE
+
+logger = setup_logger(__name__)
+
+# Extractor owned by each worker process
+_worker_extractor = None
+
+def _init_worker():
+    """
+    Create the extractor once per worker process.
+    """
+    global _worker_extractor
+    _worker_extractor = DataExtractor()
+    # Forked workers inherit the parent's metrics; start from zero
+    get_metrics().reset()
+
+def _extract_chunk(emails):
+    """
+    Extract and validate a chunk of emails inside a worker process.
+    
+    Args:
+        emails: List of EmailMessage objects
+    
+    Returns:
+        Tuple (list of (lead, is_valid) tuples in the same order, metrics
+        recorded for the chunk)
+    """
+    results = []
+    for email in emails:
+        lead = _worker_extractor.extract_from_email(email)
+        results.append((lead, bool(lead) and _worker_extractor.validate_lead(lead)))
+    return results, get_metrics().drain()
+
+def extract_serial(extractor, emails):
+    """
+    Extract leads on the calling thread.
+    
+    Args:
+        extractor: DataExtractor instance
+        emails: Iterable of EmailMessage objects
+    
+    Yields:
+        Tuples (email, lead or None, is_valid)
+    """
+    for email in emails:
+        lead = extractor.extract_from_email(email)
+        yield email, lead, bool(lead) and extractor.validate_lead(lead)
+
+def extract_parallel(emails, workers, ordered=False, chunk_size=EXTRACT_CHUNK_SIZE):
+    """
+    Extract leads in a process pool.
+    
+    Emails are read lazily and sent to workers in chunks, with at most two
+    chunks in flight per worker, so a large drain is never held in memory.
+    
+    Args:
+        emails: Iterable of EmailMessage objects
+        workers: Number of worker processes
+        ordered: Yield results in input order instead of completion order
+        chunk_size: Emails per task
+    
+    Yields:
+        Tuples (email, lead or None, is_valid)
+    """
+    # multiprocessing is only loaded when workers are used
+    from concurrent.futures import ProcessPoolExecutor
+    
+    emails = iter(emails)
+    max_in_flight = workers * 2
+    
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        pending = deque()
+        
+        def submit_next():
+            chunk = list(islice(emails, chunk_size))
+            if not chunk:
+                return False
+            pending.append((executor.submit(_extract_chunk, chunk), chunk))
+            return True
+        
+        while len(pending) < max_in_flight and submit_next():
+            pass
+        
+        while pending:
+            if ordered:
+                future, chunk = pending.popleft()
+            else:
+                done, _ = wait([f for f, _ in pending], return_when=FIRST_COMPLETED)
+                index = next(i for i, (f, _) in enumerate(pending) if f in done)
+                future, chunk = pending[index]
+                del pending[index]
+            
+            try:
+                results, worker_metrics = future.result()
+                get_metrics().merge(worker_metrics)
+            except Exception as e:
+                logger.error(f"Extraction worker failed on {len(chunk)} emails: {e}")
+                results = [(None, False)] * len(chunk)
+            
+            # Keep workers busy while the caller consumes this chunk
+            submit_next()
+            
+            for email, (lead, valid) in zip(chunk, results):
+                yield email, lead, valid
@@ -1,54 +1,120 @@
 import base64
-import pickle
-from google.auth.transport.requests import Request
-from google.oauth2.service_account import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.exceptions import RefreshError
-from googleapiclient.discovery import build
+import codecs
+import json
+import os
+import re
+import time
+from googleapiclient.errors import HttpError
+from modules.api_executor import get_executor, is_retryable
+from modules.credentials import get_credentials_provider
+from modules.discovery import build_service
+from modules.headers import HeaderIndex, parse_date
 from modules.logger import setup_logger
-from config import CREDENTIALS_FILE, GMAIL_USER
+from modules.records import EmailMessage
+from config import (
+    GMAIL_USER,
+    GMAIL_PAGE_SIZE,
+    GMAIL_BATCH_SIZE,
+    ACK_BATCH_SIZE,
+    MARK_AS_READ,
+    PROCESSED_LABEL,
+    MAX_EMAILS_PER_RUN,
+    DRAIN_TIME_BUDGET_SECONDS,
+    SYNC_MODE,
+    HISTORY_CHECKPOINT_FILE,
+    MAX_BODY_BYTES
+)
 
 logger = setup_logger(__name__)
 
-# Gmail API Scopes
-SCOPES = ['https://www.googleapis.com/auth/gmail.modify']
+# Gmail API quota units per call
+QUOTA_UNITS = {
+    'messages.list': 5,
+    'messages.get': 5,
+    'messages.modify': 5,
+    'messages.batchModify': 50,
+    'labels.list': 1,
+    'history.list': 2,
+    'getProfile': 1
+}
+
+# Response fields requested from messages.get: everything the body walk
+# needs, without labels, snippet or size estimates
+FULL_FIELDS = 'id,internalDate,payload(mimeType,filename,headers,body/data,parts)'
+
+# Headers-only fetch (format='metadata'): default headers requested
+METADATA_HEADERS = ['From', 'Subject', 'Date']
+METADATA_FIELDS = 'id,internalDate,payload/headers'
+
+# charset parameter of a Content-Type header
+CHARSET = re.compile(r'charset\s*=\s*"?([^";\s]+)', re.IGNORECASE)
+
+# Seconds subtracted from the checkpoint time in the incremental 'after:'
+# filter, to cover clock skew between us and Gmail
+HISTORY_AFTER_SLACK_SECONDS = 3600
+
+def pending_query(query):
+    """
+    Narrow a search query to messages that were not acknowledged yet.
+    
+    Acknowledged emails lose UNREAD (MARK_AS_READ) and/or get
+    PROCESSED_LABEL, so excluding those keeps them out of later listings.
+    With neither set the query is returned as is.
+    
+    Args:
+        query: Gmail search query
+    
+    Returns:
+        Gmail search query
+    """
+    filters = []
+    if MARK_AS_READ:
+        filters.append('is:unread')
+    if PROCESSED_LABEL:
+        # Search syntax: lowercase, spaces and slashes become hyphens
+        filters.append('-label:' + re.sub(r'[\s/]+', '-', PROCESSED_LABEL.strip().lower()))
+    if not filters:
+        return query
+    return f"({query}) {' '.join(filters)}"
 
 class GmailReader:
     """
     Handles Gmail API interactions.
     """
     
-    def __init__(self):
+    def __init__(self, service=None):
         """
         Initialize Gmail API client.
+        
+        Args:
+            service: Prebuilt Gmail API service (skips authentication)
         """
-        self.service = self._authenticate()
+        self.credentials = None
+        self.service = service or self._authenticate()
+        self.executor = get_executor('gmail')
+        self.sync_mode = SYNC_MODE
+        self._pending_history_id = None
+        self._pending_history_time = None
+        self._listing_complete = False
+        # IDs listed this run whose email could not be fetched or written
+        self._unsettled = set()
+        self._ack_buffer = []
+        self._label_ids = None
+        
+        # Called with the list of IDs after each successful acknowledgement
+        self.on_acknowledged = None
     
     def _authenticate(self):
         """
-        Authenticate with Gmail API using credentials file.
+        Authenticate with Gmail API using the shared credentials provider.
         
         Returns:
             Gmail API service instance
         """
         try:
-            creds = None
-            
-            # Try loading from credentials.json
-            try:
-                creds = Credentials.from_service_account_file(CREDENTIALS_FILE, scopes=SCOPES)
-            except Exception as e:
-                logger.warning(f"Could not load service account: {e}")
-                logger.info("Attempting OAuth2 flow...")
-                
-                # Fallback to OAuth2 flow
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    CREDENTIALS_FILE,
-                    SCOPES
-                )
-                creds = flow.run_local_server(port=0)
-            
-            service = build('gmail', 'v1', credentials=creds)
+            provider = get_credentials_provider()
+            self.credentials = provider.get_credentials()
+            service = build_service('gmail', 'v1', http=provider.new_http())
             logger.info(f"Successfully authenticated with Gmail API for {GMAIL_USER}")
             return service
         
@@ -56,91 +122,598 @@ class GmailReader:
             logger.error(f"Failed to authenticate with Gmail API: {e}")
             raise
     
-    def get_unread_emails(self, query):
+    def get_http(self):
         """
-        Get unread emails matching query.
+        Get the calling thread's authorized HTTP object.
+        
+        httplib2.Http is not thread-safe, so each thread issuing requests
+        concurrently needs its own; pass it as http= to the fetch and
+        acknowledge methods. Objects are pooled per thread and keep their
+        connections open between requests.
+        
+        Returns:
+            AuthorizedHttp, or None when the service was injected without
+            credentials (requests then use the service's own transport)
+        """
+        if self.credentials is None:
+            return None
+        
+        return get_credentials_provider().http()
+    
+    def iter_unread_message_ids(self, query, max_messages=None, time_budget=None):
+        """
+        Yield IDs of unprocessed messages matching query, following nextPageToken.
+        
+        The query is narrowed to what acknowledge() has not handled yet
+        (see pending_query), so processed mail drops out and the drain
+        ends. Pages are listed lazily, so callers can start processing the first
+        page while later pages have not been requested yet. Whether the
+        query was listed to the end (no cap, time budget or error cut it
+        short) is recorded for commit_history_checkpoint().
         
         Args:
             query: Gmail search query (e.g., 'subject:Nueva consulta')
+            max_messages: Stop after this many IDs (None uses MAX_EMAILS_PER_RUN, 0 = no cap)
+            time_budget: Stop listing after this many seconds (None uses
+                DRAIN_TIME_BUDGET_SECONDS, 0 = no budget)
         
-        Returns:
-            List of email dictionaries
+        Yields:
+            Gmail message ID strings
         """
-        try:
-            results = self.service.users().messages().list(
-                userId='me',
-                q=query,
-                maxResults=10  # Limit to 10 per run
-            ).execute()
+        if max_messages is None:
+            max_messages = MAX_EMAILS_PER_RUN
+        if time_budget is None:
+            time_budget = DRAIN_TIME_BUDGET_SECONDS
+        
+        self._listing_complete = False
+        self._unsettled = set()
+        query = pending_query(query)
+        deadline = time.monotonic() + time_budget if time_budget else None
+        page_token = None
+        yielded = 0
+        pages = 0
+        
+        while True:
+            page_size = GMAIL_PAGE_SIZE
+            if max_messages:
+                page_size = min(page_size, max_messages - yielded)
             
+            try:
+                results = self.executor.execute(self.service.users().messages().list(
+                    userId='me',
+                    q=query,
+                    maxResults=page_size,
+                    pageToken=page_token
+                ), QUOTA_UNITS['messages.list'])
+            except Exception as e:
+                logger.error(f"Error listing emails (page {pages + 1}): {e}")
+                return
+            
+            pages += 1
             messages = results.get('messages', [])
-            logger.info(f"Found {len(messages)} emails matching query: {query}")
+            logger.debug(f"Listed page {pages} with {len(messages)} emails for query: {query}")
             
-            email_list = []
             for message in messages:
-                email = self.get_email_details(message['id'])
-                email_list.append(email)
+                yield message['id']
+                yielded += 1
+            
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                logger.info(f"Drained {yielded} emails matching query: {query}")
+                self._listing_complete = True
+                return
+            
+            if max_messages and yielded >= max_messages:
+                logger.info(f"Reached cap of {max_messages} emails for this run")
+                return
+            
+            if deadline is not None and time.monotonic() >= deadline:
+                logger.info(f"Drain time budget of {time_budget}s reached after {yielded} emails")
+                return
+    
+    def iter_message_ids(self, query, max_messages=None, time_budget=None):
+        """
+        Yield IDs of messages to process according to the sync mode.
+        
+        Args:
+            query: Gmail search query
+            max_messages: See iter_unread_message_ids
+            time_budget: See iter_unread_message_ids
+        
+        Yields:
+            Gmail message ID strings
+        """
+        if self.sync_mode == 'incremental':
+            return self.iter_new_message_ids(query, max_messages, time_budget)
+        return self.iter_unread_message_ids(query, max_messages, time_budget)
+    
+    def iter_new_message_ids(self, query, max_messages=None, time_budget=None):
+        """
+        Yield IDs of messages matching query added since the last checkpoint.
+        
+        Reads the history ID saved by commit_history_checkpoint() and asks
+        users.history.list for messages added since then; when nothing was
+        added that is the only API call. Otherwise the query is listed,
+        narrowed with 'after:', and only the added messages are yielded.
+        Without a checkpoint, or when the history ID has expired, falls back
+        to the full query.
+        
+        Emails left unread by a failed incremental run are not revisited
+        until the next full query (delete HISTORY_CHECKPOINT_FILE to force one).
+        
+        Args:
+            query: Gmail search query
+            max_messages: See iter_unread_message_ids
+            time_budget: See iter_unread_message_ids
+        
+        Yields:
+            Gmail message ID strings
+        """
+        self._listing_complete = False
+        self._unsettled = set()
+        checkpoint = self._load_history_checkpoint()
+        added = None
+        
+        if checkpoint:
+            added = self._list_added_since(checkpoint['history_id'])
+        
+        if added is None:
+            # Full sync: record the current history ID before listing, so
+            # messages arriving meanwhile are picked up next run
+            try:
+                self._pending_history_id = self.get_history_id()
+                self._pending_history_time = time.time()
+            except Exception as e:
+                logger.error(f"Error getting mailbox history ID: {e}")
+            yield from self.iter_unread_message_ids(query, max_messages, time_budget)
+            return
+        
+        if not added:
+            logger.info("No messages added since last run")
+            self._listing_complete = True
+            return
+        
+        logger.info(f"{len(added)} messages added since last run")
+        after = int(checkpoint['timestamp']) - HISTORY_AFTER_SLACK_SECONDS
+        narrowed = f"({query}) after:{after}"
+        for message_id in self.iter_unread_message_ids(narrowed, max_messages, time_budget):
+            if message_id in added:
+                yield message_id
+    
+    def get_history_id(self):
+        """
+        Get the mailbox's current history ID.
+        
+        Returns:
+            History ID string
+        """
+        request = self.service.users().getProfile(userId='me')
+        return self.executor.execute(request, QUOTA_UNITS['getProfile'])['historyId']
+    
+    def _list_added_since(self, start_history_id):
+        """
+        List messages added since a history ID.
+        
+        Also records the mailbox's current history ID as the pending
+        checkpoint.
+        
+        Args:
+            start_history_id: History ID from the last checkpoint
+        
+        Returns:
+            Set of added message IDs, or None if the history ID expired or
+            the call failed (callers fall back to a full query)
+        """
+        added = set()
+        page_token = None
+        
+        try:
+            while True:
+                results = self.executor.execute(self.service.users().history().list(
+                    userId='me',
+                    startHistoryId=start_history_id,
+                    historyTypes=['messageAdded'],
+                    maxResults=500,
+                    pageToken=page_token
+                ), QUOTA_UNITS['history.list'])
+                
+                for record in results.get('history', []):
+                    for item in record.get('messagesAdded', []):
+                        added.add(item['message']['id'])
+                
+                page_token = results.get('nextPageToken')
+                if not page_token:
+                    self._pending_history_id = results.get('historyId', start_history_id)
+                    self._pending_history_time = time.time()
+                    return added
+        
+        except HttpError as e:
+            if e.resp.status == 404:
+                logger.warning(f"History ID {start_history_id} expired, running full query")
+            else:
+                logger.error(f"Error listing mailbox history: {e}")
+            return None
+        
+        except Exception as e:
+            logger.error(f"Error listing mailbox history: {e}")
+            return None
+    
+    def _load_history_checkpoint(self):
+        """
+        Read the last committed history checkpoint.
+        
+        Returns:
+            Dictionary with history_id and timestamp, or None
+        """
+        if not os.path.exists(HISTORY_CHECKPOINT_FILE):
+            return None
+        
+        try:
+            with open(HISTORY_CHECKPOINT_FILE, encoding='utf-8') as f:
+                checkpoint = json.load(f)
+            return checkpoint if checkpoint.get('history_id') else None
+        
+        except Exception as e:
+            logger.warning(f"Error reading history checkpoint: {e}")
+            return None
+    
+    def commit_history_checkpoint(self):
+        """
+        Save the history ID recorded at the start of this run.
+        
+        Call only after the run's emails were processed and acknowledged,
+        so a crash mid-run re-reads the same messages next time. Nothing is
+        saved when the listing stopped early (MAX_EMAILS_PER_RUN, time
+        budget or a list error) or when a listed email could not be fetched
+        or written (see mark_unsettled): the old checkpoint is kept so those
+        emails are listed again next run.
+        
+        The checkpoint time is when the history ID was read, not when it is
+        saved, so a long run does not push the next run's 'after:' filter
+        past the emails that arrived while it was running.
+        
+        Returns:
+            Boolean indicating a checkpoint was written
+        """
+        if self.sync_mode != 'incremental' or not self._pending_history_id:
+            return False
+        
+        if not self._listing_complete:
+            logger.info("Not saving history checkpoint: the listing stopped before the end of the query")
+            return False
+        
+        if self._unsettled:
+            logger.warning(
+                f"Not saving history checkpoint: {len(self._unsettled)} emails could not be fetched or written"
+            )
+            return False
+        
+        if self._ack_buffer:
+            logger.warning("Not saving history checkpoint: some emails are still unacknowledged")
+            return False
+        
+        try:
+            directory = os.path.dirname(HISTORY_CHECKPOINT_FILE)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            
+            tmp_file = f"{HISTORY_CHECKPOINT_FILE}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'history_id': self._pending_history_id, 'timestamp': self._pending_history_time}, f)
+            os.replace(tmp_file, HISTORY_CHECKPOINT_FILE)
             
+            logger.debug(f"Saved history checkpoint {self._pending_history_id}")
+            self._pending_history_id = None
+            return True
+        
+        except Exception as e:
+            logger.error(f"Error saving history checkpoint: {e}")
+            return False
+    
+    def mark_unsettled(self, message_ids):
+        """
+        Record listed emails that could not be fetched or written this run.
+        
+        They keep the history checkpoint from moving past them (see
+        commit_history_checkpoint).
+        
+        Args:
+            message_ids: Iterable of Gmail message IDs
+        """
+        self._unsettled.update(message_ids)
+    
+    def iter_unread_emails(self, query, max_messages=None, time_budget=None):
+        """
+        Yield full email details for messages matching query.
+        
+        Message IDs are grouped into chunks of GMAIL_BATCH_SIZE and fetched
+        with one HTTP batch request per chunk.
+        
+        Args:
+            query: Gmail search query (e.g., 'subject:Nueva consulta')
+            max_messages: See iter_unread_message_ids
+            time_budget: See iter_unread_message_ids
+        
+        Yields:
+            EmailMessage objects (messages that fail to load are logged and skipped)
+        
+        Uses iter_message_ids, so SYNC_MODE applies.
+        """
+        return self.iter_emails(self.iter_message_ids(query, max_messages, time_budget))
+    
+    def iter_emails(self, message_ids):
+        """
+        Yield full email details for a stream of message IDs.
+        
+        Args:
+            message_ids: Iterable of Gmail message IDs
+        
+        Yields:
+            EmailMessage objects (messages that fail to load are logged and skipped)
+        """
+        chunk = []
+        for message_id in message_ids:
+            chunk.append(message_id)
+            if len(chunk) >= GMAIL_BATCH_SIZE:
+                yield from self._fetch_chunk(chunk)
+                chunk = []
+        
+        if chunk:
+            yield from self._fetch_chunk(chunk)
+    
+    def _fetch_chunk(self, message_ids):
+        """
+        Fetch one chunk of messages and log per-message failures.
+        
+        Args:
+            message_ids: List of Gmail message IDs
+        
+        Returns:
+            List of EmailMessage objects
+        """
+        emails, failures = self.get_emails_batch(message_ids)
+        for message_id, error in failures.items():
+            logger.error(f"Error getting email details for {message_id}: {error}")
+        return emails
+    
+    def get_unread_emails(self, query, max_messages=None, time_budget=None):
+        """
+        Get unread emails matching query.
+        
+        Args:
+            query: Gmail search query (e.g., 'subject:Nueva consulta')
+            max_messages: See iter_unread_message_ids
+            time_budget: See iter_unread_message_ids
+        
+        Returns:
+            List of EmailMessage objects
+        """
+        try:
+            email_list = list(self.iter_unread_emails(query, max_messages, time_budget))
+            logger.info(f"Found {len(email_list)} emails matching query: {query}")
             return email_list
         
         except Exception as e:
             logger.error(f"Error fetching emails: {e}")
             return []
     
-    def get_email_details(self, message_id):
+    def get_email_details(self, message_id, http=None, format='full', metadata_headers=None):
         """
         Get full details of a specific email.
         
         Args:
             message_id: Gmail message ID
+            http: Optional HTTP object to send the request with (see get_http)
+            format: 'full', or 'metadata' for headers only (empty body)
+            metadata_headers: Header names to fetch with 'metadata'
         
         Returns:
-            Dictionary with email details
+            EmailMessage
         """
         try:
-            message = self.service.users().messages().get(
-                userId='me',
-                id=message_id,
-                format='full'
-            ).execute()
+            request = self._get_request(message_id, format, metadata_headers)
+            message = self.executor.execute(request, QUOTA_UNITS['messages.get'], http)
             
-            headers = message['payload']['headers']
-            
-            email_data = {
-                'id': message_id,
-                'from': next((h['value'] for h in headers if h['name'] == 'From'), ''),
-                'subject': next((h['value'] for h in headers if h['name'] == 'Subject'), ''),
-                'date': next((h['value'] for h in headers if h['name'] == 'Date'), ''),
-                'body': self._get_email_body(message['payload'])
-            }
-            
-            return email_data
+            return self._parse_message(message_id, message)
         
         except Exception as e:
             logger.error(f"Error getting email details for {message_id}: {e}")
             return None
     
+    def get_emails_batch(self, message_ids, batch_size=None, http=None, format='full',
+                         metadata_headers=None):
+        """
+        Get full details of many emails using HTTP batch requests.
+        
+        Each batch carries up to batch_size messages().get calls, so N messages
+        cost ceil(N / batch_size) round trips instead of N.
+        
+        Args:
+            message_ids: List of Gmail message IDs
+            batch_size: Calls per batch (defaults to GMAIL_BATCH_SIZE, max 100)
+            http: Optional HTTP object to send the batches with (see get_http)
+            format: 'full', or 'metadata' for headers only (empty body)
+            metadata_headers: Header names to fetch with 'metadata'
+        
+        Returns:
+            Tuple (email_list, failures) where email_list keeps the order of
+            message_ids and failures maps each failed message ID to its error
+        """
+        batch_size = min(batch_size or GMAIL_BATCH_SIZE, 100)
+        emails = {}
+        failures = {}
+        
+        def on_response(request_id, response, exception):
+            if exception is not None:
+                failures[request_id] = exception
+                return
+            try:
+                emails[request_id] = self._parse_message(request_id, response)
+            except Exception as e:
+                failures[request_id] = e
+        
+        pending = list(message_ids)
+        exhausted = set()
+        attempt = 0
+        
+        while True:
+            for start in range(0, len(pending), batch_size):
+                chunk = pending[start:start + batch_size]
+                batch = self.service.new_batch_http_request(callback=on_response)
+                for message_id in chunk:
+                    batch.add(self._get_request(message_id, format, metadata_headers), request_id=message_id)
+                
+                try:
+                    self.executor.execute(batch, QUOTA_UNITS['messages.get'] * len(chunk), http)
+                except Exception as e:
+                    # Transport-level failure (already retried): every call
+                    # without a result failed
+                    for message_id in chunk:
+                        if message_id not in emails:
+                            failures.setdefault(message_id, e)
+                            exhausted.add(message_id)
+            
+            # Calls rejected inside a successful batch (quota, 5xx) are sent
+            # again in a new batch
+            retry = [m for m in pending if m in failures and m not in exhausted and is_retryable(failures[m])]
+            if not retry or attempt >= self.executor.max_retries:
+                break
+            
+            self.executor.wait_before_retry(attempt, failures[retry[0]], f"batch calls ({len(retry)})")
+            attempt += 1
+            for message_id in retry:
+                del failures[message_id]
+            pending = retry
+        
+        self.mark_unsettled(failures)
+        email_list = [emails[message_id] for message_id in message_ids if message_id in emails]
+        return email_list, failures
+    
+    def _parse_message(self, message_id, message):
+        """
+        Build the EmailMessage from a messages().get response.
+        
+        Args:
+            message_id: Gmail message ID
+            message: Message resource returned by the API
+        
+        Returns:
+            EmailMessage
+        """
+        payload = message['payload']
+        headers = HeaderIndex(payload.get('headers', []))
+        
+        return EmailMessage(
+            message_id,
+            sender=headers.get('From'),
+            subject=headers.get('Subject'),
+            date=headers.get('Date'),
+            received_at=parse_date(headers.get('Date'), message.get('internalDate')),
+            headers=headers,
+            body=self._get_email_body(payload)
+        )
+    
+    def _get_request(self, message_id, format='full', metadata_headers=None):
+        """
+        Build a messages().get request with a response field mask.
+        
+        Args:
+            message_id: Gmail message ID
+            format: 'full' or 'metadata'
+            metadata_headers: Headers returned with 'metadata' (defaults to
+                METADATA_HEADERS)
+        
+        Returns:
+            HttpRequest
+        """
+        if format == 'metadata':
+            return self.service.users().messages().get(
+                userId='me',
+                id=message_id,
+                format='metadata',
+                metadataHeaders=metadata_headers or METADATA_HEADERS,
+                fields=METADATA_FIELDS
+            )
+        
+        return self.service.users().messages().get(
+            userId='me',
+            id=message_id,
+            format='full',
+            fields=FULL_FIELDS
+        )
+    
     def _get_email_body(self, payload):
         """
         Extract body from email payload.
         
+        Walks the MIME tree once, depth first in document order, so parts
+        nested in multipart/mixed or multipart/related are found. The first
+        text/plain part wins; the first text/html part is the fallback.
+        Attachments are skipped.
+        
         Args:
             payload: Gmail message payload
         
         Returns:
             Email body text
         """
-        if 'parts' in payload:
-            parts = payload['parts']
-            for part in parts:
-                if part['mimeType'] == 'text/plain':
-                    if 'data' in part['body']:
-                        return base64.urlsafe_b64decode(part['body']['data']).decode('utf-8')
-        else:
-            if 'body' in payload and 'data' in payload['body']:
-                return base64.urlsafe_b64decode(payload['body']['data']).decode('utf-8')
+        html_part = None
+        stack = [payload]
+        
+        while stack:
+            part = stack.pop()
+            
+            children = part.get('parts')
+            if children:
+                stack.extend(reversed(children))
+                continue
+            
+            if part.get('filename') or not part.get('body', {}).get('data'):
+                continue
+            
+            mime_type = (part.get('mimeType') or 'text/plain').lower()
+            if mime_type == 'text/plain':
+                return self._decode_part(part)
+            if mime_type == 'text/html' and html_part is None:
+                html_part = part
+        
+        return self._decode_part(html_part) if html_part else ''
+    
+    @staticmethod
+    def _decode_part(part):
+        """
+        Decode a body part using its declared charset.
+        
+        The base64 text is cut to MAX_BODY_BYTES before decoding, so huge
+        bodies are never decoded in full. Unknown charsets fall back to
+        UTF-8 and undecodable bytes are replaced instead of raising.
+        
+        Args:
+            part: MIME part with body.data
+        
+        Returns:
+            Decoded text
+        """
+        data = part['body']['data']
+        
+        if MAX_BODY_BYTES:
+            # 4 base64 characters carry 3 bytes
+            limit = -(-MAX_BODY_BYTES // 3) * 4
+            data = data[:limit]
+        
+        raw = base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+        if MAX_BODY_BYTES:
+            raw = raw[:MAX_BODY_BYTES]
+        
+        match = CHARSET.search(HeaderIndex(part.get('headers', [])).get('Content-Type'))
+        charset = match.group(1) if match else 'utf-8'
+        
+        try:
+            codecs.lookup(charset)
+        except LookupError:
+            charset = 'utf-8'
         
-        return ''
+        return raw.decode(charset, errors='replace')
     
     def mark_as_read(self, message_id):
         """
@@ -153,11 +726,11 @@ class GmailReader:
             Boolean indicating success
         """
         try:
-            self.service.users().messages().modify(
+            self.executor.execute(self.service.users().messages().modify(
                 userId='me',
                 id=message_id,
                 body={'removeLabelIds': ['UNREAD']}
-            ).execute()
+            ), QUOTA_UNITS['messages.modify'])
             logger.debug(f"Marked email {message_id} as read")
             return True
         
@@ -165,6 +738,128 @@ class GmailReader:
             logger.error(f"Error marking email as read: {e}")
             return False
     
+    def acknowledge(self, message_id, http=None):
+        """
+        Queue a processed email to be marked as read in bulk.
+        
+        The buffer is flushed automatically once it holds ACK_BATCH_SIZE IDs;
+        call flush_acks() at the end of a run for the remainder.
+        
+        Args:
+            message_id: Gmail message ID
+            http: Optional HTTP object used if the buffer is flushed
+        
+        Returns:
+            Boolean indicating the email was queued (or flushed) successfully
+        """
+        self._ack_buffer.append(message_id)
+        if len(self._ack_buffer) >= ACK_BATCH_SIZE:
+            return self.flush_acks(http) > 0
+        return True
+    
+    def flush_acks(self, http=None):
+        """
+        Acknowledge all buffered emails with users.messages.batchModify.
+        
+        Removes UNREAD (when MARK_AS_READ) and adds PROCESSED_LABEL (when set).
+        IDs whose call fails stay buffered and are retried on the next flush.
+        
+        Args:
+            http: Optional HTTP object to send the requests with
+        
+        Returns:
+            Number of emails acknowledged
+        """
+        if not self._ack_buffer:
+            return 0
+        
+        remove_label_ids = ['UNREAD'] if MARK_AS_READ else []
+        add_label_ids = []
+        if PROCESSED_LABEL:
+            label_id = self.get_label_id(PROCESSED_LABEL, http)
+            if label_id:
+                add_label_ids.append(label_id)
+            else:
+                logger.warning(f"Label '{PROCESSED_LABEL}' not found")
+        
+        pending, self._ack_buffer = self._ack_buffer, []
+        done = self.batch_modify(pending, add_label_ids, remove_label_ids, http)
+        self._ack_buffer = pending[done:] + self._ack_buffer
+        logger.info(f"Acknowledged {done} emails ({len(self._ack_buffer)} pending)")
+        
+        if done and self.on_acknowledged:
+            self.on_acknowledged(pending[:done])
+        return done
+    
+    def batch_modify(self, message_ids, add_label_ids=None, remove_label_ids=None, http=None):
+        """
+        Change labels of many emails, up to 1000 per API call.
+        
+        Args:
+            message_ids: List of Gmail message IDs
+            add_label_ids: Label IDs to add
+            remove_label_ids: Label IDs to remove
+            http: Optional HTTP object to send the requests with
+        
+        Returns:
+            Number of leading message IDs modified before the first failure
+        """
+        if not add_label_ids and not remove_label_ids:
+            return len(message_ids)
+        
+        body = {}
+        if add_label_ids:
+            body['addLabelIds'] = list(add_label_ids)
+        if remove_label_ids:
+            body['removeLabelIds'] = list(remove_label_ids)
+        
+        done = 0
+        for start in range(0, len(message_ids), 1000):
+            chunk = message_ids[start:start + 1000]
+            try:
+                self.executor.execute(self.service.users().messages().batchModify(
+                    userId='me',
+                    body=dict(body, ids=chunk)
+                ), QUOTA_UNITS['messages.batchModify'], http)
+            except Exception as e:
+                logger.error(f"Error modifying labels of {len(chunk)} emails: {e}")
+                break
+            done += len(chunk)
+            logger.debug(f"Modified labels of {len(chunk)} emails")
+        
+        return done
+    
+    def get_label_id(self, label_name, http=None):
+        """
+        Resolve a label name to its ID.
+        
+        Labels are listed once and cached; the cache is refreshed only when
+        a name is missing from it.
+        
+        Args:
+            label_name: Label name (e.g., 'Processed')
+            http: Optional HTTP object used if labels must be listed
+        
+        Returns:
+            Label ID string or None if the label does not exist
+        """
+        if self._label_ids is None or label_name not in self._label_ids:
+            self._refresh_labels(http)
+        return self._label_ids.get(label_name)
+    
+    def _refresh_labels(self, http=None):
+        """
+        Reload the label name -> ID cache from the API.
+        """
+        try:
+            request = self.service.users().labels().list(userId='me')
+            labels = self.executor.execute(request, QUOTA_UNITS['labels.list'], http).get('labels', [])
+            self._label_ids = {label['name']: label['id'] for label in labels}
+        except Exception as e:
+            logger.error(f"Error listing labels: {e}")
+            if self._label_ids is None:
+                self._label_ids = {}
+    
     def add_label(self, message_id, label_name):
         """
         Add label to email.
@@ -177,16 +872,14 @@ class GmailReader:
             Boolean indicating success
         """
         try:
-            # Get label ID
-            labels = self.service.users().labels().list(userId='me').execute()['labels']
-            label_id = next((l['id'] for l in labels if l['name'] == label_name), None)
+            label_id = self.get_label_id(label_name)
             
             if label_id:
-                self.service.users().messages().modify(
+                self.executor.execute(self.service.users().messages().modify(
                     userId='me',
                     id=message_id,
                     body={'addLabelIds': [label_id]}
-                ).execute()
+                ), QUOTA_UNITS['messages.modify'])
                 logger.debug(f"Added label '{label_name}' to email {message_id}")
                 return True
             else:
@@ -0,0 +1,117 @@
+import datetime
+from email.utils import parsedate_to_datetime
+import pytz
+from dateutil import parser as date_parser
+
+class HeaderIndex:
+    """
+    Case-insensitive, multi-valued index of message headers.
+    
+    Built in one pass over the Gmail header list; lookups are dictionary
+    hits instead of scans. Picklable, so emails can be sent to extraction
+    worker processes.
+    """
+    
+    __slots__ = ('_values',)
+    
+    def __init__(self, headers=()):
+        """
+        Args:
+            headers: Gmail header list ([{'name': ..., 'value': ...}, ...])
+        """
+        values = {}
+        for header in headers:
+            values.setdefault(header['name'].lower(), []).append(header['value'])
+        self._values = values
+    
+    def get(self, name, default=''):
+        """
+        Get the first value of a header.
+        
+        Args:
+            name: Header name, any case
+            default: Returned when the header is missing
+        
+        Returns:
+            Header value string
+        """
+        values = self._values.get(name.lower())
+        return values[0] if values else default
+    
+    def get_all(self, name):
+        """
+        Get every value of a header, in message order.
+        
+        Args:
+            name: Header name, any case (e.g., 'Received')
+        
+        Returns:
+            List of value strings
+        """
+        return list(self._values.get(name.lower(), ()))
+    
+    def names(self):
+        """
+        Get the lower-cased names of the headers present.
+        
+        Returns:
+            List of header names
+        """
+        return list(self._values)
+    
+    def __contains__(self, name):
+        return name.lower() in self._values
+    
+    def __len__(self):
+        return sum(len(values) for values in self._values.values())
+    
+    def __repr__(self):
+        return f"HeaderIndex({self._values!r})"
+    
+    def __eq__(self, other):
+        if not isinstance(other, HeaderIndex):
+            return NotImplemented
+        return self._values == other._values
+    
+    def __getstate__(self):
+        return self._values
+    
+    def __setstate__(self, state):
+        self._values = state
+
+def parse_date(value, internal_date=None):
+    """
+    Parse a Date header into a timezone-aware datetime.
+    
+    RFC 2822 dates are parsed with the standard library; other formats go
+    through dateutil. Dates without a timezone are taken as UTC. When the
+    header is missing or unparseable, Gmail's internalDate (milliseconds
+    since the epoch) is used instead.
+    
+    Args:
+        value: Date header value
+        internal_date: Gmail internalDate string (optional)
+    
+    Returns:
+        Aware datetime, or None
+    """
+    parsed = None
+    if value:
+        try:
+            parsed = parsedate_to_datetime(value)
+        except (TypeError, ValueError, IndexError):
+            try:
+                parsed = date_parser.parse(value, fuzzy=True)
+            except (ValueError, OverflowError):
+                parsed = None
+    
+    if parsed is None and internal_date:
+        try:
+            return datetime.datetime.fromtimestamp(int(internal_date) / 1000, tz=pytz.UTC)
+        except (TypeError, ValueError, OverflowError, OSError):
+            return None
+    
+    if parsed is not None and parsed.tzinfo is None:
+        parsed = pytz.UTC.localize(parsed)
+    
+    return parsed
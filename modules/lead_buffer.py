@@ -0,0 +1,227 @@
+from modules.dedup import DedupIndex
+from modules.logger import setup_logger
+from config import LEAD_BATCH_SIZE, LEAD_BATCH_MAX_BYTES, MARK_AS_READ, PROCESSED_LABEL
+
+logger = setup_logger(__name__)
+
+class LeadBuffer:
+    """
+    Collects validated leads and writes them with one batched append.
+    
+    Each lead is kept with the Gmail message ID it came from, so callers
+    only acknowledge emails once the batch containing their lead has been
+    committed to the sheet. Emails whose lead duplicates a buffered one
+    are settled with the same batch.
+    """
+    
+    def __init__(self, writer, max_rows=LEAD_BATCH_SIZE, max_bytes=LEAD_BATCH_MAX_BYTES):
+        """
+        Initialize buffer.
+        
+        Args:
+            writer: LeadSink used to commit batches
+            max_rows: Rows per batch
+            max_bytes: Approximate payload bytes per batch (0 = no limit)
+        """
+        self.writer = writer
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self._leads = []
+        self._message_ids = []
+        self._duplicate_ids = []
+        self._index = DedupIndex()
+        self._bytes = 0
+    
+    def __len__(self):
+        return len(self._leads)
+    
+    def add(self, lead, message_id):
+        """
+        Add lead to buffer.
+        
+        Args:
+            lead: Lead
+            message_id: Gmail message ID the lead was extracted from
+        
+        Returns:
+            Boolean indicating the buffer is full and should be flushed
+        """
+        self._leads.append(lead)
+        self._message_ids.append(message_id)
+        self._index.add_lead(lead)
+        values = lead.to_row()
+        if lead.extra:
+            values.extend(lead.extra.values())
+        self._bytes += sum(len(str(value).encode('utf-8')) for value in values)
+        return self.is_full()
+    
+    def is_full(self):
+        """
+        Check if a flush limit has been reached.
+        
+        Returns:
+            Boolean
+        """
+        if len(self._leads) >= self.max_rows:
+            return True
+        return bool(self.max_bytes) and self._bytes >= self.max_bytes
+    
+    def find_duplicate(self, lead):
+        """
+        Check if a lead duplicates one waiting to be written.
+        
+        Args:
+            lead: Lead
+        
+        Returns:
+            'email', 'phone' or 'name' for the key that matched, or None
+        """
+        return self._index.find_lead(lead)
+    
+    def add_duplicate(self, message_id):
+        """
+        Attach an email whose lead duplicates a buffered one.
+        
+        It is done once the batch holding the original lead is committed.
+        
+        Args:
+            message_id: Gmail message ID of the duplicate
+        """
+        self._duplicate_ids.append(message_id)
+    
+    def flush(self):
+        """
+        Write buffered leads with a single batched append.
+        
+        The buffer is emptied either way; leads from a failed batch are not
+        retried here, their emails (and those of their duplicates) stay
+        unread and are picked up next run.
+        
+        Returns:
+            Tuple (committed_message_ids, failed_message_ids,
+            duplicate_message_ids settled by the commit)
+        """
+        if not self._leads:
+            return [], [], []
+        
+        leads, message_ids, duplicate_ids = self._leads, self._message_ids, self._duplicate_ids
+        self._leads, self._message_ids, self._duplicate_ids = [], [], []
+        self._index = DedupIndex()
+        self._bytes = 0
+        
+        successful, total = self.writer.append_multiple_leads(leads)
+        if successful == total:
+            logger.debug(f"Committed batch of {total} leads")
+            return message_ids, [], duplicate_ids
+        
+        logger.warning(f"Batch of {total} leads was not written")
+        return [], message_ids, []
+
+def commit_leads(buffer, gmail, http=None, ledger=None):
+    """
+    Flush buffered leads and acknowledge the emails that were written.
+    
+    Args:
+        buffer: LeadBuffer with pending leads
+        gmail: GmailReader used to acknowledge emails
+        http: Optional HTTP object for Gmail requests (see GmailReader.get_http)
+        ledger: Optional MessageLedger; committed emails are marked written
+            before they are acknowledged
+    
+    Returns:
+        Tuple (successful_count, failed_count)
+    """
+    committed, failed, duplicates = buffer.flush()
+    
+    # Emails of a failed batch stay unread: keep the history checkpoint
+    # before them
+    gmail.mark_unsettled(failed)
+    
+    # Only emails whose lead is in the sheet are marked as read
+    acknowledge_done(committed + duplicates, gmail, http, ledger)
+    
+    return len(committed), len(failed)
+
+def acknowledge_done(message_ids, gmail, http=None, ledger=None):
+    """
+    Record emails whose lead is in the output as done and acknowledge them.
+    
+    Args:
+        message_ids: Gmail message IDs
+        gmail: GmailReader used to acknowledge emails
+        http: Optional HTTP object for Gmail requests
+        ledger: Optional MessageLedger; emails are marked written before
+            they are acknowledged
+    """
+    if MARK_AS_READ or PROCESSED_LABEL:
+        if ledger and message_ids:
+            ledger.mark(message_ids, 'written')
+        for message_id in message_ids:
+            gmail.acknowledge(message_id, http)
+    elif ledger and message_ids:
+        # Nothing to acknowledge: the email is done once its lead is written
+        ledger.mark(message_ids, 'acked')
+
+def settle_duplicate(lead, message_id, sink, buffer, gmail, http=None, ledger=None):
+    """
+    Check a lead against the sink and the buffer, settling its email if it is a duplicate.
+    
+    A duplicate of a stored lead is acknowledged like a written one, so
+    it is not fetched again; a duplicate of a buffered lead waits for that
+    batch to be committed.
+    
+    Args:
+        lead: Lead
+        message_id: Gmail message ID the lead was extracted from
+        sink: LeadSink holding the stored leads
+        buffer: LeadBuffer with pending leads
+        gmail: GmailReader used to acknowledge emails
+        http: Optional HTTP object for Gmail requests
+        ledger: Optional MessageLedger
+    
+    Returns:
+        'email', 'phone' or 'name' for the key that matched, or None
+    
+    Raises:
+        DuplicateCheckError: If the sink's duplicate index cannot be loaded
+    """
+    duplicate = sink.find_duplicate(lead)
+    if duplicate:
+        acknowledge_done([message_id], gmail, http, ledger)
+        return duplicate
+    
+    duplicate = buffer.find_duplicate(lead)
+    if duplicate:
+        buffer.add_duplicate(message_id)
+    return duplicate
+
+def resume_acks(ledger, gmail, http=None):
+    """
+    Connect a ledger to Gmail and retry acknowledgements left by earlier runs.
+    
+    Emails whose lead was written but whose acknowledgement never happened
+    (crash, quota error) are acknowledged in bulk without being fetched or
+    written again.
+    
+    Args:
+        ledger: MessageLedger instance
+        gmail: GmailReader used to acknowledge emails
+        http: Optional HTTP object for Gmail requests
+    
+    Returns:
+        Number of emails queued for acknowledgement
+    """
+    gmail.on_acknowledged = lambda message_ids: ledger.mark(message_ids, 'acked')
+    
+    if not (MARK_AS_READ or PROCESSED_LABEL):
+        return 0
+    
+    pending = ledger.pending_acks()
+    if not pending:
+        return 0
+    
+    logger.info(f"Retrying acknowledgement of {len(pending)} emails from a previous run")
+    for message_id in pending:
+        gmail.acknowledge(message_id, http)
+    gmail.flush_acks(http)
+    return len(pending)
@@ -0,0 +1,186 @@
+import os
+import sqlite3
+import threading
+import time
+from modules.logger import setup_logger
+from config import LEDGER_FILE, LEDGER_RETENTION_DAYS, GMAIL_BATCH_SIZE
+
+logger = setup_logger(__name__)
+
+# Processing states, in order
+STATES = ('fetched', 'extracted', 'written', 'acked')
+
+# Messages whose lead (or for duplicates, an equal one) is already in the sheet
+DONE_STATES = ('written', 'acked')
+
+# SQLite host parameter limit is 999 on older builds
+QUERY_CHUNK = 500
+
+class MessageLedger:
+    """
+    Local SQLite ledger of Gmail messages and how far each got.
+    
+    Keyed by Gmail message ID, so a run interrupted between the Sheets
+    append and the Gmail acknowledgement resumes without re-appending:
+    written messages are skipped before they are fetched and their
+    acknowledgement is retried in bulk. The database runs in WAL mode and
+    is safe to share between threads.
+    """
+    
+    def __init__(self, path=LEDGER_FILE):
+        """
+        Open (or create) the ledger.
+        
+        Args:
+            path: SQLite database file
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS messages ('
+            ' id TEXT PRIMARY KEY,'
+            ' state TEXT NOT NULL,'
+            ' email TEXT,'
+            ' updated_at REAL NOT NULL'
+            ')'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS messages_state ON messages (state)')
+    
+    def close(self):
+        """
+        Close the database connection.
+        """
+        with self._lock:
+            self._conn.close()
+    
+    def mark(self, message_ids, state, email=None):
+        """
+        Record that messages reached a state.
+        
+        States never move backwards: marking an acked message as written
+        is a no-op.
+        
+        Args:
+            message_ids: Iterable of Gmail message IDs
+            state: One of STATES
+            email: Lead email to store alongside (optional)
+        """
+        rank = STATES.index(state)
+        now = time.time()
+        rows = [(message_id, state, email, now) for message_id in message_ids]
+        if not rows:
+            return
+        
+        # Only move forward: compare positions of the old and new state
+        order = ' '.join(f"WHEN '{s}' THEN {i}" for i, s in enumerate(STATES))
+        with self._lock:
+            self._conn.execute('BEGIN')
+            self._conn.executemany(
+                'INSERT INTO messages (id, state, email, updated_at) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT(id) DO UPDATE SET '
+                ' state = excluded.state,'
+                ' email = COALESCE(excluded.email, messages.email),'
+                ' updated_at = excluded.updated_at '
+                f'WHERE (CASE messages.state {order} END) <= {rank}',
+                rows
+            )
+            self._conn.execute('COMMIT')
+    
+    def get_states(self, message_ids):
+        """
+        Look up the state of messages.
+        
+        Args:
+            message_ids: List of Gmail message IDs
+        
+        Returns:
+            Dictionary of message ID -> state for the IDs that are known
+        """
+        states = {}
+        with self._lock:
+            for start in range(0, len(message_ids), QUERY_CHUNK):
+                chunk = message_ids[start:start + QUERY_CHUNK]
+                placeholders = ','.join('?' * len(chunk))
+                cursor = self._conn.execute(
+                    f'SELECT id, state FROM messages WHERE id IN ({placeholders})',
+                    chunk
+                )
+                states.update(cursor.fetchall())
+        return states
+    
+    def skip_done(self, message_ids, chunk_size=GMAIL_BATCH_SIZE):
+        """
+        Filter out messages whose lead is already written.
+        
+        IDs are looked up one fetch batch at a time, so the first batch is
+        fetched as soon as its IDs are listed.
+        
+        Args:
+            message_ids: Iterable of Gmail message IDs
+            chunk_size: IDs looked up per query
+        
+        Yields:
+            Message IDs still to process
+        """
+        chunk = []
+        skipped = 0
+        for message_id in message_ids:
+            chunk.append(message_id)
+            if len(chunk) >= chunk_size:
+                states = self.get_states(chunk)
+                for pending in chunk:
+                    if states.get(pending) in DONE_STATES:
+                        skipped += 1
+                    else:
+                        yield pending
+                chunk = []
+        
+        if chunk:
+            states = self.get_states(chunk)
+            for pending in chunk:
+                if states.get(pending) in DONE_STATES:
+                    skipped += 1
+                else:
+                    yield pending
+        
+        if skipped:
+            logger.info(f"Skipped {skipped} emails already written in a previous run")
+    
+    def pending_acks(self):
+        """
+        Get messages written to the sheet but not acknowledged in Gmail.
+        
+        Returns:
+            List of Gmail message IDs
+        """
+        with self._lock:
+            cursor = self._conn.execute("SELECT id FROM messages WHERE state = 'written'")
+            return [row[0] for row in cursor.fetchall()]
+    
+    def prune(self, days=LEDGER_RETENTION_DAYS):
+        """
+        Delete acknowledged messages older than days.
+        
+        Args:
+            days: Retention in days (0 keeps everything)
+        
+        Returns:
+            Number of rows deleted
+        """
+        if not days:
+            return 0
+        
+        cutoff = time.time() - days * 86400
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM messages WHERE state = 'acked' AND updated_at < ?",
+                (cutoff,)
+            )
+            return cursor.rowcount
@@ -1,42 +1,172 @@
+import atexit
+import json
 import logging
 import logging.handlers
-from config import LOG_FILE, LOG_LEVEL
+import os
+import queue
+import threading
+import time
+from config import LOG_FILE, LOG_LEVEL, LOG_FORMAT, LOG_SAMPLE_PER_SECOND
 
-def setup_logger(name):
+# Pass as extra= on messages logged once per email/lead, so they can be
+# sampled during large drains: logger.info(..., extra=PER_LEAD)
+PER_LEAD = {'per_lead': True}
+
+_lock = threading.Lock()
+_queue_handler = None
+_listener = None
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: time, level, logger, message (and exception).
     """
-    Set up logger with both file and console handlers.
     
-    Args:
-        name: Logger name (usually __name__)
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+class PerLeadSampler(logging.Filter):
+    """
+    Rate-limit per-lead messages at WARNING and below.
     
-    Returns:
-        Logger instance
+    Each call site may log up to rate messages per second; the rest are
+    dropped and counted, and the next message let through says how many
+    were suppressed. A run with a handful of leads logs every one of them,
+    a backlog drain of thousands logs a steady sample.
     """
-    logger = logging.getLogger(name)
-    logger.setLevel(getattr(logging, LOG_LEVEL))
     
-    # File handler
-    file_handler = logging.handlers.RotatingFileHandler(
-        LOG_FILE,
-        maxBytes=5*1024*1024,  # 5MB
-        backupCount=5
-    )
-    file_handler.setLevel(getattr(logging, LOG_LEVEL))
+    def __init__(self, rate=LOG_SAMPLE_PER_SECOND):
+        """
+        Args:
+            rate: Messages per second per call site (0 = no sampling)
+        """
+        super().__init__()
+        self.rate = rate
+        self._sites = {}
+    
+    def filter(self, record):
+        if not self.rate or record.levelno > logging.WARNING or not getattr(record, 'per_lead', False):
+            return True
+        
+        site = (record.pathname, record.lineno)
+        now = time.monotonic()
+        window, logged, suppressed = self._sites.get(site, (now, 0, 0))
+        if now - window >= 1.0:
+            window, logged = now, 0
+        
+        if logged >= self.rate:
+            self._sites[site] = (window, logged, suppressed + 1)
+            return False
+        
+        if suppressed:
+            record.msg = f"{record.getMessage()} (+{suppressed} similar messages suppressed)"
+            record.args = None
+        self._sites[site] = (window, logged + 1, 0)
+        return True
+
+class _ProcessQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that only queues in the process that owns the listener.
+    
+    Forked extraction workers inherit the handler but not the listener
+    thread; there, records are written directly instead of piling up in a
+    queue nobody reads.
+    """
+    
+    def __init__(self, log_queue, listener):
+        super().__init__(log_queue)
+        self.listener = listener
+        self.pid = os.getpid()
     
-    # Console handler
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
+    def prepare(self, record):
+        # The queue stays in this process: no need to pre-format or copy
+        # the record, only to resolve its arguments
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
     
-    # Formatter
-    formatter = logging.Formatter(
+    def emit(self, record):
+        if os.getpid() != self.pid:
+            self.listener.handle(record)
+            return
+        super().emit(record)
+
+def _build_formatter():
+    if LOG_FORMAT == 'json':
+        return JsonFormatter()
+    return logging.Formatter(
         '[%(asctime)s] [%(levelname)s] [%(name)s] %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
     )
+
+def _get_queue_handler():
+    """
+    Create the shared queue handler and start its listener thread once.
+    
+    Returns:
+        QueueHandler feeding the file and console handlers
+    """
+    global _queue_handler, _listener
+    
+    with _lock:
+        if _queue_handler is not None:
+            return _queue_handler
+        
+        formatter = _build_formatter()
+        
+        # File handler
+        file_handler = logging.handlers.RotatingFileHandler(
+            LOG_FILE,
+            maxBytes=5*1024*1024,  # 5MB
+            backupCount=5
+        )
+        file_handler.setLevel(getattr(logging, LOG_LEVEL))
+        file_handler.setFormatter(formatter)
+        
+        # Console handler
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(logging.INFO)
+        console_handler.setFormatter(formatter)
+        
+        log_queue = queue.SimpleQueue()
+        _listener = logging.handlers.QueueListener(
+            log_queue, file_handler, console_handler, respect_handler_level=True
+        )
+        _queue_handler = _ProcessQueueHandler(log_queue, _listener)
+        _queue_handler.addFilter(PerLeadSampler())
+        
+        _listener.start()
+        # Write out everything still queued before the interpreter exits
+        atexit.register(_listener.stop)
+        return _queue_handler
+
+def setup_logger(name):
+    """
+    Get a logger writing to the shared file and console handlers.
     
-    file_handler.setFormatter(formatter)
-    console_handler.setFormatter(formatter)
+    Records are queued and written by a background thread, so file and
+    console I/O never block the caller. Calling this again for the same
+    name returns the same logger without adding handlers.
+    
+    Args:
+        name: Logger name (usually __name__)
+    
+    Returns:
+        Logger instance
+    """
+    logger = logging.getLogger(name)
+    logger.setLevel(getattr(logging, LOG_LEVEL))
     
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    handler = _get_queue_handler()
+    if handler not in logger.handlers:
+        logger.addHandler(handler)
     
     return logger
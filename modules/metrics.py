@@ -0,0 +1,375 @@
+import json
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from modules.logger import setup_logger
+from config import METRICS_REPORT_FILE, METRICS_PROMETHEUS_FILE
+
+logger = setup_logger(__name__)
+
+# Latency samples kept per stage; past this, p50/p95 are computed from a
+# uniform random sample (count, total and max stay exact)
+MAX_SAMPLES = 10000
+
+# Samples queued before they are folded into the per-stage totals
+FLUSH_EVERY = 1024
+
+# Prefix of every Prometheus metric name
+PROMETHEUS_PREFIX = 'lead_extractor'
+
+class _Stage:
+    """
+    Latency accumulator for one stage.
+    """
+    
+    __slots__ = ('count', 'total', 'max', 'samples')
+    
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = []
+
+class Timer:
+    """
+    Context manager that records how long its block took.
+    """
+    
+    __slots__ = ('metrics', 'stage', 'started')
+    
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+        self.started = 0.0
+    
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.stage, time.perf_counter() - self.started)
+        return False
+
+class Metrics:
+    """
+    In-process timers, counters and byte totals for one run.
+    
+    Thread-safe and cheap enough for the hot path: a timer is two
+    perf_counter() calls and a lock-free deque append; samples are folded
+    into the per-stage totals in bulk. Samples recorded in extraction
+    worker processes are sent back with drain() and merged into the
+    parent's metrics.
+    """
+    
+    def __init__(self, max_samples=MAX_SAMPLES):
+        """
+        Initialize empty metrics.
+        
+        Args:
+            max_samples: Latency samples kept per stage
+        """
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        self.reset()
+    
+    def reset(self):
+        """
+        Clear everything and restart the run clock.
+        """
+        with self._lock:
+            self._pending = deque()
+            self._stages = {}
+            self._counters = {}
+            self._bytes = {}
+            self.started_at = time.time()
+            self._started = time.monotonic()
+    
+    def timer(self, stage):
+        """
+        Time a block of code.
+        
+        Args:
+            stage: Stage name, e.g. 'extract.scan'
+        
+        Returns:
+            Timer context manager
+        """
+        return Timer(self, stage)
+    
+    def observe(self, stage, seconds):
+        """
+        Record one latency sample.
+        
+        Args:
+            stage: Stage name
+            seconds: Elapsed time
+        """
+        # deque.append is atomic, so the hot path takes no lock
+        pending = self._pending
+        pending.append((stage, seconds))
+        if len(pending) >= FLUSH_EVERY:
+            with self._lock:
+                self._flush()
+    
+    def _flush(self):
+        """
+        Fold queued samples into the per-stage totals (lock held).
+        """
+        pending = self._pending
+        while pending:
+            try:
+                stage, seconds = pending.popleft()
+            except IndexError:
+                break
+            entry = self._stages.get(stage)
+            if entry is None:
+                entry = self._stages[stage] = _Stage()
+            self._add_sample(entry, seconds)
+    
+    def _add_sample(self, entry, seconds):
+        entry.count += 1
+        entry.total += seconds
+        if seconds > entry.max:
+            entry.max = seconds
+        
+        if len(entry.samples) < self.max_samples:
+            entry.samples.append(seconds)
+        else:
+            # Reservoir sampling: every sample has the same chance to be kept
+            slot = int(self._random.random() * entry.count)
+            if slot < self.max_samples:
+                entry.samples[slot] = seconds
+    
+    def count(self, name, amount=1):
+        """
+        Increment a counter.
+        
+        Args:
+            name: Counter name, e.g. 'leads.duplicate'
+            amount: Increment
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+    
+    def add_bytes(self, name, sent=0, received=0):
+        """
+        Add transferred bytes.
+        
+        Args:
+            name: Destination, e.g. 'gmail'
+            sent: Request body bytes
+            received: Response body bytes
+        """
+        with self._lock:
+            totals = self._bytes.setdefault(name, {'sent': 0, 'received': 0})
+            totals['sent'] += sent
+            totals['received'] += received
+    
+    def drain(self):
+        """
+        Take the recorded stages, counters and bytes, leaving them empty.
+        
+        Returns:
+            Picklable state for merge()
+        """
+        with self._lock:
+            self._flush()
+            state = (
+                {name: (e.count, e.total, e.max, e.samples) for name, e in self._stages.items()},
+                self._counters,
+                self._bytes
+            )
+            self._stages, self._counters, self._bytes = {}, {}, {}
+        return state
+    
+    def merge(self, state):
+        """
+        Add metrics drained from another process.
+        
+        Args:
+            state: Value returned by drain()
+        """
+        stages, counters, transferred = state
+        with self._lock:
+            self._flush()
+            for name, (count, total, maximum, samples) in stages.items():
+                entry = self._stages.get(name)
+                if entry is None:
+                    entry = self._stages[name] = _Stage()
+                # Replay the samples, then correct the exact totals
+                base_count = entry.count
+                for seconds in samples:
+                    self._add_sample(entry, seconds)
+                entry.count = base_count + count
+                entry.total += total - sum(samples)
+                entry.max = max(entry.max, maximum)
+            
+            for name, amount in counters.items():
+                self._counters[name] = self._counters.get(name, 0) + amount
+            
+            for name, totals in transferred.items():
+                current = self._bytes.setdefault(name, {'sent': 0, 'received': 0})
+                current['sent'] += totals['sent']
+                current['received'] += totals['received']
+    
+    def report(self, stats=None, row_count=None):
+        """
+        Build the run report.
+        
+        Args:
+            stats: Run counts (processed, successful, ...) to include
+            row_count: Rows in the output after the run
+        
+        Returns:
+            JSON-serializable dictionary
+        """
+        with self._lock:
+            self._flush()
+            stages = {
+                name: {
+                    'count': entry.count,
+                    'total_seconds': round(entry.total, 6),
+                    'p50_ms': round(percentile(entry.samples, 0.50) * 1000, 3),
+                    'p95_ms': round(percentile(entry.samples, 0.95) * 1000, 3),
+                    'max_ms': round(entry.max * 1000, 3)
+                }
+                for name, entry in sorted(self._stages.items())
+            }
+            report = {
+                'started_at': self.started_at,
+                'duration_seconds': round(time.monotonic() - self._started, 3),
+                'stages': stages,
+                'counters': dict(sorted(self._counters.items())),
+                'bytes': {name: dict(totals) for name, totals in sorted(self._bytes.items())}
+            }
+        
+        if stats is not None:
+            report['run'] = dict(stats)
+        if row_count is not None:
+            report['row_count'] = row_count
+        return report
+    
+    def write_reports(self, stats=None, row_count=None, json_file=METRICS_REPORT_FILE,
+                      prometheus_file=METRICS_PROMETHEUS_FILE):
+        """
+        Write the JSON run report and the Prometheus text file.
+        
+        Args:
+            stats: Run counts to include
+            row_count: Rows in the output after the run
+            json_file: JSON report path (empty skips it)
+            prometheus_file: Prometheus textfile-collector path (empty skips it)
+        
+        Returns:
+            The report dictionary
+        """
+        report = self.report(stats, row_count)
+        
+        try:
+            if json_file:
+                _write_atomic(json_file, json.dumps(report, indent=2))
+            if prometheus_file:
+                _write_atomic(prometheus_file, to_prometheus(report))
+        except Exception as e:
+            logger.warning(f"Error writing run report: {e}")
+        
+        return report
+
+def percentile(samples, fraction):
+    """
+    Nearest-rank percentile.
+    
+    Args:
+        samples: List of numbers
+        fraction: Percentile between 0 and 1
+    
+    Returns:
+        Value, or 0.0 for no samples
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+def to_prometheus(report):
+    """
+    Render a run report in the Prometheus text exposition format.
+    
+    Args:
+        report: Dictionary returned by Metrics.report
+    
+    Returns:
+        String
+    """
+    stage_metric = f"{PROMETHEUS_PREFIX}_stage_seconds"
+    lines = [
+        f"# HELP {stage_metric} Latency per pipeline stage and API method.",
+        f"# TYPE {stage_metric} summary"
+    ]
+    for name, stage in report['stages'].items():
+        label = f'stage="{_escape(name)}"'
+        lines.append(f'{stage_metric}{{{label},quantile="0.5"}} {round(stage["p50_ms"] / 1000, 6)}')
+        lines.append(f'{stage_metric}{{{label},quantile="0.95"}} {round(stage["p95_ms"] / 1000, 6)}')
+        lines.append(f'{stage_metric}_sum{{{label}}} {stage["total_seconds"]}')
+        lines.append(f'{stage_metric}_count{{{label}}} {stage["count"]}')
+    
+    counter_metric = f"{PROMETHEUS_PREFIX}_events_total"
+    lines += [f"# HELP {counter_metric} Events counted during the run.", f"# TYPE {counter_metric} counter"]
+    for name, value in report['counters'].items():
+        lines.append(f'{counter_metric}{{name="{_escape(name)}"}} {value}')
+    
+    bytes_metric = f"{PROMETHEUS_PREFIX}_bytes_total"
+    lines += [f"# HELP {bytes_metric} HTTP body bytes transferred.", f"# TYPE {bytes_metric} counter"]
+    for name, totals in report['bytes'].items():
+        for direction, value in totals.items():
+            lines.append(f'{bytes_metric}{{api="{_escape(name)}",direction="{direction}"}} {value}')
+    
+    run_metric = f"{PROMETHEUS_PREFIX}_run_emails"
+    lines += [
+        f"# HELP {PROMETHEUS_PREFIX}_run_duration_seconds Duration of the last run.",
+        f"# TYPE {PROMETHEUS_PREFIX}_run_duration_seconds gauge",
+        f"{PROMETHEUS_PREFIX}_run_duration_seconds {report['duration_seconds']}",
+        f"# HELP {run_metric} Emails per outcome in the last run.",
+        f"# TYPE {run_metric} gauge"
+    ]
+    for outcome, value in report.get('run', {}).items():
+        lines.append(f'{run_metric}{{outcome="{_escape(outcome)}"}} {value}')
+    
+    if 'row_count' in report:
+        lines += [
+            f"# HELP {PROMETHEUS_PREFIX}_output_rows Rows in the lead output.",
+            f"# TYPE {PROMETHEUS_PREFIX}_output_rows gauge",
+            f"{PROMETHEUS_PREFIX}_output_rows {report['row_count']}"
+        ]
+    
+    return '\n'.join(lines) + '\n'
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _write_atomic(path, content):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_file = f"{path}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp_file, path)
+
+_default_metrics = None
+
+def get_metrics():
+    """
+    Get the metrics shared by every module in this process.
+    
+    Returns:
+        Metrics instance
+    """
+    global _default_metrics
+    if _default_metrics is None:
+        _default_metrics = Metrics()
+    return _default_metrics
@@ -0,0 +1,144 @@
+from operator import attrgetter
+
+class EmailMessage:
+    """
+    An email fetched from Gmail.
+    
+    A fixed-layout record (__slots__) instead of a dictionary: about half
+    the memory per email and a smaller pickle for extraction workers.
+    """
+    
+    __slots__ = ('id', 'sender', 'subject', 'date', 'received_at', 'headers', 'body')
+    
+    def __init__(self, id, sender='', subject='', date='', received_at=None, headers=None, body=''):
+        """
+        Args:
+            id: Gmail message ID
+            sender: From header
+            subject: Subject header
+            date: Date header (raw string)
+            received_at: Parsed Date as an aware datetime
+            headers: HeaderIndex with every header
+            body: Decoded body text
+        """
+        self.id = id
+        self.sender = sender
+        self.subject = subject
+        self.date = date
+        self.received_at = received_at
+        self.headers = headers
+        self.body = body
+    
+    def __repr__(self):
+        return f"EmailMessage(id={self.id!r}, sender={self.sender!r}, subject={self.subject!r})"
+    
+    def __eq__(self, other):
+        if not isinstance(other, EmailMessage):
+            return NotImplemented
+        return _email_fields(self) == _email_fields(other)
+    
+    def __reduce__(self):
+        # Pickled as constructor arguments: about twice as fast as
+        # __getstate__/__setstate__ when chunks go to extraction workers
+        return EmailMessage, _email_fields(self)
+
+class Lead:
+    """
+    A lead extracted from an email.
+    
+    FIELDS is the default sheet column order, so to_row() is one attribute
+    tuple copy. Fields added with DataExtractor.register_pattern are kept
+    in extra.
+    """
+    
+    # Default column order (see sheets_writer.DEFAULT_HEADERS)
+    FIELDS = ('timestamp', 'source', 'name', 'email', 'phone', 'company', 'subject', 'status')
+    
+    __slots__ = FIELDS + ('extra',)
+    
+    def __init__(self, timestamp='', source='Gmail', name='', email='', phone='', company='',
+                 subject='', status='Nuevo', extra=None):
+        self.timestamp = timestamp
+        self.source = source
+        self.name = name
+        self.email = email
+        self.phone = phone
+        self.company = company
+        self.subject = subject
+        self.status = status
+        self.extra = extra
+    
+    def get(self, field, default=''):
+        """
+        Get a field by name, including extra fields.
+        
+        Args:
+            field: Field name
+            default: Returned for unknown or empty fields
+        
+        Returns:
+            Field value
+        """
+        if field in Lead.FIELDS:
+            value = getattr(self, field)
+        elif self.extra:
+            value = self.extra.get(field)
+        else:
+            value = None
+        return default if value is None else value
+    
+    def to_row(self):
+        """
+        Serialize in FIELDS order.
+        
+        Returns:
+            List of cell values
+        """
+        return list(_default_row(self))
+    
+    def to_dict(self):
+        """
+        Convert to a plain dictionary (FIELDS plus extra fields).
+        
+        Returns:
+            Dictionary
+        """
+        data = dict(zip(Lead.FIELDS, _default_row(self)))
+        if self.extra:
+            data.update(self.extra)
+        return data
+    
+    @classmethod
+    def row_builder(cls, fields):
+        """
+        Compile a function turning a lead into a row for the given columns.
+        
+        Args:
+            fields: Lead field name per sheet column
+        
+        Returns:
+            Callable lead -> list of cell values
+        """
+        fields = tuple(fields)
+        if fields == cls.FIELDS:
+            return cls.to_row
+        
+        if len(fields) > 1 and all(field in cls.FIELDS for field in fields):
+            getter = attrgetter(*fields)
+            return lambda lead: [value if value is not None else '' for value in getter(lead)]
+        
+        return lambda lead: [lead.get(field) for field in fields]
+    
+    def __repr__(self):
+        return f"Lead({', '.join(f'{k}={v!r}' for k, v in self.to_dict().items())})"
+    
+    def __eq__(self, other):
+        if not isinstance(other, Lead):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+    
+    def __reduce__(self):
+        return Lead, _default_row(self) + (self.extra,)
+
+_email_fields = attrgetter(*EmailMessage.__slots__)
+_default_row = attrgetter(*Lead.FIELDS)
@@ -1,38 +1,86 @@
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-from modules.logger import setup_logger
-from config import CREDENTIALS_FILE, SHEETS_ID, SHEET_NAME
+import json
+import os
+import re
+import time
+import unicodedata
+from modules.api_executor import get_executor
+from modules.credentials import get_credentials_provider
+from modules.dedup import KEY_VERSION, DedupIndex
+from modules.discovery import build_service
+from modules.logger import setup_logger, PER_LEAD
+from modules.records import Lead
+from modules.sinks import DuplicateCheckError, LeadSink
+from config import (
+    SHEETS_ID,
+    SHEET_NAME,
+    DEDUP_SNAPSHOT_FILE,
+    HEADER_CACHE_TTL_SECONDS
+)
 
 logger = setup_logger(__name__)
 
-# Sheets API Scope
-SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+# Column holding lead emails when the header row has no email column
+EMAIL_COLUMN = 'D'
 
-class SheetsWriter:
+# Lead fields read from the sheet into the duplicate index
+DEDUP_FIELDS = ('email', 'phone', 'name', 'company')
+
+# Header row used when the sheet cannot be read
+DEFAULT_HEADERS = ['Timestamp', 'Source', 'Nombre', 'Email', 'Teléfono', 'Empresa', 'Asunto', 'Estado']
+
+# Normalized header name -> lead field
+HEADER_ALIASES = {
+    'fecha': 'timestamp',
+    'fecha y hora': 'timestamp',
+    'marca temporal': 'timestamp',
+    'fuente': 'source',
+    'origen': 'source',
+    'nombre': 'name',
+    'correo': 'email',
+    'correo electronico': 'email',
+    'e-mail': 'email',
+    'mail': 'email',
+    'telefono': 'phone',
+    'celular': 'phone',
+    'empresa': 'company',
+    'compania': 'company',
+    'asunto': 'subject',
+    'estado': 'status'
+}
+
+# Last row of an A1 range such as 'Leads!A12:H14'
+RANGE_END_ROW = re.compile(r'(\d+)$')
+
+class SheetsWriter(LeadSink):
     """
     Handles Google Sheets API interactions.
     """
     
-    def __init__(self):
+    def __init__(self, service=None):
         """
         Initialize Sheets API client.
+        
+        Args:
+            service: Prebuilt Sheets API service (skips authentication)
         """
-        self.service = self._authenticate()
+        self.service = service or self._authenticate()
+        self.executor = get_executor('sheets')
         self.sheet_name = SHEET_NAME
+        self._index = None
+        self._row_count = None
+        self._column_fields = None
+        self._headers_loaded_at = 0.0
+        self._row_builders = {}
     
     def _authenticate(self):
         """
-        Authenticate with Sheets API.
+        Authenticate with Sheets API using the shared credentials provider.
         
         Returns:
             Sheets API service instance
         """
         try:
-            creds = Credentials.from_service_account_file(
-                CREDENTIALS_FILE,
-                scopes=SCOPES
-            )
-            service = build('sheets', 'v4', credentials=creds)
+            service = build_service('sheets', 'v4', http=get_credentials_provider().new_http())
             logger.info(f"Successfully authenticated with Sheets API")
             return service
         
@@ -48,49 +96,136 @@ class SheetsWriter:
             List of header strings
         """
         try:
-            result = self.service.spreadsheets().values().get(
-                spreadsheetId=SHEETS_ID,
-                range=f"{self.sheet_name}!A1:Z1"
-            ).execute()
-            
-            headers = result.get('values', [[]])[0]
-            logger.info(f"Retrieved headers: {headers}")
-            return headers
+            return self._fetch_headers()
         
         except Exception as e:
             logger.error(f"Error getting headers: {e}")
             # Return default headers if sheet is empty
-            return ['Timestamp', 'Source', 'Nombre', 'Email', 'Teléfono', 'Empresa', 'Asunto', 'Estado']
+            return list(DEFAULT_HEADERS)
+    
+    def _fetch_headers(self):
+        """
+        Read the header row, raising on API errors.
+        
+        Returns:
+            List of header strings
+        """
+        result = self.executor.execute(self.service.spreadsheets().values().get(
+            spreadsheetId=SHEETS_ID,
+            range=f"{self.sheet_name}!A1:Z1"
+        ))
+        
+        headers = result.get('values', [[]])[0]
+        logger.info(f"Retrieved headers: {headers}")
+        return headers
+    
+    def get_column_fields(self):
+        """
+        Get the lead field for each sheet column.
+        
+        The header row is read once and the mapping kept for the lifetime of
+        the writer, or until HEADER_CACHE_TTL_SECONDS elapse when set.
+        Default headers used after a failed read are not cached.
+        
+        Returns:
+            List of lead field names, one per column
+        """
+        expired = (
+            HEADER_CACHE_TTL_SECONDS > 0
+            and time.monotonic() - self._headers_loaded_at > HEADER_CACHE_TTL_SECONDS
+        )
+        if self._column_fields is not None and not expired:
+            return self._column_fields
+        
+        try:
+            headers = self._fetch_headers()
+        except Exception as e:
+            logger.error(f"Error getting headers: {e}")
+            return [self.header_to_field(header) for header in DEFAULT_HEADERS]
+        
+        self._column_fields = [self.header_to_field(header) for header in headers]
+        self._headers_loaded_at = time.monotonic()
+        return self._column_fields
+    
+    def invalidate_header_cache(self):
+        """
+        Drop the cached header row so the next append re-reads it.
+        """
+        self._column_fields = None
+        self._headers_loaded_at = 0.0
+        self._row_builders = {}
+    
+    @staticmethod
+    def header_to_field(header):
+        """
+        Map a header cell to a lead field name.
+        
+        Accents and other diacritics are stripped (e.g., 'Teléfono' ->
+        'telefono') and Spanish names are translated through HEADER_ALIASES.
+        
+        Args:
+            header: Header cell text
+        
+        Returns:
+            Lead field name
+        """
+        decomposed = unicodedata.normalize('NFKD', header)
+        name = ''.join(c for c in decomposed if not unicodedata.combining(c))
+        name = ' '.join(name.casefold().split())
+        return HEADER_ALIASES.get(name, name)
+    
+    def _build_rows(self, leads):
+        """
+        Build sheet rows from leads.
+        
+        The row builder for the current column layout is compiled once;
+        with the default layout each row is a plain attribute tuple copy.
+        E.164 phones get a leading apostrophe, or USER_ENTERED would turn
+        '+541145678901' into a number.
+        
+        Args:
+            leads: List of Lead objects
+        
+        Returns:
+            List of rows (lists of cell values)
+        """
+        fields = tuple(self.get_column_fields())
+        build = self._row_builders.get(fields)
+        if build is None:
+            build = self._row_builders[fields] = Lead.row_builder(fields)
+        rows = [build(lead) for lead in leads]
+        
+        if 'phone' in fields:
+            column = fields.index('phone')
+            for row in rows:
+                if str(row[column]).startswith('+'):
+                    row[column] = f"'{row[column]}"
+        return rows
     
     def append_lead(self, lead):
         """
         Append lead to sheet.
         
         Args:
-            lead: Dictionary with lead data
+            lead: Lead
         
         Returns:
             Boolean indicating success
         """
         try:
-            # Get headers to map data correctly
-            headers = self.get_headers()
-            
-            # Create row based on headers
-            row = []
-            for header in headers:
-                value = lead.get(header.lower().replace('á', 'a').replace('é', 'e'), '')
-                row.append(value)
+            # Map data correctly using the cached header row
+            rows = self._build_rows([lead])
             
             # Append to sheet
-            result = self.service.spreadsheets().values().append(
+            result = self.executor.execute(self.service.spreadsheets().values().append(
                 spreadsheetId=SHEETS_ID,
                 range=f"{self.sheet_name}!A:Z",
                 valueInputOption='USER_ENTERED',
-                body={'values': [row]}
-            ).execute()
+                body={'values': rows}
+            ), idempotent=False)
             
-            logger.info(f"Lead appended successfully: {lead.get('email', 'N/A')}")
+            self._record_appended([lead], result)
+            logger.info(f"Lead appended successfully: {lead.email}", extra=PER_LEAD)
             return True
         
         except Exception as e:
@@ -102,30 +237,23 @@ class SheetsWriter:
         Append multiple leads to sheet.
         
         Args:
-            leads: List of lead dictionaries
+            leads: List of Lead objects
         
         Returns:
             Tuple (successful_count, total_count)
         """
         try:
-            headers = self.get_headers()
-            rows = []
-            
-            for lead in leads:
-                row = []
-                for header in headers:
-                    value = lead.get(header.lower().replace('á', 'a').replace('é', 'e'), '')
-                    row.append(value)
-                rows.append(row)
+            rows = self._build_rows(leads)
             
             # Batch append
-            result = self.service.spreadsheets().values().append(
+            result = self.executor.execute(self.service.spreadsheets().values().append(
                 spreadsheetId=SHEETS_ID,
                 range=f"{self.sheet_name}!A:Z",
                 valueInputOption='USER_ENTERED',
                 body={'values': rows}
-            ).execute()
+            ), idempotent=False)
             
+            self._record_appended(leads, result)
             logger.info(f"Appended {len(leads)} leads to sheet")
             return len(leads), len(leads)
         
@@ -137,25 +265,216 @@ class SheetsWriter:
         """
         Check if email already exists in sheet.
         
+        Uses the in-memory index loaded once per run (see load_dedup_index),
+        comparing normalized addresses (see dedup.normalize_email).
+        
         Args:
             email: Email to search for
         
         Returns:
             Boolean indicating if email exists
+        
+        Raises:
+            DuplicateCheckError if the index cannot be loaded; the lead must
+            not be treated as new
+        """
+        return self._loaded_index().has_email(email)
+    
+    def find_duplicate(self, lead):
+        """
+        Check if a lead's email, phone or (with DEDUP_FUZZY_THRESHOLD) name
+        and company are already in the sheet.
+        
+        Args:
+            lead: Lead
+        
+        Returns:
+            'email', 'phone' or 'name' for the key that matched, or None
+        
+        Raises:
+            DuplicateCheckError if the index cannot be loaded
         """
+        return self._loaded_index().find_lead(lead)
+    
+    def _loaded_index(self):
         try:
-            result = self.service.spreadsheets().values().get(
-                spreadsheetId=SHEETS_ID,
-                range=f"{self.sheet_name}!D:D"  # Assuming column D is Email
-            ).execute()
+            return self.load_dedup_index()
+        except Exception as e:
+            raise DuplicateCheckError(f"Could not load duplicate index: {e}") from e
+    
+    def _dedup_columns(self):
+        """
+        Get the sheet column of each field read into the duplicate index.
+        
+        Returns:
+            Dictionary of field -> 0-based column index
+        """
+        fields = self.get_column_fields()
+        columns = {field: fields.index(field) for field in DEDUP_FIELDS if field in fields}
+        columns.setdefault('email', ord(EMAIL_COLUMN) - ord('A'))
+        return columns
+    
+    def load_dedup_index(self, refresh=False):
+        """
+        Load the duplicate index of the leads already in the sheet.
+        
+        The email, phone, name and company columns are read with a single
+        request; the index is built once per writer and kept up to date as
+        leads are appended. When DEDUP_SNAPSHOT_FILE is set, a local
+        snapshot is used instead of downloading the columns, as long as the
+        sheet still has the row count recorded in the snapshot.
+        
+        Args:
+            refresh: Ignore the in-memory index and snapshot
+        
+        Returns:
+            DedupIndex
+        """
+        if self._index is not None and not refresh:
+            return self._index
+        
+        if not refresh and self._load_snapshot():
+            return self._index
+        
+        columns = self._dedup_columns()
+        first, last = min(columns.values()), max(columns.values())
+        result = self.executor.execute(self.service.spreadsheets().values().get(
+            spreadsheetId=SHEETS_ID,
+            range=f"{self.sheet_name}!{column_letter(first)}:{column_letter(last)}"
+        ))
+        
+        rows = result.get('values', [])
+        # Position of each DEDUP_FIELDS column in the rows read (None = no column)
+        offsets = [columns[field] - first if field in columns else None for field in DEDUP_FIELDS]
+        index = DedupIndex()
+        # Skip the header row
+        for row in rows[1:]:
+            index.add(*(row[o] if o is not None and o < len(row) else '' for o in offsets))
+        
+        self._index = index
+        self._row_count = len(rows)
+        logger.info(f"Loaded {len(index)} emails into duplicate index")
+        return self._index
+    
+    def save_dedup_snapshot(self):
+        """
+        Persist the duplicate index to DEDUP_SNAPSHOT_FILE.
+        
+        Returns:
+            Boolean indicating a snapshot was written
+        """
+        if not DEDUP_SNAPSHOT_FILE or self._index is None or self._row_count is None:
+            return False
+        
+        try:
+            directory = os.path.dirname(DEDUP_SNAPSHOT_FILE)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            
+            snapshot = {
+                'version': KEY_VERSION,
+                'spreadsheet_id': SHEETS_ID,
+                'sheet_name': self.sheet_name,
+                'row_count': self._row_count,
+                **self._index.to_snapshot()
+            }
+            tmp_file = f"{DEDUP_SNAPSHOT_FILE}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_file, DEDUP_SNAPSHOT_FILE)
             
-            emails = [row[0] for row in result.get('values', []) if row]
-            return email in emails
+            logger.debug(f"Saved duplicate index snapshot ({self._row_count} rows)")
+            return True
         
         except Exception as e:
-            logger.warning(f"Error checking duplicate: {e}")
+            logger.warning(f"Error saving duplicate index snapshot: {e}")
             return False
     
+    def _load_snapshot(self):
+        """
+        Load the duplicate index from DEDUP_SNAPSHOT_FILE if still valid.
+        
+        Returns:
+            Boolean indicating the snapshot was loaded
+        """
+        if not DEDUP_SNAPSHOT_FILE or not os.path.exists(DEDUP_SNAPSHOT_FILE):
+            return False
+        
+        try:
+            with open(DEDUP_SNAPSHOT_FILE, encoding='utf-8') as f:
+                snapshot = json.load(f)
+            
+            if (snapshot.get('spreadsheet_id') != SHEETS_ID
+                    or snapshot.get('sheet_name') != self.sheet_name):
+                return False
+            
+            # Keys normalized with other rules, or missing keys the current
+            # settings compare, mean rebuilding from the sheet
+            index = DedupIndex.from_snapshot(snapshot) if snapshot.get('version') == KEY_VERSION else None
+            if index is None:
+                logger.info("Duplicate index snapshot was built with other settings, reloading from sheet")
+                return False
+            
+            row_count = snapshot['row_count']
+            if not self._has_row_count(row_count):
+                logger.info("Duplicate index snapshot is stale, reloading from sheet")
+                return False
+            
+            self._index = index
+            self._row_count = row_count
+            logger.info(f"Loaded {len(index)} emails from duplicate index snapshot")
+            return True
+        
+        except Exception as e:
+            logger.warning(f"Error loading duplicate index snapshot: {e}")
+            return False
+    
+    def _has_row_count(self, row_count):
+        """
+        Check that the email column ends exactly at row_count.
+        
+        Reads only two cells: the last expected row must be filled and the
+        one after it empty.
+        
+        Args:
+            row_count: Expected number of rows
+        
+        Returns:
+            Boolean indicating the sheet has that many rows
+        """
+        first_row = max(row_count, 1)
+        column = column_letter(self._dedup_columns()['email'])
+        result = self.executor.execute(self.service.spreadsheets().values().get(
+            spreadsheetId=SHEETS_ID,
+            range=f"{self.sheet_name}!{column}{first_row}:{column}{row_count + 1}"
+        ))
+        
+        values = result.get('values', [])
+        if not row_count:
+            return not any(values)
+        return len(values) == 1 and bool(values[0])
+    
+    def _record_appended(self, leads, result):
+        """
+        Update the duplicate index and row count after a successful append.
+        
+        Args:
+            leads: Lead objects that were appended
+            result: values().append API response
+        """
+        if self._index is not None:
+            for lead in leads:
+                self._index.add_lead(lead)
+        
+        # Rows are appended after the last one, so the end of the updated
+        # range is the new row count
+        updated_range = result.get('updates', {}).get('updatedRange', '')
+        match = RANGE_END_ROW.search(updated_range)
+        if match:
+            self._row_count = int(match.group(1))
+        elif self._row_count is not None:
+            self._row_count += len(leads)
+    
     def update_cell(self, row, col, value):
         """
         Update specific cell.
@@ -169,12 +488,12 @@ class SheetsWriter:
             Boolean indicating success
         """
         try:
-            self.service.spreadsheets().values().update(
+            self.executor.execute(self.service.spreadsheets().values().update(
                 spreadsheetId=SHEETS_ID,
                 range=f"{self.sheet_name}!{col}{row}",
                 valueInputOption='USER_ENTERED',
                 body={'values': [[value]]}
-            ).execute()
+            ))
             
             logger.debug(f"Updated cell {col}{row} with value: {value}")
             return True
@@ -183,18 +502,27 @@ class SheetsWriter:
             logger.error(f"Error updating cell: {e}")
             return False
     
-    def get_row_count(self):
+    def get_row_count(self, refresh=False):
         """
         Get total number of rows in sheet.
         
+        The count known from loading the duplicate index or from the last
+        append response is returned without an API call.
+        
+        Args:
+            refresh: Read the row count from the sheet
+        
         Returns:
             Integer row count
         """
+        if self._row_count is not None and not refresh:
+            return self._row_count
+        
         try:
-            result = self.service.spreadsheets().values().get(
+            result = self.executor.execute(self.service.spreadsheets().values().get(
                 spreadsheetId=SHEETS_ID,
                 range=f"{self.sheet_name}!A:A"
-            ).execute()
+            ))
             
             rows = result.get('values', [])
             return len(rows)
@@ -202,3 +530,20 @@ class SheetsWriter:
         except Exception as e:
             logger.error(f"Error getting row count: {e}")
             return 0
+
+def column_letter(index):
+    """
+    Convert a 0-based column index to its A1 letters (0 -> 'A', 26 -> 'AA').
+    
+    Args:
+        index: Column index
+    
+    Returns:
+        Column letters
+    """
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
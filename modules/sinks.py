@@ -0,0 +1,585 @@
+import csv
+import io
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from modules.dedup import KEY_VERSION, DedupIndex, NameIndex, name_key, normalize_email, normalize_phone
+from modules.logger import setup_logger
+from modules.records import Lead
+from config import OUTPUT_BACKEND, OUTPUT_FILE, OUTPUT_FSYNC, DEDUP_MATCH_PHONE, DEDUP_FUZZY_THRESHOLD
+
+logger = setup_logger(__name__)
+
+# Backends available through OUTPUT_BACKEND
+BACKENDS = ('sheets', 'csv', 'jsonl', 'sqlite')
+
+class DuplicateCheckError(Exception):
+    """
+    The output could not be read to check for duplicates.
+    """
+
+class LeadSink(ABC):
+    """
+    Destination for validated leads.
+    
+    The pipeline only relies on this interface: batched appends, duplicate
+    checks against what is already stored, and a row count.
+    SheetsWriter implements it for Google Sheets; CsvSink, JsonlSink and
+    SqliteSink write local files for backfills too large or too fast for
+    the Sheets API. A subclass missing one of the abstract methods fails
+    when it is instantiated, not in the middle of a run.
+    """
+    
+    @abstractmethod
+    def append_multiple_leads(self, leads):
+        """
+        Append a batch of leads.
+        
+        Args:
+            leads: List of Lead objects
+        
+        Returns:
+            Tuple (successful_count, total_count); a batch is either fully
+            written or not at all
+        """
+    
+    def append_lead(self, lead):
+        """
+        Append one lead.
+        
+        Args:
+            lead: Lead
+        
+        Returns:
+            Boolean indicating success
+        """
+        successful, total = self.append_multiple_leads([lead])
+        return successful == total
+    
+    @abstractmethod
+    def check_duplicate(self, email):
+        """
+        Check if a lead with this email is already stored.
+        
+        Args:
+            email: Email to search for
+        
+        Returns:
+            Boolean indicating if email exists
+        
+        Raises:
+            DuplicateCheckError if the stored emails cannot be read
+        """
+    
+    def find_duplicate(self, lead):
+        """
+        Check if a lead is already stored under any duplicate key.
+        
+        Sinks with a DedupIndex also match the phone and, with
+        DEDUP_FUZZY_THRESHOLD, a near-identical name + company; the default
+        only compares emails.
+        
+        Args:
+            lead: Lead
+        
+        Returns:
+            'email', 'phone' or 'name' for the key that matched, or None
+        
+        Raises:
+            DuplicateCheckError if the stored leads cannot be read
+        """
+        return 'email' if self.check_duplicate(lead.email) else None
+    
+    @abstractmethod
+    def get_row_count(self):
+        """
+        Get the number of stored rows.
+        
+        Returns:
+            Integer row count
+        """
+    
+    @staticmethod
+    def normalize_email(email):
+        """
+        Normalize an email for duplicate comparison.
+        
+        Args:
+            email: Raw email string
+        
+        Returns:
+            Comparison key (see dedup.normalize_email)
+        """
+        return normalize_email(email)
+    
+    def save_dedup_snapshot(self):
+        """
+        Persist the duplicate index, for sinks that keep one.
+        
+        Returns:
+            Boolean indicating a snapshot was written
+        """
+        return False
+    
+    def close(self):
+        """
+        Release files and connections.
+        """
+
+class _FileSink(LeadSink):
+    """
+    Append-only local file, one lead per line.
+    
+    The file is scanned once on first use to build the duplicate index
+    (DedupIndex) and row count; both are then kept in memory. Each batch is written with a
+    single write() and, with OUTPUT_FSYNC, one fsync, so the cost of
+    durability is paid per batch rather than per lead. A batch that fails
+    half-way is truncated away.
+    """
+    
+    # Written after every record
+    LINE_END = b'\n'
+    
+    # Bytes read at a time while looking for the last line
+    TAIL_CHUNK = 65536
+    
+    def __init__(self, path, fsync=OUTPUT_FSYNC):
+        """
+        Initialize sink.
+        
+        Args:
+            path: Output file
+            fsync: fsync the file after every batch
+        """
+        self.path = path
+        self.fsync = fsync
+        self._file = None
+        self._index = None
+        self._row_count = 0
+        self._lock = threading.Lock()
+    
+    def _open(self):
+        """
+        Scan the existing file and open it for appending.
+        """
+        if self._file is not None:
+            return
+        
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        index = DedupIndex()
+        rows = 0
+        if os.path.exists(self.path):
+            self._repair_tail()
+            with open(self.path, encoding='utf-8', newline='') as f:
+                for row in self._scan(f):
+                    index.add(row.get('email'), row.get('phone'), row.get('name'), row.get('company'))
+                    rows += 1
+        
+        self._file = open(self.path, 'a', encoding='utf-8', newline='')
+        self._index = index
+        self._row_count = rows
+        logger.info(f"Loaded {len(index)} emails from {self.path}")
+    
+    def _repair_tail(self):
+        """
+        Fix the end of a file left by an interrupted write (crash, kill).
+        
+        Every batch ends with LINE_END, so text after the last newline is a
+        torn write unless it is a whole record (the line end is then added).
+        A torn record is truncated away; appending after it would merge the
+        next batch into it.
+        """
+        with open(self.path, 'rb+') as f:
+            end = f.seek(0, os.SEEK_END)
+            start = end
+            tail = b''
+            while start > 0 and b'\n' not in tail:
+                start = max(0, start - self.TAIL_CHUNK)
+                f.seek(start)
+                tail = f.read(end - start)
+            
+            line_start = start + tail.rfind(b'\n') + 1
+            last_line = tail[line_start - start:]
+            if not last_line.strip():
+                return
+            
+            if self._is_whole_record(last_line, line_start == 0):
+                f.seek(end)
+                f.write(self.LINE_END)
+            else:
+                logger.warning(f"Removing a partial last line ({len(last_line)} bytes) from {self.path}")
+                f.truncate(line_start)
+    
+    @abstractmethod
+    def _is_whole_record(self, line, first):
+        """
+        Check if the text after the file's last newline is a complete record.
+        
+        Args:
+            line: Bytes after the last newline
+            first: The line is the first one in the file
+        
+        Returns:
+            Boolean
+        """
+    
+    @abstractmethod
+    def _scan(self, f):
+        """
+        Read the leads stored in an open file.
+        
+        Yields:
+            Dictionary of field -> value for every stored lead
+        """
+    
+    @abstractmethod
+    def _serialize(self, leads):
+        """
+        Render leads as the text appended to the file.
+        
+        Returns:
+            String
+        """
+    
+    def append_multiple_leads(self, leads):
+        with self._lock:
+            try:
+                self._open()
+                position = self._file.tell()
+                try:
+                    self._file.write(self._serialize(leads))
+                    self._file.flush()
+                    if self.fsync:
+                        os.fsync(self._file.fileno())
+                except Exception:
+                    # Leave no partial batch behind
+                    self._file.truncate(position)
+                    raise
+                
+                for lead in leads:
+                    self._index.add_lead(lead)
+                self._row_count += len(leads)
+                logger.info(f"Appended {len(leads)} leads to {self.path}")
+                return len(leads), len(leads)
+            
+            except Exception as e:
+                logger.error(f"Error appending leads to {self.path}: {e}")
+                return 0, len(leads)
+    
+    def _loaded_index(self):
+        """
+        Get the duplicate index, scanning the file first if needed (lock held).
+        """
+        try:
+            self._open()
+        except Exception as e:
+            raise DuplicateCheckError(f"Could not read {self.path}: {e}") from e
+        return self._index
+    
+    def check_duplicate(self, email):
+        with self._lock:
+            return self._loaded_index().has_email(email)
+    
+    def find_duplicate(self, lead):
+        with self._lock:
+            return self._loaded_index().find_lead(lead)
+    
+    def get_row_count(self):
+        with self._lock:
+            try:
+                self._open()
+            except Exception as e:
+                logger.error(f"Error getting row count: {e}")
+                return 0
+            return self._row_count
+    
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+class CsvSink(_FileSink):
+    """
+    Leads appended to a CSV file.
+    
+    A new file gets a header row with the Lead field names. An existing
+    file keeps its own header: columns are filled by field name, so extra
+    pattern fields can be added as columns (unknown ones stay empty).
+    """
+    
+    def __init__(self, path, fsync=OUTPUT_FSYNC):
+        super().__init__(path, fsync)
+        self._fields = None
+        self._build_row = None
+    
+    # csv.writer's line terminator
+    LINE_END = b'\r\n'
+    
+    def _is_whole_record(self, line, first):
+        if line.count(b'"') % 2:
+            # Cut inside a quoted field
+            return False
+        try:
+            rows = list(csv.reader(io.StringIO(line.decode('utf-8'), newline='')))
+        except (ValueError, csv.Error):
+            return False
+        if len(rows) != 1:
+            return False
+        if first:
+            # A header only row: whole if it is the one new files get
+            return rows[0] == list(Lead.FIELDS)
+        with open(self.path, encoding='utf-8', newline='') as f:
+            header = next(csv.reader(f), [])
+        return len(rows[0]) == len(header)
+    
+    def _scan(self, f):
+        reader = csv.reader(f)
+        self._fields = next(reader, None)
+        if not self._fields:
+            self._fields = None
+            return
+        
+        fields = self._fields
+        for row in reader:
+            if row:
+                yield dict(zip(fields, row))
+    
+    def _serialize(self, leads):
+        output = io.StringIO()
+        writer = csv.writer(output)
+        if self._fields is None:
+            # New or empty file: write the header first
+            self._fields = list(Lead.FIELDS)
+            writer.writerow(self._fields)
+        if self._build_row is None:
+            self._build_row = Lead.row_builder(self._fields)
+        writer.writerows(self._build_row(lead) for lead in leads)
+        return output.getvalue()
+    
+    def append_multiple_leads(self, leads):
+        fields = self._fields
+        successful, total = super().append_multiple_leads(leads)
+        if not successful and fields is None:
+            # The header was truncated away with the failed batch
+            self._fields = None
+        return successful, total
+
+class JsonlSink(_FileSink):
+    """
+    Leads appended to a JSON Lines file, one object per lead (extra
+    pattern fields included).
+    """
+    
+    def _is_whole_record(self, line, first):
+        try:
+            json.loads(line)
+        except ValueError:
+            return False
+        return True
+    
+    def _scan(self, f):
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+    
+    def _serialize(self, leads):
+        return ''.join(json.dumps(lead.to_dict(), ensure_ascii=False) + '\n' for lead in leads)
+
+class SqliteSink(LeadSink):
+    """
+    Leads stored in a SQLite table with a unique index on the normalized
+    email and an index on the normalized phone.
+    
+    Email and phone duplicate checks are index lookups, so nothing is
+    loaded into memory; only the near-duplicate check (with
+    DEDUP_FUZZY_THRESHOLD) keeps the name + company keys in a NameIndex.
+    Each batch is one transaction; leads whose email is already stored are
+    ignored by the index instead of failing the batch. Keys are recomputed
+    when a database was written with older normalization rules.
+    """
+    
+    def __init__(self, path, fsync=OUTPUT_FSYNC):
+        """
+        Open (or create) the database.
+        
+        Args:
+            path: SQLite database file
+            fsync: Sync the database at every commit (synchronous=FULL);
+                off, WAL commits are only synced at checkpoints
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(f"PRAGMA synchronous={'FULL' if fsync else 'NORMAL'}")
+        columns = ''.join(f' {field} TEXT,' for field in Lead.FIELDS)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS leads ('
+            ' id INTEGER PRIMARY KEY,'
+            f'{columns}'
+            ' extra TEXT,'
+            ' email_key TEXT NOT NULL,'
+            ' phone_key TEXT'
+            ')'
+        )
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(leads)')}
+        if 'phone_key' not in columns:
+            self._conn.execute('ALTER TABLE leads ADD COLUMN phone_key TEXT')
+        self._conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS leads_email_key ON leads (email_key)')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS leads_phone_key ON leads (phone_key)')
+        if self._conn.execute('PRAGMA user_version').fetchone()[0] != KEY_VERSION:
+            self._rekey()
+        
+        placeholders = ', '.join('?' * (len(Lead.FIELDS) + 3))
+        self._insert = (
+            f"INSERT OR IGNORE INTO leads ({', '.join(Lead.FIELDS)}, extra, email_key, phone_key) "
+            f"VALUES ({placeholders})"
+        )
+        self._names = None
+    
+    def _rekey(self):
+        """
+        Recompute every stored email and phone key with the current rules.
+        """
+        rows = self._conn.execute('SELECT id, email, phone FROM leads').fetchall()
+        self._conn.execute('BEGIN')
+        try:
+            self._conn.executemany(
+                'UPDATE leads SET phone_key = ? WHERE id = ?',
+                [(normalize_phone(phone) or None, row_id) for row_id, _, phone in rows]
+            )
+            # Rows that now share a key with another one were already
+            # duplicates: keep their old key
+            self._conn.executemany(
+                'UPDATE OR IGNORE leads SET email_key = ? WHERE id = ?',
+                [(normalize_email(email), row_id) for row_id, email, _ in rows]
+            )
+            self._conn.execute(f'PRAGMA user_version = {KEY_VERSION}')
+            self._conn.execute('COMMIT')
+        except Exception:
+            self._conn.execute('ROLLBACK')
+            raise
+        if rows:
+            logger.info(f"Recomputed duplicate keys of {len(rows)} leads in {self.path}")
+    
+    def _name_index(self):
+        """
+        Load the name + company keys of stored leads once (lock held).
+        """
+        if self._names is None:
+            names = NameIndex()
+            for name, company in self._conn.execute('SELECT name, company FROM leads'):
+                names.add(name_key(name, company))
+            self._names = names
+        return self._names
+    
+    def append_multiple_leads(self, leads):
+        rows = [
+            tuple(lead.to_row()) + (
+                json.dumps(lead.extra, ensure_ascii=False) if lead.extra else None,
+                self.normalize_email(lead.email),
+                normalize_phone(lead.phone) or None
+            )
+            for lead in leads
+        ]
+        
+        try:
+            with self._lock:
+                self._conn.execute('BEGIN')
+                try:
+                    inserted = self._conn.executemany(self._insert, rows).rowcount
+                    self._conn.execute('COMMIT')
+                except Exception:
+                    self._conn.execute('ROLLBACK')
+                    raise
+                
+                if self._names is not None:
+                    for lead in leads:
+                        self._names.add(name_key(lead.name, lead.company))
+            
+            if inserted < len(leads):
+                logger.info(f"{len(leads) - inserted} leads were already in {self.path}")
+            logger.info(f"Appended {inserted} leads to {self.path}")
+            return len(leads), len(leads)
+        
+        except Exception as e:
+            logger.error(f"Error appending leads to {self.path}: {e}")
+            return 0, len(leads)
+    
+    def check_duplicate(self, email):
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    'SELECT 1 FROM leads WHERE email_key = ?',
+                    (self.normalize_email(email),)
+                ).fetchone()
+        except Exception as e:
+            raise DuplicateCheckError(f"Could not read {self.path}: {e}") from e
+        return row is not None
+    
+    def find_duplicate(self, lead):
+        phone_key = normalize_phone(lead.phone) if DEDUP_MATCH_PHONE else ''
+        try:
+            with self._lock:
+                if self._conn.execute(
+                    'SELECT 1 FROM leads WHERE email_key = ?',
+                    (self.normalize_email(lead.email),)
+                ).fetchone():
+                    return 'email'
+                if phone_key and self._conn.execute(
+                    'SELECT 1 FROM leads WHERE phone_key = ?', (phone_key,)
+                ).fetchone():
+                    return 'phone'
+                if DEDUP_FUZZY_THRESHOLD and self._name_index().find(name_key(lead.name, lead.company)):
+                    return 'name'
+        except Exception as e:
+            raise DuplicateCheckError(f"Could not read {self.path}: {e}") from e
+        return None
+    
+    def get_row_count(self):
+        try:
+            with self._lock:
+                return self._conn.execute('SELECT COUNT(*) FROM leads').fetchone()[0]
+        except Exception as e:
+            logger.error(f"Error getting row count: {e}")
+            return 0
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def create_sink(backend=OUTPUT_BACKEND, path=OUTPUT_FILE):
+    """
+    Create the lead sink selected in config.
+    
+    Args:
+        backend: One of BACKENDS
+        path: Output file for local backends (default data/leads.<backend>)
+    
+    Returns:
+        LeadSink instance
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown output backend: {backend}")
+    
+    if backend == 'sheets':
+        # The Google client stack is only loaded for the Sheets backend
+        from modules.sheets_writer import SheetsWriter
+        return SheetsWriter()
+    
+    path = path or f"data/leads.{backend}"
+    if backend == 'csv':
+        return CsvSink(path)
+    if backend == 'jsonl':
+        return JsonlSink(path)
+    return SqliteSink(path)
@@ -0,0 +1,118 @@
+"""
+Unit tests for the duplicate-detection keys in modules.dedup.
+
+Run with:
+    python -m unittest discover tests
+"""
+
+import unittest
+
+from modules.dedup import DedupIndex, NameIndex, name_key, normalize_email, normalize_phone
+
+class NormalizeEmailTest(unittest.TestCase):
+    
+    def test_case_and_whitespace(self):
+        self.assertEqual(normalize_email('  Juan.Perez@Example.COM '), 'juan.perez@example.com')
+    
+    def test_gmail_dots_and_tags(self):
+        self.assertEqual(normalize_email('Juan.Perez+web@gmail.com'), 'juanperez@gmail.com')
+        self.assertEqual(normalize_email('j.u.a.n.perez@googlemail.com'), 'juanperez@gmail.com')
+    
+    def test_other_domains_keep_dots_and_tags(self):
+        self.assertEqual(normalize_email('juan.perez+web@empresa.com.ar'), 'juan.perez+web@empresa.com.ar')
+    
+    def test_empty(self):
+        self.assertEqual(normalize_email(None), '')
+        self.assertEqual(normalize_email(''), '')
+
+class NormalizePhoneTest(unittest.TestCase):
+    
+    def test_argentine_mobile_formats(self):
+        for phone in (
+            '+54 9 11 4567-8901',
+            '+54 11 4567-8901',
+            '011 15 4567-8901',
+            '(011) 4567-8901',
+            '11 4567 8901',
+            '0054 9 11 4567 8901',
+            "'+541145678901"
+        ):
+            with self.subTest(phone=phone):
+                self.assertEqual(normalize_phone(phone), '+541145678901')
+    
+    def test_longer_area_code(self):
+        self.assertEqual(normalize_phone('0351 15 123-4567'), '+543511234567')
+    
+    def test_other_country(self):
+        self.assertEqual(normalize_phone('+1 415 555 0100'), '+14155550100')
+        self.assertEqual(normalize_phone('415 555 0100', country_code='1'), '+14155550100')
+    
+    def test_rejects_dates(self):
+        for phone in ('2023-10-02', '20231002', '02/10/2023', '2023.10.02 10', '2023-10-02 14', '202310021430'):
+            with self.subTest(phone=phone):
+                self.assertEqual(normalize_phone(phone), '')
+    
+    def test_rejects_short_argentine_numbers(self):
+        self.assertEqual(normalize_phone('4567-8901'), '')
+        self.assertEqual(normalize_phone('+54 4567 8901'), '')
+    
+    def test_rejects_too_long_and_empty(self):
+        self.assertEqual(normalize_phone('+54 11 4567 8901 2345 67'), '')
+        self.assertEqual(normalize_phone('1234'), '')
+        self.assertEqual(normalize_phone(None), '')
+
+class NameIndexTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.index = NameIndex(threshold=0.6)
+        self.index.add(name_key('María González', 'Acme S.A.'))
+    
+    def test_name_key_ignores_accents_case_and_legal_forms(self):
+        self.assertEqual(name_key('María  GONZÁLEZ', 'ACME S.A.'), 'maria gonzalez / acme')
+        self.assertEqual(name_key('María', ''), '')
+    
+    def test_exact_key(self):
+        self.assertTrue(self.index.find(name_key('maria gonzalez', 'ACME')))
+    
+    def test_typo(self):
+        self.assertTrue(self.index.find(name_key('Maria Gonzales', 'Acme SRL')))
+    
+    def test_different_contact(self):
+        self.assertFalse(self.index.find(name_key('Pedro Ramírez', 'Globex')))
+        self.assertFalse(self.index.find(name_key('María González', 'Initech')))
+        self.assertFalse(self.index.find(''))
+    
+    def test_common_trigrams_are_not_blocked_on(self):
+        index = NameIndex(threshold=0.6, max_block=3)
+        for i in range(10):
+            index.add(name_key(f"Maria Gonzalez {i}", f"Acme {i}"))
+        self.assertTrue(index.find(name_key('Maria Gonzalez 7', 'Acme 7')))
+        self.assertTrue(index.find(name_key('Maria Gonsalez 7', 'Acme 7')))
+        self.assertFalse(index.find(name_key('Pedro Ramirez', 'Globex')))
+
+class DedupIndexTest(unittest.TestCase):
+    
+    def test_find_order(self):
+        index = DedupIndex(match_phone=True, fuzzy_threshold=0.6)
+        index.add('juan.perez@gmail.com', '+54 9 11 4567-8901', 'Juan Pérez', 'Acme')
+        
+        self.assertEqual(index.find('JuanPerez+x@googlemail.com'), 'email')
+        self.assertEqual(index.find('otro@x.com', '011 15 4567-8901'), 'phone')
+        self.assertEqual(index.find('otro@x.com', '', 'Juan Peres', 'ACME S.A.'), 'name')
+        self.assertIsNone(index.find('otro@x.com', '2023-10-02', 'Ana Díaz', 'Globex'))
+    
+    def test_snapshot_round_trip(self):
+        index = DedupIndex()
+        index.add('juan.perez@gmail.com', '+54 11 4567-8901')
+        restored = DedupIndex.from_snapshot(index.to_snapshot())
+        self.assertEqual(restored.find('juanperez@gmail.com'), 'email')
+        self.assertEqual(restored.emails, index.emails)
+        self.assertEqual(restored.phones, index.phones)
+    
+    def test_dates_do_not_collide(self):
+        index = DedupIndex(match_phone=True, fuzzy_threshold=0)
+        index.add('a@x.com', '2023-10-02')
+        self.assertIsNone(index.find('b@x.com', '20231002'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+"""
+Round trips of GmailReader's batched fetch against the fake HTTP transport.
+
+Run with:
+    python -m unittest discover tests
+"""
+
+import logging
+import math
+import unittest
+
+from googleapiclient.discovery import build
+
+from bench.fake_transport import FakeGmailHttp, make_message
+from config import GMAIL_BATCH_SIZE
+from modules.api_executor import ApiExecutor
+from modules.gmail_reader import GmailReader
+
+def make_messages(n):
+    return {
+        f'msg{i:05d}': make_message(
+            f'msg{i:05d}',
+            f'Cliente {i} <cliente{i}@example.com>',
+            'Nueva consulta',
+            f'Nombre: Cliente {i}\nTelefono: +54 11 5555-{i:04d}\n'
+        )
+        for i in range(n)
+    }
+
+class GmailBatchTest(unittest.TestCase):
+    
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+    
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+    
+    def make_reader(self, messages):
+        http = FakeGmailHttp(messages)
+        reader = GmailReader(service=build('gmail', 'v1', http=http, static_discovery=True, cache_discovery=False))
+        # Unthrottled, so the shared quota bucket does not slow the test
+        reader.executor = ApiExecutor('gmail')
+        return reader, http
+    
+    def test_batching_divides_round_trips(self):
+        messages = make_messages(2 * GMAIL_BATCH_SIZE + 11)
+        message_ids = list(messages) + ['missing']
+        
+        reader, http = self.make_reader(messages)
+        serial = [reader.get_email_details(message_id) for message_id in message_ids]
+        self.assertEqual(http.request_count, len(message_ids))
+        
+        reader, http = self.make_reader(messages)
+        batched, failures = reader.get_emails_batch(message_ids)
+        self.assertEqual(http.request_count, math.ceil(len(message_ids) / GMAIL_BATCH_SIZE))
+        
+        self.assertEqual(batched, [email for email in serial if email])
+        self.assertEqual(list(failures), ['missing'])
+    
+    def test_full_batches(self):
+        messages = make_messages(2 * GMAIL_BATCH_SIZE)
+        
+        reader, http = self.make_reader(messages)
+        batched, failures = reader.get_emails_batch(list(messages))
+        self.assertEqual(http.request_count, 2)
+        self.assertEqual([email.id for email in batched], list(messages))
+        self.assertEqual(failures, {})
+
+if __name__ == '__main__':
+    unittest.main()
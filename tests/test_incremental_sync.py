@@ -0,0 +1,157 @@
+"""
+Incremental Gmail sync (SYNC_MODE=incremental) against the in-memory fakes.
+
+Run with:
+    python -m unittest discover tests
+"""
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+import types
+import unittest
+from unittest import mock
+
+from bench.fake_transport import make_message
+from bench.fakes import FakeGmailService
+from config import SEARCH_QUERY
+from main import process_emails
+from modules import gmail_reader
+from modules.async_pipeline import AsyncPipeline
+from modules.data_extractor import DataExtractor
+from modules.email_validation import EmailValidationPolicy
+from modules.gmail_reader import GmailReader
+from modules.sinks import CsvSink
+
+START = 1700000000
+
+def lead_message(message_id, received_at):
+    message = make_message(
+        message_id, f"Lead {message_id} <{message_id}@example.com>", 'Nueva consulta',
+        f"Nombre: Lead {message_id}\nTel: 011 15 4567-{int(message_id[1:]):04d}\n"
+    )
+    message['internalDate'] = str(received_at * 1000)
+    return message
+
+class FlakySink(CsvSink):
+    """
+    CsvSink whose appends fail while down is set.
+    """
+    
+    def __init__(self, path):
+        super().__init__(path, fsync=False)
+        self.down = False
+        self.on_append = None
+    
+    def append_multiple_leads(self, leads):
+        if self.on_append:
+            self.on_append()
+        if self.down:
+            return 0, len(leads)
+        return super().append_multiple_leads(leads)
+
+class IncrementalSyncTest(unittest.TestCase):
+    
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.checkpoint_file = os.path.join(directory.name, 'checkpoint.json')
+        
+        self.now = START
+        clock = types.SimpleNamespace(time=lambda: self.now, monotonic=time.monotonic)
+        for patcher in (
+            mock.patch.object(gmail_reader, 'HISTORY_CHECKPOINT_FILE', self.checkpoint_file),
+            mock.patch.object(gmail_reader, 'time', clock)
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        
+        self.service = FakeGmailService({})
+        self.sink = FlakySink(os.path.join(directory.name, 'leads.csv'))
+        self.addCleanup(self.sink.close)
+        self.extractor = DataExtractor(EmailValidationPolicy('syntax'))
+    
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+    
+    def run_once(self, use_async=False):
+        gmail = GmailReader(service=self.service)
+        gmail.sync_mode = 'incremental'
+        if use_async:
+            return asyncio.run(AsyncPipeline(gmail, self.extractor, self.sink).run(SEARCH_QUERY))
+        return process_emails(gmail, self.extractor, self.sink)
+    
+    def saved_checkpoint(self):
+        with open(self.checkpoint_file, encoding='utf-8') as f:
+            return json.load(f)
+    
+    def test_only_new_messages_are_listed(self):
+        self.service.add_message(lead_message('m1', START - 60))
+        self.assertEqual(self.run_once()['successful'], 1)
+        
+        self.assertEqual(self.run_once()['processed'], 0)
+        self.assertEqual(self.service.calls['messages.list'], 1)
+        
+        self.service.add_message(lead_message('m2', START + 60))
+        self.now = START + 120
+        self.assertEqual(self.run_once()['successful'], 1)
+        self.assertEqual(self.service.unread_count(), 0)
+    
+    def check_failed_write_keeps_checkpoint(self, use_async):
+        self.service.add_message(lead_message('m1', START - 60))
+        self.run_once(use_async)
+        checkpoint = self.saved_checkpoint()
+        
+        self.service.add_message(lead_message('m2', START + 60))
+        self.sink.down = True
+        self.assertEqual(self.run_once(use_async)['failed'], 1)
+        self.assertEqual(self.saved_checkpoint(), checkpoint)
+        
+        self.sink.down = False
+        self.assertEqual(self.run_once(use_async)['successful'], 1)
+        self.assertNotEqual(self.saved_checkpoint(), checkpoint)
+        self.assertEqual(self.service.unread_count(), 0)
+    
+    def test_failed_write_keeps_checkpoint(self):
+        self.check_failed_write_keeps_checkpoint(use_async=False)
+    
+    def test_failed_write_keeps_checkpoint_async(self):
+        self.check_failed_write_keeps_checkpoint(use_async=True)
+    
+    def test_failed_fetch_keeps_checkpoint(self):
+        self.service.add_message(lead_message('m1', START - 60))
+        self.run_once()
+        checkpoint = self.saved_checkpoint()
+        
+        self.service.add_message(lead_message('m2', START + 60))
+        self.service.item_error_rate = 1.0
+        self.service.error_status = 404
+        self.assertEqual(self.run_once()['processed'], 0)
+        self.assertEqual(self.saved_checkpoint(), checkpoint)
+        
+        self.service.item_error_rate = 0.0
+        self.assertEqual(self.run_once()['successful'], 1)
+    
+    def test_long_run_does_not_skip_messages_that_arrived_meanwhile(self):
+        self.service.add_message(lead_message('m1', START - 60))
+        
+        def two_hours_later():
+            # An email arrives 10 minutes into a run that ends 2 hours later
+            self.sink.on_append = None
+            self.service.add_message(lead_message('m2', START + 600))
+            self.now = START + 7200
+        
+        self.sink.on_append = two_hours_later
+        self.run_once()
+        self.assertEqual(self.saved_checkpoint()['timestamp'], START)
+        
+        self.now = START + 7300
+        self.assertEqual(self.run_once()['successful'], 1)
+        self.assertEqual(self.service.unread_count(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
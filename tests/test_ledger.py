@@ -0,0 +1,145 @@
+"""
+Unit tests for the message ledger and how duplicates are settled.
+
+Run with:
+    python -m unittest discover tests
+"""
+
+import logging
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from modules import lead_buffer
+from modules.lead_buffer import LeadBuffer, commit_leads, settle_duplicate
+from modules.ledger import MessageLedger
+from modules.records import Lead
+from modules.sinks import CsvSink
+
+def make_lead(letter):
+    return Lead(name=f"Lead {letter}", email=f"{letter}@example.com", phone=f"+54 11 4567-89{ord(letter) % 100:02d}")
+
+class RecordingGmail:
+    """
+    Stands in for GmailReader, recording acknowledged and unsettled emails.
+    """
+    
+    def __init__(self):
+        self.acknowledged = []
+        self.unsettled = []
+    
+    def acknowledge(self, message_id, http=None):
+        self.acknowledged.append(message_id)
+    
+    def mark_unsettled(self, message_ids):
+        self.unsettled.extend(message_ids)
+
+class FailingSink(CsvSink):
+    
+    def append_multiple_leads(self, leads):
+        return 0, len(leads)
+
+class LedgerTestCase(unittest.TestCase):
+    
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.ledger = MessageLedger(os.path.join(self.directory, 'ledger.sqlite3'))
+        self.addCleanup(self.ledger.close)
+    
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+
+class MessageLedgerTest(LedgerTestCase):
+    
+    def test_states_only_move_forward(self):
+        self.ledger.mark(['m1', 'm2'], 'written', email='a@example.com')
+        self.ledger.mark(['m1'], 'acked')
+        self.ledger.mark(['m1', 'm2'], 'fetched')
+        self.ledger.mark(['m3'], 'extracted')
+        
+        self.assertEqual(self.ledger.get_states(['m1', 'm2', 'm3', 'm4']), {
+            'm1': 'acked',
+            'm2': 'written',
+            'm3': 'extracted'
+        })
+    
+    def test_pending_acks(self):
+        self.ledger.mark(['m1', 'm2', 'm3'], 'written')
+        self.ledger.mark(['m2'], 'acked')
+        self.ledger.mark(['m4'], 'fetched')
+        
+        self.assertEqual(sorted(self.ledger.pending_acks()), ['m1', 'm3'])
+    
+    def test_skip_done(self):
+        self.ledger.mark(['m1'], 'written')
+        self.ledger.mark(['m2'], 'acked')
+        self.ledger.mark(['m3'], 'extracted')
+        
+        self.assertEqual(list(self.ledger.skip_done(['m1', 'm2', 'm3', 'm4'])), ['m3', 'm4'])
+    
+    def test_skip_done_yields_before_listing_ends(self):
+        listed = []
+        
+        def list_ids():
+            for i in range(100):
+                listed.append(i)
+                yield f"m{i}"
+        
+        pending = self.ledger.skip_done(list_ids(), chunk_size=10)
+        self.assertEqual(next(pending), 'm0')
+        self.assertEqual(len(listed), 10)
+
+class SettleDuplicateTest(LedgerTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(lead_buffer, 'MARK_AS_READ', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.gmail = RecordingGmail()
+    
+    def make_sink(self, sink_class=CsvSink):
+        sink = sink_class(os.path.join(self.directory, 'leads.csv'), fsync=False)
+        self.addCleanup(sink.close)
+        return sink
+    
+    def test_duplicate_of_stored_lead_is_acknowledged_at_once(self):
+        sink = self.make_sink()
+        sink.append_multiple_leads([make_lead('a')])
+        buffer = LeadBuffer(sink)
+        
+        duplicate = settle_duplicate(make_lead('a'), 'm2', sink, buffer, self.gmail, ledger=self.ledger)
+        self.assertEqual(duplicate, 'email')
+        self.assertEqual(self.gmail.acknowledged, ['m2'])
+        self.assertEqual(self.ledger.get_states(['m2']), {'m2': 'written'})
+    
+    def test_duplicate_of_buffered_lead_waits_for_its_batch(self):
+        sink = self.make_sink()
+        buffer = LeadBuffer(sink)
+        buffer.add(make_lead('a'), 'm1')
+        
+        self.assertEqual(settle_duplicate(make_lead('a'), 'm2', sink, buffer, self.gmail, ledger=self.ledger), 'email')
+        self.assertEqual(self.gmail.acknowledged, [])
+        self.assertEqual(self.ledger.get_states(['m2']), {})
+        
+        self.assertEqual(commit_leads(buffer, self.gmail, ledger=self.ledger), (1, 0))
+        self.assertEqual(self.gmail.acknowledged, ['m1', 'm2'])
+        self.assertEqual(self.ledger.get_states(['m1', 'm2']), {'m1': 'written', 'm2': 'written'})
+    
+    def test_duplicate_of_failed_batch_is_not_settled(self):
+        sink = self.make_sink(FailingSink)
+        buffer = LeadBuffer(sink)
+        buffer.add(make_lead('a'), 'm1')
+        settle_duplicate(make_lead('a'), 'm2', sink, buffer, self.gmail, ledger=self.ledger)
+        
+        self.assertEqual(commit_leads(buffer, self.gmail, ledger=self.ledger), (0, 1))
+        self.assertEqual(self.gmail.acknowledged, [])
+        self.assertEqual(self.gmail.unsettled, ['m1'])
+        self.assertEqual(self.ledger.get_states(['m1', 'm2']), {})
+
+if __name__ == '__main__':
+    unittest.main()
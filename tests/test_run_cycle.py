@@ -0,0 +1,66 @@
+"""
+Per-cycle counters of main.run_cycle, as reported by the daemon.
+
+Run with:
+    python -m unittest discover tests
+"""
+
+import logging
+import os
+import tempfile
+import unittest
+
+from bench.fake_transport import make_message
+from bench.fakes import FakeGmailService
+from main import run_cycle
+from modules.api_executor import get_executor
+from modules.data_extractor import DataExtractor
+from modules.email_validation import EmailValidationPolicy
+from modules.gmail_reader import GmailReader
+from modules.sinks import CsvSink
+
+def lead_message(message_id):
+    return make_message(
+        message_id, f"Lead {message_id} <{message_id}@example.com>", 'Nueva consulta',
+        f"Nombre: Lead {message_id}\nTel: 011 15 4567-{int(message_id[1:]):04d}\n"
+    )
+
+class RunCycleTest(unittest.TestCase):
+    
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.service = FakeGmailService({})
+        self.gmail = GmailReader(service=self.service)
+        self.sink = CsvSink(os.path.join(directory.name, 'leads.csv'), fsync=False)
+        self.addCleanup(self.sink.close)
+        self.extractor = DataExtractor(EmailValidationPolicy('syntax'))
+    
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+    
+    def test_counters_are_reset_every_cycle(self):
+        executor = get_executor('gmail')
+        self.service.add_message(lead_message('m1'))
+        self.extractor.validation.cache_hits = 5
+        run_cycle(self.gmail, self.extractor, self.sink)
+        first = executor.stats()['requests']
+        self.assertGreater(first, 0)
+        self.assertEqual(self.extractor.validation.stats()['cache_hits'], 0)
+        
+        self.service.add_message(lead_message('m2'))
+        self.assertEqual(run_cycle(self.gmail, self.extractor, self.sink)['successful'], 1)
+        self.assertEqual(executor.stats()['requests'], first)
+        
+        executor.reset()
+        self.assertEqual(executor.stats(), {
+            'requests': 0,
+            'retries': 0,
+            'errors': 0,
+            'throttle_wait_seconds': 0.0,
+            'backoff_seconds': 0.0
+        })
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+"""
+Unit tests for the local lead sinks in modules.sinks.
+
+Run with:
+    python -m unittest discover tests
+"""
+
+import csv
+import json
+import logging
+import os
+import tempfile
+import unittest
+
+from modules.records import Lead
+from modules.sinks import CsvSink, JsonlSink, LeadSink, SqliteSink
+
+def make_lead(letter):
+    return Lead(name=f"Lead {letter}", email=f"{letter}@example.com", phone=f"+54 11 4567-89{ord(letter) % 100:02d}")
+
+class SinkTestCase(unittest.TestCase):
+    
+    def setUp(self):
+        logging.disable(logging.CRITICAL)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+    
+    def tearDown(self):
+        logging.disable(logging.NOTSET)
+    
+    def write(self, sink_class, path, leads):
+        sink = sink_class(path, fsync=False)
+        try:
+            return sink.append_multiple_leads(leads)
+        finally:
+            sink.close()
+    
+    def append_text(self, path, text):
+        with open(path, 'a', encoding='utf-8', newline='') as f:
+            f.write(text)
+
+class TornTailTest(SinkTestCase):
+    
+    def test_csv_torn_row_is_truncated(self):
+        path = os.path.join(self.directory, 'leads.csv')
+        self.write(CsvSink, path, [make_lead('a')])
+        self.append_text(path, '2023,Gmail,"Torn, name')
+        
+        sink = CsvSink(path, fsync=False)
+        self.assertEqual(sink.append_multiple_leads([make_lead('b'), make_lead('c')]), (2, 2))
+        sink.close()
+        
+        with open(path, encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([row['email'] for row in rows], ['a@example.com', 'b@example.com', 'c@example.com'])
+        
+        sink = CsvSink(path, fsync=False)
+        self.assertEqual(sink.get_row_count(), 3)
+        self.assertEqual(sink.find_duplicate(make_lead('b')), 'email')
+        sink.close()
+    
+    def test_csv_short_row_is_truncated(self):
+        path = os.path.join(self.directory, 'leads.csv')
+        self.write(CsvSink, path, [make_lead('a')])
+        self.append_text(path, '2023,Gmail,Lead')
+        
+        sink = CsvSink(path, fsync=False)
+        self.assertEqual(sink.get_row_count(), 1)
+        sink.close()
+    
+    def test_csv_whole_row_without_line_end_is_kept(self):
+        path = os.path.join(self.directory, 'leads.csv')
+        self.write(CsvSink, path, [make_lead('a'), make_lead('b')])
+        with open(path, 'rb+') as f:
+            f.truncate(os.path.getsize(path) - 2)
+        
+        self.write(CsvSink, path, [make_lead('c')])
+        sink = CsvSink(path, fsync=False)
+        self.assertEqual(sink.get_row_count(), 3)
+        self.assertEqual(sink.find_duplicate(make_lead('b')), 'email')
+        sink.close()
+    
+    def test_jsonl_torn_line_is_truncated(self):
+        path = os.path.join(self.directory, 'leads.jsonl')
+        self.write(JsonlSink, path, [make_lead('a')])
+        self.append_text(path, '{"email": "b@example.com", "na')
+        
+        self.assertEqual(self.write(JsonlSink, path, [make_lead('c')]), (1, 1))
+        with open(path, encoding='utf-8') as f:
+            emails = [json.loads(line)['email'] for line in f]
+        self.assertEqual(emails, ['a@example.com', 'c@example.com'])
+    
+    def test_jsonl_whole_object_without_line_end_is_kept(self):
+        path = os.path.join(self.directory, 'leads.jsonl')
+        self.write(JsonlSink, path, [make_lead('a')])
+        self.append_text(path, '{"email": "b@example.com"}')
+        
+        self.write(JsonlSink, path, [make_lead('c')])
+        sink = JsonlSink(path, fsync=False)
+        self.assertEqual(sink.get_row_count(), 3)
+        self.assertEqual(sink.find_duplicate(make_lead('b')), 'email')
+        sink.close()
+    
+    def test_only_a_torn_line(self):
+        path = os.path.join(self.directory, 'leads.jsonl')
+        self.append_text(path, '{"ema')
+        
+        sink = JsonlSink(path, fsync=False)
+        self.assertEqual(sink.get_row_count(), 0)
+        sink.close()
+        self.assertEqual(os.path.getsize(path), 0)
+
+class SqliteSinkTest(SinkTestCase):
+    
+    def test_fsync_sets_synchronous_full(self):
+        for fsync, expected in ((True, 2), (False, 1)):
+            with self.subTest(fsync=fsync):
+                sink = SqliteSink(os.path.join(self.directory, f'leads_{fsync}.sqlite3'), fsync=fsync)
+                self.assertEqual(sink._conn.execute('PRAGMA synchronous').fetchone()[0], expected)
+                sink.close()
+
+class LeadSinkInterfaceTest(unittest.TestCase):
+    
+    def test_missing_methods_fail_on_construction(self):
+        class PartialSink(LeadSink):
+            def append_multiple_leads(self, leads):
+                return len(leads), len(leads)
+        
+        with self.assertRaises(TypeError):
+            PartialSink()
+
+if __name__ == '__main__':
+    unittest.main()